@@ -0,0 +1,92 @@
+"""
+Compares split and combine time of the python and gmpy2 arithmetic backends
+for growing primes, and checks that the shares split with either backend
+combine with the other.
+
+Run from the csr_utils folder:
+    python -m benchmarks.arithmetic_backends
+"""
+import argparse
+import time
+from csr_utils.utils.arithmetic import set_arithmetic_backend
+from csr_utils.utils.autotune import max_chunk_size
+from csr_utils.utils.encoding_functions import (
+    combine_secret_shares,
+    get_standard_prime,
+    split_and_encode_string,
+)
+from csr_utils.utils.keys import generate_key_and_public_key
+
+PRIME_BITS = [1279, 4253, 9689, 19937]
+
+
+def best_of(function, repeats):
+    best = float("inf")
+    for _ in range(repeats):
+        start = time.perf_counter()
+        result = function()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def time_backend(backend, secret, engine, prime, chunk_size, k, n, repeats):
+    set_arithmetic_backend(backend)
+    split, share_chunks = best_of(
+        lambda: split_and_encode_string(
+            secret, k, n, chunk_size=chunk_size, engine=engine, prime=prime
+        ),
+        repeats,
+    )
+    subset = [shares[:k] for shares in share_chunks]
+    combine, _ = best_of(lambda: combine_secret_shares(subset, prime=prime), repeats)
+    return split, combine, share_chunks
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--engines", nargs="+", default=["prime", "bytes"])
+    parser.add_argument("--prime_bits", type=int, nargs="+", default=PRIME_BITS)
+    parser.add_argument("--k", type=int, default=3)
+    parser.add_argument("--n", type=int, default=5)
+    parser.add_argument("--copies", type=int, default=4, help="RSA 4096 PEM keys per secret")
+    args = parser.parse_args()
+
+    try:
+        set_arithmetic_backend("gmpy2")
+    except ValueError as e:
+        parser.error(str(e))
+    secret = generate_key_and_public_key("rsa", 4096)[1] * args.copies
+
+    print(f"secret: {len(secret)} characters, k={args.k}, n={args.n}")
+    print(
+        f"{'engine':>7} {'bits':>6} {'chunks':>7} {'split py ms':>12} {'split gmp ms':>13} "
+        f"{'x':>6} {'combine py ms':>14} {'combine gmp ms':>15} {'x':>6}"
+    )
+    for engine in args.engines:
+        for bits in args.prime_bits:
+            prime = get_standard_prime(bits)
+            chunk_size = max_chunk_size(engine, prime)
+            results = {
+                backend: time_backend(
+                    backend, secret, engine, prime, chunk_size, args.k, args.n, args.repeats
+                )
+                for backend in ("python", "gmpy2")
+            }
+            # the polynomials are random, so each backend combines the other's shares
+            for split_backend, combine_backend in (("python", "gmpy2"), ("gmpy2", "python")):
+                set_arithmetic_backend(combine_backend)
+                subset = [shares[-args.k :] for shares in results[split_backend][2]]
+                if combine_secret_shares(subset, prime=prime) != secret:
+                    raise AssertionError(f"The backends disagree for {engine} at {bits} bits.")
+            split_py, combine_py, share_chunks = results["python"]
+            split_gmp, combine_gmp, _ = results["gmpy2"]
+            print(
+                f"{engine:>7} {bits:6} {len(share_chunks):7} {split_py * 1000:12.2f} "
+                f"{split_gmp * 1000:13.2f} {split_py / split_gmp:6.2f} {combine_py * 1000:14.2f} "
+                f"{combine_gmp * 1000:15.2f} {combine_py / combine_gmp:6.2f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+"""
+Compares key generation, CSR signing and split/combine cost per key algorithm.
+
+Run from the csr_utils folder:
+    python -m benchmarks.key_algorithms
+"""
+import argparse
+import time
+from csr_utils.utils.autotune import parse_chunk_size, resolve_split_parameters
+from csr_utils.utils.encoding_functions import (
+    SHARE_ENGINES,
+    combine_secret_shares,
+    split_and_encode_string,
+)
+from csr_utils.utils.keys import generate_key_and_public_key, generate_private_key
+
+ALGORITHMS = [
+    ("rsa", 2048),
+    ("rsa", 3072),
+    ("rsa", 4096),
+    ("ecdsa-p256", None),
+    ("ecdsa-p384", None),
+    ("ed25519", None),
+]
+
+
+def best_of(function, repeats):
+    best = float("inf")
+    for _ in range(repeats):
+        start = time.perf_counter()
+        result = function()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--engine", choices=SHARE_ENGINES, default="prime")
+    parser.add_argument("--chunk_size", type=parse_chunk_size, default=1024)
+    parser.add_argument("--k", type=int, default=2)
+    parser.add_argument("--n", type=int, default=4)
+    args = parser.parse_args()
+
+    print(
+        f"{'algorithm':>15} {'keygen ms':>10} {'sign ms':>10} {'key bytes':>10} "
+        f"{'chunks':>7} {'split ms':>10} {'combine ms':>11}"
+    )
+    for algorithm, bits in ALGORITHMS:
+        name = f"{algorithm}-{bits}" if bits else algorithm
+        bits = bits or 4096
+        keygen, private_key = best_of(
+            lambda: generate_private_key(algorithm, bits), args.repeats
+        )
+        sign, (_, pem_key) = best_of(
+            lambda: generate_key_and_public_key(private_key=private_key), args.repeats
+        )
+        chunk_size, prime = resolve_split_parameters(pem_key, args.engine, args.chunk_size)
+        split, share_chunks = best_of(
+            lambda: split_and_encode_string(
+                pem_key, args.k, args.n, chunk_size=chunk_size, engine=args.engine, prime=prime
+            ),
+            args.repeats,
+        )
+        subset = [shares[: args.k] for shares in share_chunks]
+        combine, _ = best_of(lambda: combine_secret_shares(subset, prime=prime), args.repeats)
+        print(
+            f"{name:>15} {keygen * 1000:10.2f} {sign * 1000:10.2f} {len(pem_key):10} "
+            f"{len(share_chunks):7} {split * 1000:10.2f} {combine * 1000:11.2f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
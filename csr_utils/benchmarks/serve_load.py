@@ -0,0 +1,174 @@
+"""
+Load test of the serve daemon: concurrent clients each send a number of
+generate, split or combine requests and the client side latency percentiles,
+the throughput and the queue and batch statistics of the daemon are printed.
+
+Without --socket_path a daemon is started on a temporary socket for the run.
+
+Run from the csr_utils folder:
+    python -m benchmarks.serve_load --op split --clients 16 --requests 50
+"""
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from csr_utils.utils.daemon import DaemonClient, OPERATIONS, percentile
+from csr_utils.utils.keys import generate_key_and_public_key, KEY_ALGORITHMS
+
+
+def wait_for_socket(socket_path, process, timeout=60):
+    deadline = time.monotonic() + timeout
+    while not os.path.exists(socket_path):
+        if process.poll() is not None or time.monotonic() > deadline:
+            raise RuntimeError("The daemon did not start.")
+        time.sleep(0.05)
+
+
+def prepare(
+    socket_path, op, folder, clients, key_algorithm, num_shares, num_shares_for_rebuild
+):
+    """
+    Writes a private key per client for split, and its share files for combine,
+    so that concurrent requests never write the same files.
+    """
+    if op not in ("split", "combine"):
+        return
+    _, private_key = generate_key_and_public_key(key_algorithm)
+    with DaemonClient(socket_path) as client:
+        for client_n in range(clients):
+            with open(os.path.join(folder, f"key_{client_n}_private.key"), "w") as file:
+                file.write(private_key)
+            if op == "combine":
+                client.request(
+                    "split",
+                    **split_args(folder, client_n, num_shares, num_shares_for_rebuild),
+                )
+
+
+def split_args(folder, client_n, num_shares, num_shares_for_rebuild):
+    return {
+        "path_to_key": folder,
+        "file_name": f"key_{client_n}_private.key",
+        "num_shares": num_shares,
+        "num_shares_for_rebuild": num_shares_for_rebuild,
+    }
+
+
+def request_args(op, folder, client_n, request_n, args):
+    if op == "generate":
+        return {
+            "file_name": f"key_{client_n}_{request_n}",
+            "folder_path": folder,
+            "key_algorithm": args.key_algorithm,
+        }
+    if op == "generate_split":
+        return {
+            "file_name": f"key_{client_n}_{request_n}",
+            "folder_path": folder,
+            "num_shares": args.num_shares,
+            "num_shares_for_rebuild": args.num_shares_for_rebuild,
+            "key_algorithm": args.key_algorithm,
+        }
+    if op == "split":
+        return split_args(folder, client_n, args.num_shares, args.num_shares_for_rebuild)
+    return {"file_name": f"key_{client_n}", "folder_path": folder}
+
+
+def run_client(socket_path, op, folder, client_n, args, latencies, errors):
+    with DaemonClient(socket_path) as client:
+        for request_n in range(args.requests):
+            start = time.perf_counter()
+            try:
+                client.request(op, **request_args(op, folder, client_n, request_n, args))
+            except Exception as e:
+                errors.append(str(e))
+            latencies.append(time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--op", choices=OPERATIONS, default="split")
+    parser.add_argument("--clients", type=int, default=8)
+    parser.add_argument("--requests", type=int, default=25, help="requests per client")
+    parser.add_argument("--key_algorithm", choices=KEY_ALGORITHMS, default="ed25519")
+    parser.add_argument("--num_shares", type=int, default=4)
+    parser.add_argument("--num_shares_for_rebuild", type=int, default=2)
+    parser.add_argument(
+        "--socket_path", type=str, help="socket of a running daemon to load"
+    )
+    parser.add_argument("--workers", type=int, help="workers of the started daemon")
+    parser.add_argument("--max_batch", type=int, help="max batch of the started daemon")
+    args = parser.parse_args()
+
+    folder = tempfile.mkdtemp()
+    daemon = None
+    if args.socket_path:
+        socket_path = args.socket_path
+    else:
+        socket_path = os.path.join(folder, "serve.sock")
+        command = [sys.executable, "-m", "csr_utils.cli", "serve"]
+        command += ["--socket_path", socket_path]
+        if args.workers:
+            command += ["--workers", str(args.workers)]
+        if args.max_batch:
+            command += ["--max_batch", str(args.max_batch)]
+        daemon = subprocess.Popen(command, stderr=subprocess.DEVNULL)
+    try:
+        if daemon:
+            wait_for_socket(socket_path, daemon)
+        prepare(
+            socket_path,
+            args.op,
+            folder,
+            args.clients,
+            args.key_algorithm,
+            args.num_shares,
+            args.num_shares_for_rebuild,
+        )
+
+        latencies, errors = [], []
+        threads = [
+            threading.Thread(
+                target=run_client,
+                args=(socket_path, args.op, folder, client_n, args, latencies, errors),
+            )
+            for client_n in range(args.clients)
+        ]
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - start
+
+        with DaemonClient(socket_path) as client:
+            stats = client.stats()
+        latencies.sort()
+        print(
+            f"{args.op}: {len(latencies)} requests from {args.clients} clients in {elapsed:.2f} s, "
+            f"{len(latencies) / elapsed:.1f} requests/s, {len(errors)} errors"
+        )
+        print(
+            "client latency ms: "
+            + ", ".join(
+                f"{name} {percentile(latencies, fraction) * 1000:.1f}"
+                for name, fraction in (("p50", 0.5), ("p90", 0.9), ("p99", 0.99))
+            )
+        )
+        print(f"daemon stats: {json.dumps(stats)}")
+        if errors:
+            print(f"first error: {errors[0]}")
+    finally:
+        if daemon:
+            daemon.terminate()
+            daemon.wait()
+        shutil.rmtree(folder, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
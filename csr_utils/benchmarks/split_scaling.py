@@ -0,0 +1,80 @@
+"""
+Compares the per-chunk polynomial evaluation of the original split with the
+batched Horner evaluation of secret_ints_to_points for growing n and k.
+
+Run from the csr_utils folder:
+    python -m benchmarks.split_scaling
+"""
+import argparse
+import time
+from csr_utils.utils.encoding_functions import (
+    get_large_enough_prime,
+    large_enough_polynomial,
+    secret_ints_to_points,
+)
+
+
+def get_polynomial_points(coefficients, num_points, prime):
+    """
+    The evaluation of the original split, as secretsharing.polynomials did it:
+    every term of every point is reduced mod prime on its own. Kept here as the
+    reference, since the split no longer evaluates polynomials with secretsharing.
+    """
+    points = []
+    for x in range(1, num_points + 1):
+        y = coefficients[0]
+        for i in range(1, len(coefficients)):
+            term = (coefficients[i] * (x**i % prime)) % prime
+            y = (y + term) % prime
+        points.append((x, y))
+    return points
+
+
+def naive_split(secret_ints, k, n, prime):
+    """The original split: each chunk evaluated on its own."""
+    for secret_int in secret_ints:
+        coefficients = large_enough_polynomial(k - 1, secret_int, prime)
+        get_polynomial_points(coefficients, n, prime)
+
+
+def batched_split(secret_ints, k, n, prime):
+    secret_ints_to_points(secret_ints, k, n, prime=prime)
+
+
+def time_call(function, *args):
+    start = time.perf_counter()
+    function(*args)
+    return time.perf_counter() - start
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--chunks", type=int, default=8, help="number of chunks")
+    parser.add_argument(
+        "--prime_bits", type=int, default=19937, help="bit length of the prime"
+    )
+    parser.add_argument(
+        "--n", type=int, nargs="+", default=[4, 16, 64, 128], help="share counts"
+    )
+    parser.add_argument(
+        "--k", type=int, nargs="+", default=[2, 4, 8, 16], help="thresholds"
+    )
+    args = parser.parse_args()
+
+    prime = get_large_enough_prime([2 ** (args.prime_bits - 1)])
+    secret_ints = [prime // (i + 2) for i in range(args.chunks)]
+
+    # loads the arithmetic backend before the first timed call
+    batched_split(secret_ints, 2, 2, prime)
+    print(f"{'n':>5} {'k':>4} {'naive (s)':>11} {'batched (s)':>12} {'speedup':>8}")
+    for n in args.n:
+        for k in args.k:
+            if k > n:
+                continue
+            naive = time_call(naive_split, secret_ints, k, n, prime)
+            batched = time_call(batched_split, secret_ints, k, n, prime)
+            print(f"{n:>5} {k:>4} {naive:>11.4f} {batched:>12.4f} {naive / batched:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
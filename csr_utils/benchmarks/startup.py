@@ -0,0 +1,56 @@
+"""
+Measures the startup time of the csr-utils subcommands, as the best wall time
+of `python -m csr_utils.cli <command> --help` minus the best wall time of a bare
+interpreter, and checks it against the targets below.
+
+Run from the csr_utils folder:
+    python -m benchmarks.startup
+"""
+import argparse
+import subprocess
+import sys
+import time
+
+# milliseconds over a bare interpreter. Only the generate commands import
+# cryptography, which accounts for most of their budget.
+STARTUP_TARGETS_MS = {
+    "": 60,
+    "combine": 100,
+    "split": 100,
+    "convert": 100,
+    "generate": 250,
+    "generate-split": 250,
+}
+
+
+def best_time(command, repeats):
+    best = float("inf")
+    for _ in range(repeats):
+        start = time.perf_counter()
+        subprocess.run(command, stdout=subprocess.DEVNULL, check=True)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--repeats", type=int, default=10)
+    args = parser.parse_args()
+
+    interpreter = best_time([sys.executable, "-c", "pass"], args.repeats)
+    print(f"bare interpreter: {interpreter * 1000:.1f} ms")
+    failures = 0
+    for command, target in STARTUP_TARGETS_MS.items():
+        elapsed = best_time(
+            [sys.executable, "-m", "csr_utils.cli", *command.split(), "--help"],
+            args.repeats,
+        )
+        startup = (elapsed - interpreter) * 1000
+        status = "ok" if startup <= target else "SLOW"
+        failures += startup > target
+        print(f"{status:<5} csr-utils {command or '':<15} {startup:7.1f} ms (target {target} ms)")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,268 @@
+"""
+Benchmark suite for key generation, split and combine.
+
+Run from the csr_utils folder:
+    python -m benchmarks.suite run --output results.json
+    python -m benchmarks.suite compare --baseline baseline.json --results results.json
+
+"run" times every case of the grid and writes latency percentiles, throughput
+and peak memory to a JSON file. "compare" flags the cases whose median latency
+or peak memory grew by more than the threshold against a stored baseline, and
+exits with status 1 if any did.
+"""
+import argparse
+import json
+import platform
+import sys
+import time
+import tracemalloc
+from importlib.metadata import PackageNotFoundError, version
+from typing import Any, Callable, Dict, List
+from csr_utils.utils.autotune import parse_chunk_size, resolve_split_parameters
+from csr_utils.utils.encoding_functions import (
+    SHARE_ENGINES,
+    combine_secret_shares,
+    split_and_encode_string,
+)
+from csr_utils.utils.keys import generate_rsa_key_and_public_key
+
+PEM_SIZE = "pem"
+DEFAULT_KEY_SIZES = [2048, 3072, 4096]
+DEFAULT_SECRET_SIZES = [PEM_SIZE, "65536", "1048576", "4194304"]
+DEFAULT_CHUNK_SIZES = ["1024", "auto"]
+DEFAULT_THRESHOLDS = ["2:4", "3:5", "5:10"]
+
+
+def percentile(sorted_values: List[float], fraction: float) -> float:
+    index = min(len(sorted_values) - 1, round(fraction * (len(sorted_values) - 1)))
+    return sorted_values[index]
+
+
+def measure(function: Callable[[], Any], repeats: int) -> Dict[str, float]:
+    """
+    Times repeats calls of function, then measures the peak Python heap of one
+    more call with tracemalloc, which is kept out of the timed calls. Memory
+    allocated by OpenSSL during key generation is not seen by tracemalloc.
+    """
+    latencies = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        function()
+        latencies.append(time.perf_counter() - start)
+    latencies.sort()
+
+    tracemalloc.start()
+    function()
+    _, peak_memory = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        "p50": percentile(latencies, 0.5),
+        "p90": percentile(latencies, 0.9),
+        "p99": percentile(latencies, 0.99),
+        "mean": sum(latencies) / len(latencies),
+        "peak_memory": peak_memory,
+    }
+
+
+def make_secret(pem_key: str, size: str) -> str:
+    if size == PEM_SIZE:
+        return pem_key
+    size = int(size)
+    return (pem_key * (size // len(pem_key) + 1))[:size]
+
+
+def run_keygen(key_sizes: List[int], repeats: int) -> List[Dict[str, Any]]:
+    results = []
+    for bits in key_sizes:
+        stats = measure(lambda: generate_rsa_key_and_public_key(bits), repeats)
+        results.append(
+            {
+                "name": f"keygen/rsa/bits={bits}",
+                "operation": "keygen",
+                "bits": bits,
+                **stats,
+                "throughput": 1 / stats["p50"],
+                "throughput_unit": "keys/s",
+            }
+        )
+        print_result(results[-1])
+    return results
+
+
+def run_split_combine(
+    engines: List[str],
+    secret_sizes: List[str],
+    chunk_sizes: List[Any],
+    thresholds: List[str],
+    repeats: int,
+) -> List[Dict[str, Any]]:
+    _, pem_key = generate_rsa_key_and_public_key()
+    results = []
+    for engine in engines:
+        for size in secret_sizes:
+            secret = make_secret(pem_key, size)
+            for requested_chunk_size in chunk_sizes:
+                chunk_size, prime = resolve_split_parameters(
+                    secret, engine, requested_chunk_size
+                )
+                for threshold in thresholds:
+                    k, n = (int(value) for value in threshold.split(":"))
+                    share_chunks = split_and_encode_string(
+                        secret, k, n, chunk_size=chunk_size, engine=engine, prime=prime
+                    )
+                    subset = [shares[:k] for shares in share_chunks]
+                    operations = {
+                        "split": lambda: split_and_encode_string(
+                            secret, k, n, chunk_size=chunk_size, engine=engine, prime=prime
+                        ),
+                        "combine": lambda: combine_secret_shares(subset, prime=prime),
+                    }
+                    for operation, function in operations.items():
+                        stats = measure(function, repeats)
+                        results.append(
+                            {
+                                "name": f"{operation}/{engine}/size={size}/"
+                                f"chunk={requested_chunk_size}/k={k}/n={n}",
+                                "operation": operation,
+                                "engine": engine,
+                                "secret_size": len(secret),
+                                "chunk_size": chunk_size,
+                                "prime_bits": prime.bit_length() if prime else None,
+                                "k": k,
+                                "n": n,
+                                **stats,
+                                "throughput": len(secret) / stats["p50"],
+                                "throughput_unit": "bytes/s",
+                            }
+                        )
+                        print_result(results[-1])
+    return results
+
+
+def print_result(result: Dict[str, Any]) -> None:
+    print(
+        f"{result['name']:<58} p50={result['p50'] * 1000:9.2f}ms "
+        f"p90={result['p90'] * 1000:9.2f}ms "
+        f"{result['throughput']:>12.1f} {result['throughput_unit']:<7} "
+        f"peak={result['peak_memory'] / 1024:9.1f}KiB",
+        flush=True,
+    )
+
+
+def get_environment() -> Dict[str, Any]:
+    environment = {"python": sys.version.split()[0], "platform": platform.platform()}
+    for package in ("cryptography", "numpy"):
+        try:
+            environment[package] = version(package)
+        except PackageNotFoundError:
+            environment[package] = None
+    return environment
+
+
+def compare_results(
+    baseline: Dict[str, Any], results: Dict[str, Any], threshold: float
+) -> List[str]:
+    """
+    Prints the relative change of every case found in both result sets and
+    returns the names of the cases whose median latency or peak memory grew by
+    more than threshold.
+    """
+    baseline_cases = {r["name"]: r for r in baseline["results"]}
+    result_cases = {r["name"]: r for r in results["results"]}
+
+    regressions = []
+    for name, result in result_cases.items():
+        if name not in baseline_cases:
+            continue
+        latency_change = result["p50"] / baseline_cases[name]["p50"] - 1
+        memory_change = (
+            result["peak_memory"] / baseline_cases[name]["peak_memory"] - 1
+            if baseline_cases[name]["peak_memory"]
+            else 0
+        )
+        regressed = latency_change > threshold or memory_change > threshold
+        if regressed:
+            regressions.append(name)
+        print(
+            f"{'REGRESSION' if regressed else 'ok':<10} {name:<58} "
+            f"latency {latency_change:+7.1%} memory {memory_change:+7.1%}"
+        )
+    print(f"{len(regressions)} regressions over {len(result_cases)} cases.")
+    return regressions
+
+
+def compare(baseline_path: str, results_path: str, threshold: float) -> int:
+    """
+    Compares two result files with compare_results and returns the number of
+    regressions.
+    """
+    with open(baseline_path, "r") as file:
+        baseline = json.load(file)
+    with open(results_path, "r") as file:
+        results = json.load(file)
+    return len(compare_results(baseline, results, threshold))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Benchmarks key generation, split and combine."
+    )
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = subparsers.add_parser("run", help="run the benchmarks")
+    run_parser.add_argument(
+        "--output", type=str, help="path of the JSON results.", default="results.json"
+    )
+    run_parser.add_argument(
+        "--repeats", type=int, help="timed runs per case", default=5
+    )
+    run_parser.add_argument(
+        "--key_sizes", type=int, nargs="*", default=DEFAULT_KEY_SIZES,
+        help="RSA key sizes to generate. Pass no value to skip key generation",
+    )
+    run_parser.add_argument(
+        "--engines", type=str, nargs="*", choices=SHARE_ENGINES, default=list(SHARE_ENGINES),
+        help="share engines to benchmark",
+    )
+    run_parser.add_argument(
+        "--secret_sizes", type=str, nargs="*", default=DEFAULT_SECRET_SIZES,
+        help='secret sizes in bytes, "pem" for a 4096-bit PEM key',
+    )
+    run_parser.add_argument(
+        "--chunk_sizes", type=parse_chunk_size, nargs="*", default=DEFAULT_CHUNK_SIZES,
+        help='chunk sizes in characters or "auto"',
+    )
+    run_parser.add_argument(
+        "--thresholds", type=str, nargs="*", default=DEFAULT_THRESHOLDS,
+        help="(k, n) pairs written as k:n",
+    )
+
+    compare_parser = subparsers.add_parser(
+        "compare", help="compare results with a baseline"
+    )
+    compare_parser.add_argument("--baseline", type=str, required=True)
+    compare_parser.add_argument("--results", type=str, required=True)
+    compare_parser.add_argument(
+        "--threshold", type=float, default=0.1,
+        help="relative increase of latency or memory flagged as a regression",
+    )
+    args = parser.parse_args()
+
+    if args.command == "compare":
+        sys.exit(1 if compare(args.baseline, args.results, args.threshold) else 0)
+
+    chunk_sizes = [
+        parse_chunk_size(c) if isinstance(c, str) else c for c in args.chunk_sizes
+    ]
+    results = run_keygen(args.key_sizes, args.repeats)
+    results += run_split_combine(
+        args.engines, args.secret_sizes, chunk_sizes, args.thresholds, args.repeats
+    )
+    with open(args.output, "w") as file:
+        json.dump({"environment": get_environment(), "results": results}, file, indent=2)
+    print(f"Results saved: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
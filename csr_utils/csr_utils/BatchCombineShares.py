@@ -0,0 +1,169 @@
+import argparse
+import functools
+import os
+import sys
+import logging
+from typing import List, Optional, Tuple
+
+if not __package__:
+    # run as a script: import the csr_utils package of this checkout
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from csr_utils.CombineShares import combine_shares
+from csr_utils.utils.batch import Checkpoint, run_batch
+from csr_utils.utils.key_encoding import KEY_OUTPUT_FORMATS
+from csr_utils.utils.share_files import find_share_keys
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s"
+)
+
+
+def find_share_sets(root: str, overwrite: bool = False) -> List[Tuple[str, str]]:
+    """
+    Returns the (folder path, file name) of every key with share files under a
+    directory tree, sorted by path. Keys already combined are left out unless
+    overwrite is set.
+
+    Args:
+    root (str): The root of the directory tree.
+    overwrite (bool): Also return the keys that already have a combined key file.
+
+    Returns:
+    List[Tuple[str, str]]: The folder path and share file prefix of every key.
+    """
+    share_sets = []
+    for folder_path, file_name in find_share_keys(root):
+        combined_key_path = os.path.join(folder_path, file_name + "_combined_private.key")
+        if not overwrite and os.path.exists(combined_key_path):
+            logging.info(f"Skipped {os.path.join(folder_path, file_name)}: {combined_key_path} already exists.")
+            continue
+        share_sets.append((folder_path, file_name))
+    return share_sets
+
+
+def batch_combine_shares(
+    root: str,
+    checkpoint_path: str,
+    stream: bool = False,
+    workers: Optional[int] = None,
+    overwrite: bool = False,
+    restart: bool = False,
+    output_format: str = "pem",
+) -> int:
+    """
+    Combines the share files of every key under a directory tree, as
+    CombineShares.py, in a process pool. The combined key is saved next to its
+    share files. Finished keys are recorded in the checkpoint manifest, so
+    rerunning with the same manifest resumes an interrupted run on the keys
+    found by the first run.
+
+    Args:
+    root (str): The root of the directory tree with the share files.
+    checkpoint_path (str): The path of the JSONL checkpoint manifest.
+    stream (bool): Combine every key chunk by chunk.
+    workers (Optional[int]): Number of worker processes. Defaults to the number of cores.
+    overwrite (bool): Combine again the keys that already have a combined key file.
+    restart (bool): Start the checkpoint manifest over instead of resuming it.
+    output_format (str): The format of the combined keys, "pem" (default) or "der".
+
+    Returns:
+    int: The number of keys that failed.
+    """
+    parameters = {
+        "root": os.path.abspath(root),
+        "stream": stream,
+        "output_format": output_format,
+    }
+    with Checkpoint(checkpoint_path, "combine", parameters, restart) as checkpoint:
+        if checkpoint.items is None:
+            checkpoint.start(
+                os.path.relpath(os.path.join(folder_path, file_name), root)
+                for folder_path, file_name in find_share_sets(root, overwrite)
+            )
+            logging.info(f"Found {len(checkpoint.items)} share sets under {root}.")
+        items = [
+            (item, (os.path.basename(item), os.path.join(root, os.path.dirname(item))))
+            for item in checkpoint.items
+        ]
+        combine_share_set = functools.partial(
+            combine_shares, stream=stream, output_format=output_format
+        )
+        return run_batch(items, combine_share_set, checkpoint, workers)
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    """
+    Main function to parse arguments and call the batch combine function.
+    """
+    parser = argparse.ArgumentParser(
+        description="Combines the share files of every key under a directory tree in parallel, as \
+        CombineShares.py. Finished keys are recorded in a checkpoint manifest, so an interrupted run resumes."
+    )
+    parser.add_argument(
+        "--folder_path",
+        type=str,
+        help="root of the directory tree with the share files. Leave empty to use the current directory",
+        required=False,
+    )
+    parser.add_argument(
+        "--checkpoint",
+        type=str,
+        help="path of the JSONL checkpoint manifest. Rerun with the same manifest to resume",
+        required=False,
+        default="batch_combine_checkpoint.jsonl",
+    )
+    parser.add_argument(
+        "--stream",
+        action="store_true",
+        help="combine every key chunk by chunk, with constant memory use",
+    )
+    parser.add_argument(
+        "--output_format",
+        type=str,
+        choices=KEY_OUTPUT_FORMATS,
+        help="format of the combined keys, as in CombineShares.py",
+        required=False,
+        default="pem",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        help="number of worker processes. Leave empty to use all cores",
+        required=False,
+    )
+    parser.add_argument(
+        "--overwrite",
+        action="store_true",
+        help="combine again the keys that already have a combined key file",
+    )
+    parser.add_argument(
+        "--restart",
+        action="store_true",
+        help="start the checkpoint manifest over instead of resuming it",
+    )
+    args = parser.parse_args(argv)
+
+    try:
+        failures = batch_combine_shares(
+            args.folder_path or ".",
+            args.checkpoint,
+            args.stream,
+            args.workers,
+            args.overwrite,
+            args.restart,
+            args.output_format,
+        )
+    except Exception as e:
+        logging.error(f"Error!! {e}")
+        sys.exit(1)
+
+    logging.info(f"Checkpoint saved: {args.checkpoint}")
+    if failures:
+        logging.error(f"{failures} keys failed.")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,273 @@
+import argparse
+import fnmatch
+import functools
+import os
+import re
+import sys
+import logging
+from typing import List, Optional, Tuple
+
+if not __package__:
+    # run as a script: import the csr_utils package of this checkout
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from csr_utils.SplitKey import split_string_into_shares
+from csr_utils.utils.encoding_functions import SHARE_ENGINES, DEFAULT_SHARE_ENGINE
+from csr_utils.utils.autotune import parse_chunk_size
+from csr_utils.utils.batch import Checkpoint, run_batch
+from csr_utils.utils.share_files import SHARE_FORMATS, DEFAULT_SHARE_FORMAT
+from csr_utils.utils.key_encoding import (
+    check_key_encoding,
+    KEY_ENCODINGS,
+    DEFAULT_KEY_ENCODING,
+)
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s"
+)
+
+DEFAULT_KEY_PATTERN = "*_private.key"
+# share files and combined keys are never split again
+EXCLUDED_KEY_PATTERN = re.compile(r".*(_share_\d+|_combined_private)\.key")
+
+
+def find_key_files(
+    root: str, pattern: str = DEFAULT_KEY_PATTERN, overwrite: bool = False
+) -> List[Tuple[str, str]]:
+    """
+    Walks a directory tree and returns the (folder path, file name) of every key
+    file matching pattern, sorted by path. Keys that already have share files
+    are left out unless overwrite is set.
+
+    Args:
+    root (str): The root of the directory tree.
+    pattern (str): A shell-style pattern matched against the file names.
+    overwrite (bool): Also return the keys that already have share files.
+
+    Returns:
+    List[Tuple[str, str]]: The folder path and file name of every key file.
+    """
+    key_files = []
+    for folder_path, _, file_names in os.walk(root):
+        for name in file_names:
+            if not fnmatch.fnmatch(name, pattern) or EXCLUDED_KEY_PATTERN.fullmatch(name):
+                continue
+            first_share = os.path.join(folder_path, name.replace(".key", "") + "_share_1.key")
+            if not overwrite and os.path.exists(first_share):
+                logging.info(f"Skipped {os.path.join(folder_path, name)}: {first_share} already exists.")
+                continue
+            key_files.append((folder_path, name))
+    return sorted(key_files)
+
+
+def batch_split_keys(
+    root: str,
+    checkpoint_path: str,
+    num_shares: int,
+    num_shares_for_rebuild: int,
+    engine: str = DEFAULT_SHARE_ENGINE,
+    chunk_size: int = 1024,
+    prime_bits: Optional[int] = None,
+    stream: bool = False,
+    share_format: str = DEFAULT_SHARE_FORMAT,
+    pattern: str = DEFAULT_KEY_PATTERN,
+    workers: Optional[int] = None,
+    overwrite: bool = False,
+    restart: bool = False,
+    key_encoding: str = DEFAULT_KEY_ENCODING,
+) -> int:
+    """
+    Splits every key file under a directory tree, as SplitKey.py, in a process
+    pool. The share files are saved next to each key. Finished keys are recorded
+    in the checkpoint manifest, so rerunning with the same manifest resumes an
+    interrupted run on the key files found by the first run.
+
+    Args:
+    root (str): The root of the directory tree with the key files.
+    checkpoint_path (str): The path of the JSONL checkpoint manifest.
+    num_shares (int): The number of shares to be created for every key.
+    num_shares_for_rebuild (int): The number of shares needed to rebuild every key.
+    engine (str): The share engine, as in SplitKey.py.
+    chunk_size (int): The number of characters per chunk, or "auto".
+    prime_bits (Optional[int]): The bit length of the standard prime used for every chunk.
+    stream (bool): Split every key file chunk by chunk.
+    share_format (str): The share file format, "json" (default) or "binary".
+    pattern (str): A shell-style pattern matched against the key file names.
+    workers (Optional[int]): Number of worker processes. Defaults to the number of cores.
+    overwrite (bool): Split again the keys that already have share files.
+    restart (bool): Start the checkpoint manifest over instead of resuming it.
+    key_encoding (str): The encoding of the shared keys, "pem" (default), "der" or "der-zlib".
+
+    Returns:
+    int: The number of keys that failed.
+    """
+    check_key_encoding(key_encoding, engine)
+    parameters = {
+        "root": os.path.abspath(root),
+        "num_shares": num_shares,
+        "num_shares_for_rebuild": num_shares_for_rebuild,
+        "engine": engine,
+        "chunk_size": chunk_size,
+        "prime_bits": prime_bits,
+        "stream": stream,
+        "share_format": share_format,
+        "pattern": pattern,
+        "key_encoding": key_encoding,
+    }
+    with Checkpoint(checkpoint_path, "split", parameters, restart) as checkpoint:
+        if checkpoint.items is None:
+            checkpoint.start(
+                os.path.relpath(os.path.join(folder_path, file_name), root)
+                for folder_path, file_name in find_key_files(root, pattern, overwrite)
+            )
+            logging.info(f"Found {len(checkpoint.items)} key files under {root}.")
+        items = [
+            (item, (os.path.join(root, os.path.dirname(item)), os.path.basename(item)))
+            for item in checkpoint.items
+        ]
+        split_key = functools.partial(
+            split_string_into_shares,
+            num_shares=num_shares,
+            num_shares_for_rebuild=num_shares_for_rebuild,
+            engine=engine,
+            chunk_size=chunk_size,
+            prime_bits=prime_bits,
+            stream=stream,
+            share_format=share_format,
+            key_encoding=key_encoding,
+        )
+        return run_batch(items, split_key, checkpoint, workers)
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    """
+    Main function to parse arguments and call the batch split function.
+    """
+    parser = argparse.ArgumentParser(
+        description="Splits every key file under a directory tree in parallel, as SplitKey.py, \
+        without prompting. Finished keys are recorded in a checkpoint manifest, so an interrupted run resumes."
+    )
+    parser.add_argument(
+        "--folder_path",
+        type=str,
+        help="root of the directory tree with the key files. Leave empty to use the current directory",
+        required=False,
+    )
+    parser.add_argument(
+        "--checkpoint",
+        type=str,
+        help="path of the JSONL checkpoint manifest. Rerun with the same manifest to resume",
+        required=False,
+        default="batch_split_checkpoint.jsonl",
+    )
+    parser.add_argument(
+        "--pattern",
+        type=str,
+        help="shell-style pattern of the key file names. Share files and combined keys are never split",
+        required=False,
+        default=DEFAULT_KEY_PATTERN,
+    )
+    parser.add_argument(
+        "--num_shares",
+        type=int,
+        help="number of shares to be created",
+        required=False,
+        default=4,
+    )
+    parser.add_argument(
+        "--num_shares_for_rebuild",
+        type=int,
+        help="number of shares needed to rebuild the original string. Must be <= num_shares.",
+        required=False,
+        default=2,
+    )
+    parser.add_argument(
+        "--engine",
+        type=str,
+        choices=SHARE_ENGINES,
+        help="share engine, as in SplitKey.py",
+        required=False,
+        default=DEFAULT_SHARE_ENGINE,
+    )
+    parser.add_argument(
+        "--chunk_size",
+        type=parse_chunk_size,
+        help='number of characters per chunk, or "auto" to pick chunk size and prime for the best throughput',
+        required=False,
+        default=1024,
+    )
+    parser.add_argument(
+        "--prime_bits",
+        type=int,
+        help="bit length of the standard prime used for every chunk. Leave empty to pick it automatically",
+        required=False,
+    )
+    parser.add_argument(
+        "--stream",
+        action="store_true",
+        help="split every key file chunk by chunk, with constant memory use",
+    )
+    parser.add_argument(
+        "--share_format",
+        type=str,
+        choices=SHARE_FORMATS,
+        help="share file format: JSON text (json) or compact binary with a chunk index (binary)",
+        required=False,
+        default=DEFAULT_SHARE_FORMAT,
+    )
+    parser.add_argument(
+        "--key_encoding",
+        type=str,
+        choices=KEY_ENCODINGS,
+        help="encoding of the shared keys, as in SplitKey.py",
+        required=False,
+        default=DEFAULT_KEY_ENCODING,
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        help="number of worker processes. Leave empty to use all cores",
+        required=False,
+    )
+    parser.add_argument(
+        "--overwrite",
+        action="store_true",
+        help="split again the keys that already have share files",
+    )
+    parser.add_argument(
+        "--restart",
+        action="store_true",
+        help="start the checkpoint manifest over instead of resuming it",
+    )
+    args = parser.parse_args(argv)
+
+    try:
+        failures = batch_split_keys(
+            args.folder_path or ".",
+            args.checkpoint,
+            args.num_shares,
+            args.num_shares_for_rebuild,
+            args.engine,
+            args.chunk_size,
+            args.prime_bits,
+            args.stream,
+            args.share_format,
+            args.pattern,
+            args.workers,
+            args.overwrite,
+            args.restart,
+            args.key_encoding,
+        )
+    except Exception as e:
+        logging.error(f"Error!! {e}")
+        sys.exit(1)
+
+    logging.info(f"Checkpoint saved: {args.checkpoint}")
+    if failures:
+        logging.error(f"{failures} keys failed.")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
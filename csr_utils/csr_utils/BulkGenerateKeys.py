@@ -0,0 +1,235 @@
+import argparse
+import csv
+import json
+import os
+import sys
+import time
+import logging
+from typing import Any, Dict, List, Optional
+
+if not __package__:
+    # run as a script: import the csr_utils package of this checkout
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from csr_utils.GenerateKeys import generate_keys
+from csr_utils.GenerateSplitKeys import generate_and_split_keys
+from csr_utils.utils.batch import Checkpoint, run_batch
+from csr_utils.utils.keys import (
+    KEY_ALGORITHMS,
+    DEFAULT_KEY_ALGORITHM,
+    DEFAULT_RSA_KEY_SIZE,
+)
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s"
+)
+
+
+def read_manifest_entries(manifest_path: str) -> List[Dict[str, Any]]:
+    """
+    Reads the entries of a CSV manifest with a header row, or of a JSONL
+    manifest with one object per line, as they are.
+    """
+    with open(manifest_path, "r", newline="") as file:
+        if manifest_path.endswith((".jsonl", ".json")):
+            return [json.loads(line) for line in file if line.strip()]
+        return list(csv.DictReader(file))
+
+
+def read_manifest(manifest_path: str) -> List[Dict[str, Any]]:
+    """
+    Reads a bulk generation manifest.
+
+    The manifest is either a CSV file with a header row or a JSONL file with one
+    object per line. Recognised fields are file_name (required), folder_path,
+    num_shares, num_shares_for_rebuild, key_algorithm and key_size. Entries with
+    num_shares are generated with generate_and_split_keys, the others with
+    generate_keys.
+
+    Args:
+    manifest_path (str): The path to the .csv or .jsonl manifest.
+
+    Returns:
+    List[Dict[str, Any]]: The manifest entries.
+
+    Raises:
+    ValueError: If an entry has no file_name, a non-integer number, an unknown
+                key_algorithm or the file_name and folder_path of another entry.
+    """
+    entries = read_manifest_entries(manifest_path)
+    key_names = set()
+    for line_number, entry in enumerate(entries, start=1):
+        if not entry.get("file_name"):
+            raise ValueError(f"Manifest entry {line_number} has no file_name.")
+        try:
+            for field in ("num_shares", "num_shares_for_rebuild"):
+                entry[field] = int(entry[field]) if entry.get(field) else None
+            entry["key_size"] = int(entry.get("key_size") or DEFAULT_RSA_KEY_SIZE)
+        except ValueError as e:
+            raise ValueError(f"Manifest entry {line_number}: {e}")
+        entry["folder_path"] = entry.get("folder_path") or ""
+        entry["key_algorithm"] = entry.get("key_algorithm") or DEFAULT_KEY_ALGORITHM
+        if entry["key_algorithm"] not in KEY_ALGORITHMS:
+            raise ValueError(
+                f"Manifest entry {line_number} has an unknown key_algorithm: {entry['key_algorithm']}"
+            )
+        # two workers writing the same key files would overwrite each other
+        key_name = os.path.join(entry["folder_path"], entry["file_name"])
+        if key_name in key_names:
+            raise ValueError(f"Manifest entry {line_number} generates {key_name} as well.")
+        key_names.add(key_name)
+    return entries
+
+
+def generate_entry(entry: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Generates the keys for a single manifest entry. Runs in a worker process.
+
+    Args:
+    entry (Dict[str, Any]): A manifest entry as returned by read_manifest.
+
+    Returns:
+    Dict[str, Any]: The saved paths and the elapsed time, recorded in the checkpoint manifest.
+    """
+    folder_path = entry["folder_path"]
+    if folder_path:
+        os.makedirs(folder_path, exist_ok=True)
+
+    start = time.perf_counter()
+    if entry["num_shares"]:
+        paths = generate_and_split_keys(
+            entry["file_name"],
+            folder_path,
+            entry["num_shares"],
+            entry["num_shares_for_rebuild"] or 2,
+            key_algorithm=entry["key_algorithm"],
+            key_size=entry["key_size"],
+        )
+        paths.insert(
+            0, os.path.join(folder_path, f"{entry['file_name']}_public.csr")
+        )
+    else:
+        paths = list(
+            generate_keys(
+                entry["file_name"],
+                folder_path,
+                key_algorithm=entry["key_algorithm"],
+                key_size=entry["key_size"],
+            )
+        )
+
+    return {
+        "file_name": entry["file_name"],
+        "folder_path": folder_path,
+        "paths": paths,
+        "seconds": round(time.perf_counter() - start, 6),
+    }
+
+
+def bulk_generate_keys(
+    manifest_path: str,
+    checkpoint_path: str,
+    workers: Optional[int] = None,
+    overwrite: bool = False,
+    restart: bool = False,
+) -> int:
+    """
+    Generates every key listed in a manifest, as BatchSplitKeys.py, in a process
+    pool. Entries whose public key file already exists are skipped unless
+    overwrite is set. The saved paths and generation time of every entry are
+    recorded in the checkpoint manifest as soon as it is done, so rerunning with
+    the same manifest resumes an interrupted run and retries the failed entries.
+
+    Args:
+    manifest_path (str): The path to the .csv or .jsonl manifest.
+    checkpoint_path (str): The path of the JSONL checkpoint manifest.
+    workers (Optional[int]): Number of worker processes. Defaults to the number of cores.
+    overwrite (bool): Regenerate entries whose public key file already exists.
+    restart (bool): Start the checkpoint manifest over instead of resuming it.
+
+    Returns:
+    int: The number of entries that failed.
+    """
+    entries = {
+        os.path.join(entry["folder_path"], entry["file_name"]): entry
+        for entry in read_manifest(manifest_path)
+    }
+    parameters = {"manifest": os.path.abspath(manifest_path)}
+    with Checkpoint(checkpoint_path, "bulk-generate", parameters, restart) as checkpoint:
+        if checkpoint.items is None:
+            items = []
+            for key_name, entry in entries.items():
+                csr_path = os.path.join(
+                    entry["folder_path"], f"{entry['file_name']}_public.csr"
+                )
+                if not overwrite and os.path.exists(csr_path):
+                    logging.info(f"Skipped {entry['file_name']}: {csr_path} already exists.")
+                    continue
+                items.append(key_name)
+            checkpoint.start(items)
+            logging.info(f"Found {len(checkpoint.items)} keys to generate in {manifest_path}.")
+        missing = [item for item in checkpoint.items if item not in entries]
+        if missing:
+            raise ValueError(
+                f"{checkpoint_path} lists keys that are no longer in {manifest_path}: "
+                f"{missing}. Pass --restart to start over."
+            )
+        items = [(item, (entries[item],)) for item in checkpoint.items]
+        return run_batch(items, generate_entry, checkpoint, workers)
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    """
+    Main function to parse arguments and call the bulk key generation function.
+    """
+    parser = argparse.ArgumentParser(
+        description="Generates the keys listed in a CSV or JSONL manifest in parallel. Entries with \
+        num_shares are split as in GenerateSplitKeys.py, the others are saved as in GenerateKeys.py. \
+        Finished keys are recorded in a checkpoint manifest, so an interrupted run resumes."
+    )
+    parser.add_argument(
+        "--manifest", type=str, help="path to the .csv or .jsonl manifest.", required=True
+    )
+    parser.add_argument(
+        "--checkpoint",
+        "--summary",
+        type=str,
+        help="path of the JSONL checkpoint manifest with saved paths and timings. Rerun with the same manifest to resume",
+        required=False,
+        default="bulk_checkpoint.jsonl",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        help="number of worker processes. Leave empty to use all cores",
+        required=False,
+    )
+    parser.add_argument(
+        "--overwrite",
+        action="store_true",
+        help="regenerate entries whose files already exist",
+    )
+    parser.add_argument(
+        "--restart",
+        action="store_true",
+        help="start the checkpoint manifest over instead of resuming it",
+    )
+    args = parser.parse_args(argv)
+
+    try:
+        failures = bulk_generate_keys(
+            args.manifest, args.checkpoint, args.workers, args.overwrite, args.restart
+        )
+    except Exception as e:
+        logging.error(f"Error!! {e}")
+        sys.exit(1)
+
+    logging.info(f"Checkpoint saved: {args.checkpoint}")
+    if failures:
+        logging.error(f"{failures} entries failed.")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,44 @@
 import argparse
+import binascii
+import collections
 import os
-import ast
+import sys
 import logging
-from typing import Optional
-from utils.encoding_functions import combine_secret_shares
+import tempfile
+import zlib
+from contextlib import ExitStack
+from typing import List, Optional, Tuple
+
+if not __package__:
+    # run as a script: import the csr_utils package of this checkout
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from csr_utils.utils.encoding_functions import (
+    combine_secret_shares_bytes,
+    combine_secret_shares_checked,
+    iter_combine_stream,
+)
+from csr_utils.utils.buffers import zeroize, zeroized
+from csr_utils.utils.integrity import SecretDigest, get_secret_digest, verify_chunk_digests
+from csr_utils.utils.key_encoding import (
+    decode_private_key,
+    iter_decode_private_key,
+    KEY_OUTPUT_FORMATS,
+)
+from csr_utils.utils.share_files import (
+    find_share_files,
+    get_metadata_prime,
+    open_share_file,
+    read_share_file,
+    select_share_files,
+    verify_share_file,
+)
+from csr_utils.utils.instrumentation import (
+    add_instrumentation_arguments,
+    count,
+    instrumented_run,
+    stage,
+)
 
 # Configure logging
 logging.basicConfig(
@@ -11,7 +46,20 @@ logging.basicConfig(
 )
 
 
-def combine_shares(file_name: str, folder_path: Optional[str] = None) -> None:
+class ShareIntegrityError(ValueError):
+    """
+    Raised when the key streamed from the share files is corrupt.
+    """
+
+
+def combine_shares(
+    file_name: str,
+    folder_path: Optional[str] = None,
+    workers: Optional[int] = None,
+    stream: bool = False,
+    indexes: Optional[List[int]] = None,
+    output_format: str = "pem",
+) -> str:
     """
     Combines Shamir's shares to regenerate the private key.
 
@@ -19,6 +67,19 @@ def combine_shares(file_name: str, folder_path: Optional[str] = None) -> None:
     file_name (str): The prefix of the share files.
     folder_path (Optional[str]): The directory containing the share files.
                                  Defaults to the current directory if None.
+    workers (Optional[int]): The number of worker processes used to recover the chunks.
+    stream (bool): Read the share files in lockstep chunk by chunk and write
+                   each recovered chunk right away, so memory use does not depend on the key size.
+                   If the streamed key is corrupt, the shares are combined in memory instead.
+    indexes (Optional[List[int]]): The indexes of the share files to combine. Defaults to the
+                                   first consistent share files up to the threshold. If those
+                                   do not combine to the recorded digest, all the share files
+                                   are used and the bad ones are isolated.
+    output_format (str): The format of the combined key, "pem" (default) or "der". Keys shared
+                         as DER are written back as PEM by default.
+
+    Returns:
+    str: The path of the combined private key file.
 
     Raises:
     Exception: If any error occurs during file reading or writing.
@@ -27,22 +88,220 @@ def combine_shares(file_name: str, folder_path: Optional[str] = None) -> None:
     if folder_path and not folder_path.endswith(os.sep):
         path += os.sep
 
-    shares = []
-    for name in os.listdir(path):
-        if file_name + "_private_share" in name:
-            with open(os.path.join(path, name), "r") as file:
-                share_content = ast.literal_eval(file.read())
-                shares.append(share_content)
+    combined_key_path = os.path.join(path, file_name + "_combined_private.key")
 
-    combined_key = combine_secret_shares(shares)
+    if stream:
+        share_paths = [
+            share_path
+            for share_path, _ in select_share_files(
+                _find_share_files(path, file_name), indexes
+            )
+        ]
+        try:
+            _combine_share_stream(share_paths, combined_key_path, output_format)
+            logging.info(f"Files saved: {file_name}_combined_private.key")
+            return combined_key_path
+        except ShareIntegrityError as e:
+            logging.warning(f"{e} Combining in memory to isolate the bad share files.")
 
-    with open(os.path.join(path, file_name + "_combined_private.key"), "w") as file:
-        file.write(combined_key)
+    with zeroized(
+        recover_private_key(file_name, path, workers, indexes, output_format)
+    ) as combined_key:
+        with stage("file_write"):
+            with open(combined_key_path, "wb") as file:
+                file.write(combined_key)
+        count("bytes_written", len(combined_key))
 
     logging.info(f"Files saved: {file_name}_combined_private.key")
+    return combined_key_path
+
+
+def recover_private_key(
+    file_name: str,
+    folder_path: Optional[str] = None,
+    workers: Optional[int] = None,
+    indexes: Optional[List[int]] = None,
+    output_format: str = "pem",
+) -> bytearray:
+    """
+    Combines the share files of a private key in memory, as combine_shares, and
+    returns the key without writing it to disk.
+
+    Args:
+    file_name (str): The prefix of the share files.
+    folder_path (Optional[str]): The directory containing the share files.
+    workers (Optional[int]): The number of worker processes used to recover the chunks.
+    indexes (Optional[List[int]]): The indexes of the share files to combine, as in combine_shares.
+    output_format (str): The format of the key, "pem" (default) or "der".
+
+    Returns:
+    bytearray: The private key, to be zeroized once used.
+    """
+    share_files = _find_share_files(folder_path or "", file_name)
+    share_paths = [
+        share_path for share_path, _ in select_share_files(share_files, indexes)
+    ]
+    try:
+        secret_bytes, key_encoding = _combine_share_files(share_paths, workers)
+    except ValueError as e:
+        if indexes or len(share_paths) == len(share_files):
+            raise
+        logging.warning(f"{e} Retrying with all {len(share_files)} share files.")
+        share_paths = [
+            share_path
+            for share_path, _ in select_share_files(share_files, list(share_files))
+        ]
+        secret_bytes, key_encoding = _combine_share_files(share_paths, workers)
+
+    with zeroized(secret_bytes):
+        return decode_private_key(secret_bytes, key_encoding, output_format)
+
+
+def _find_share_files(path: str, file_name: str) -> dict:
+    share_files = find_share_files(path, file_name)
+    if not share_files:
+        raise ValueError(f"No share files found for {file_name}.")
+    return share_files
+
+
+def _combine_share_files(
+    share_paths: list, workers: Optional[int] = None
+) -> Tuple[bytearray, Optional[str]]:
+    """
+    Reads the share files, leaves out the chunks that fail their digest and
+    combines the rest. With more share files than the threshold, the shares that
+    do not agree with the others are isolated and logged. The result is checked
+    against the digest of the secret recorded at split time. Returns the secret
+    bytes, in a bytearray, and their key encoding.
+    """
+    shares = []
+    prime_bits = set()
+    salts = set()
+    secret_digests = collections.Counter()
+    excluded = {}
+    for position, share_path in enumerate(share_paths):
+        metadata, share_content = read_share_file(share_path)
+        prime_bits.add(metadata.get("prime_bits"))
+        salts.add(metadata.get("salt"))
+        shares.append(share_content)
+        integrity = metadata.get("integrity")
+        if integrity:
+            secret_digests[integrity["secret_digest"]] += 1
+            bad_chunks = verify_chunk_digests(share_content, integrity["chunk_digests"])
+            if bad_chunks:
+                logging.warning(f"{share_path}: chunks {bad_chunks} fail their digest.")
+                excluded[position] = set(bad_chunks)
+
+    prime = get_metadata_prime(prime_bits)
+    threshold = metadata.get("threshold")
+    if threshold and (len(shares) > threshold or excluded):
+        secret_bytes, bad_shares = combine_secret_shares_checked(
+            shares, threshold, prime=prime, excluded=excluded, workers=workers
+        )
+        for position, bad_chunks in bad_shares.items():
+            logging.warning(
+                f"{share_paths[position]}: chunks {bad_chunks} are inconsistent with the other shares."
+            )
+    else:
+        secret_bytes = combine_secret_shares_bytes(shares, prime=prime, workers=workers)
+
+    salt = salts.pop() if len(salts) == 1 else None
+    if salt and secret_digests:
+        secret_digest = secret_digests.most_common(1)[0][0]
+        if get_secret_digest(secret_bytes, bytes.fromhex(salt)) != secret_digest:
+            zeroize(secret_bytes)
+            raise ValueError("The combined key does not match the recorded digest.")
+    return secret_bytes, metadata.get("key_encoding")
+
+
+def _combine_share_stream(
+    share_paths: list, combined_key_path: str, output_format: str = "pem"
+) -> None:
+    """
+    Recovers the key chunk by chunk from the share files and appends each chunk,
+    decoded to output_format, to a temporary file readable only by the owner.
+    The digest of the key is checked once the share files have been read to the
+    end, and only then is the temporary file moved onto the output file. It is
+    removed if combining fails, so no partly recovered key is left on disk.
+    """
+    fd, temporary_path = tempfile.mkstemp(
+        prefix=".", suffix=".tmp", dir=os.path.dirname(combined_key_path) or None
+    )
+    try:
+        with ExitStack() as stack:
+            file = stack.enter_context(os.fdopen(fd, "wb"))
+            readers = [
+                stack.enter_context(open_share_file(share_path))
+                for share_path in share_paths
+            ]
+            prime = get_metadata_prime(
+                {reader.metadata.get("prime_bits") for reader in readers}
+            )
+            salt = readers[0].metadata.get("salt")
+            secret_digest = SecretDigest(bytes.fromhex(salt)) if salt else None
+
+            def iter_chunks():
+                try:
+                    for chunk in iter_combine_stream(readers, prime=prime):
+                        if secret_digest:
+                            secret_digest.update(chunk)
+                        yield chunk
+                except ValueError as e:
+                    # a corrupted share recovers a chunk that does not decode
+                    raise ShareIntegrityError(
+                        "The combined key does not match the recorded digest."
+                    ) from e
+
+            try:
+                for data in iter_decode_private_key(
+                    iter_chunks(), readers[0].metadata.get("key_encoding"), output_format
+                ):
+                    file.write(data)
+                    count("bytes_written", len(data))
+            except (binascii.Error, zlib.error) as e:
+                raise ShareIntegrityError(
+                    "The combined key does not match the recorded digest."
+                ) from e
+
+            integrity = readers[0].metadata.get("integrity")
+            if secret_digest and integrity:
+                if secret_digest.hexdigest() != integrity["secret_digest"]:
+                    raise ShareIntegrityError(
+                        "The combined key does not match the recorded digest."
+                    )
+        os.replace(temporary_path, combined_key_path)
+    except BaseException:
+        os.remove(temporary_path)
+        raise
+
+
+def verify_shares(file_name: str, folder_path: Optional[str] = None) -> bool:
+    """
+    Checks every share file of a key against the digests recorded when it was
+    written, without combining.
 
+    Args:
+    file_name (str): The prefix of the share files.
+    folder_path (Optional[str]): The directory containing the share files.
 
-def main() -> None:
+    Returns:
+    bool: True if every share file matches its digests.
+    """
+    share_files = _find_share_files(folder_path or "", file_name)
+    valid = True
+    for share_path in share_files.values():
+        bad_chunks = verify_share_file(share_path)
+        if bad_chunks is None:
+            logging.warning(f"{share_path}: no digests recorded.")
+        elif bad_chunks:
+            logging.error(f"{share_path}: chunks {bad_chunks} fail their digest.")
+            valid = False
+        else:
+            logging.info(f"{share_path}: OK")
+    return valid
+
+
+def main(argv: Optional[List[str]] = None) -> None:
     """
     Main function to parse arguments and call the combine shares function.
     """
@@ -62,10 +321,64 @@ def main() -> None:
         required=False,
     )
 
-    args = parser.parse_args()
+    parser.add_argument(
+        "--workers",
+        type=int,
+        help="number of worker processes used to recover the chunks. Leave empty to recover them sequentially",
+        required=False,
+    )
+
+    parser.add_argument(
+        "--indexes",
+        type=int,
+        nargs="+",
+        help="indexes of the share files to combine. Leave empty to use the first ones up to the threshold",
+        required=False,
+    )
+
+    parser.add_argument(
+        "--stream",
+        action="store_true",
+        help="recover the key chunk by chunk reading only the needed share files, with constant memory use."
+        " A corrupt key is combined again in memory to isolate the bad share files",
+    )
+
+    parser.add_argument(
+        "--output_format",
+        type=str,
+        choices=KEY_OUTPUT_FORMATS,
+        help="format of the combined key. Keys shared as DER are written back as PEM by default",
+        required=False,
+        default="pem",
+    )
+
+    parser.add_argument(
+        "--verify",
+        action="store_true",
+        help="check every share file against its recorded digests without combining",
+    )
+
+    add_instrumentation_arguments(parser)
+    args = parser.parse_args(argv)
+
+    if args.verify:
+        try:
+            valid = verify_shares(args.file_name, args.folder_path)
+        except Exception as e:
+            logging.error(f"Error!! {e}")
+            valid = False
+        sys.exit(0 if valid else 1)
 
     try:
-        combine_shares(args.file_name, args.folder_path)
+        with instrumented_run("combine", args):
+            combine_shares(
+                args.file_name,
+                args.folder_path,
+                args.workers,
+                args.stream,
+                args.indexes,
+                args.output_format,
+            )
     except Exception as e:
         logging.error(f"Error!! {e}")
 
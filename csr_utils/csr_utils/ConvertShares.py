@@ -0,0 +1,50 @@
+import argparse
+import logging
+import os
+import sys
+from typing import List, Optional
+
+if not __package__:
+    # run as a script: import the csr_utils package of this checkout
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from csr_utils.utils.share_files import convert_share_file, SHARE_FORMATS
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s"
+)
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    """
+    Main function to parse arguments and call the share file conversion function.
+    """
+    parser = argparse.ArgumentParser(
+        description="Converts a share file between the JSON and the binary share formats. \
+        Share files written as a plain JSON list are converted too."
+    )
+    parser.add_argument(
+        "--input", type=str, help="path to the share file to convert.", required=True
+    )
+    parser.add_argument(
+        "--output", type=str, help="path of the converted share file.", required=True
+    )
+    parser.add_argument(
+        "--share_format",
+        type=str,
+        choices=SHARE_FORMATS,
+        help="format of the converted share file",
+        required=True,
+    )
+    args = parser.parse_args(argv)
+
+    try:
+        convert_share_file(args.input, args.output, args.share_format)
+        logging.info(f"Files saved: {args.output}")
+    except Exception as e:
+        logging.error(f"Error!! {e}")
+
+
+if __name__ == "__main__":
+    main()
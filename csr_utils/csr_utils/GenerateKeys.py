@@ -2,8 +2,25 @@ import argparse
 import os
 import sys
 import logging
-from typing import Tuple
-from utils.encoding_functions import generate_rsa_key_and_public_key
+from typing import List, Optional, Tuple
+
+if not __package__:
+    # run as a script: import the csr_utils package of this checkout
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from csr_utils.utils.keys import (
+    generate_key_and_public_key,
+    KEY_ALGORITHMS,
+    DEFAULT_KEY_ALGORITHM,
+    DEFAULT_RSA_KEY_SIZE,
+)
+from csr_utils.utils.key_pool import KeyPool
+from csr_utils.utils.instrumentation import (
+    add_instrumentation_arguments,
+    count,
+    instrumented_run,
+    stage,
+)
 
 # Configure logging
 logging.basicConfig(
@@ -11,33 +28,50 @@ logging.basicConfig(
 )
 
 
-def generate_keys(file_name: str, folder_path: str) -> Tuple[str, str]:
+def generate_keys(
+    file_name: str,
+    folder_path: str,
+    key_pool: Optional[KeyPool] = None,
+    key_algorithm: str = DEFAULT_KEY_ALGORITHM,
+    key_size: int = DEFAULT_RSA_KEY_SIZE,
+) -> Tuple[str, str]:
     """
-    Generates RSA public and private keys.
+    Generates public and private keys.
 
     Args:
     file_name (str): The base name for the key files.
     folder_path (str): The directory where the key files will be saved.
+    key_pool (Optional[KeyPool]): A pool of pre-generated private keys to take the key from.
+                                  Only RSA keys are pooled.
+    key_algorithm (str): The key algorithm, "rsa" (default), "ecdsa-p256", "ecdsa-p384" or "ed25519".
+    key_size (int): The RSA key size in bits. Ignored by the other algorithms.
 
     Returns:
-    Tuple[str, str]: A tuple containing the private key and public key.
+    Tuple[str, str]: The paths of the private key file and of the CSR file.
 
     Raises:
     Exception: If any error occurs during key generation.
     """
-    public_key, private_key = generate_rsa_key_and_public_key()
+    if key_pool and key_algorithm != "rsa":
+        raise ValueError("The key pool only holds RSA keys.")
+    private_key = key_pool.take() if key_pool else None
+    public_key, private_key = generate_key_and_public_key(
+        key_algorithm, key_size, private_key
+    )
     public_key_path = os.path.join(folder_path, f"{file_name}_public.csr")
     private_key_path = os.path.join(folder_path, f"{file_name}_private.key")
 
-    with open(public_key_path, "w") as f:
-        f.write(public_key)
-    with open(private_key_path, "w") as f:
-        f.write(private_key)
+    with stage("file_write"):
+        with open(public_key_path, "w") as f:
+            f.write(public_key)
+        with open(private_key_path, "w") as f:
+            f.write(private_key)
+    count("bytes_written", len(public_key) + len(private_key))
 
     return private_key_path, public_key_path
 
 
-def main() -> None:
+def main(argv: Optional[List[str]] = None) -> None:
     """
     Main function to parse arguments and call the key generation function.
     """
@@ -55,7 +89,29 @@ def main() -> None:
         help="path to folder in which files will be saved. Leave empty to use current directory",
         required=False,
     )
-    args = parser.parse_args()
+    parser.add_argument(
+        "--key_algorithm",
+        type=str,
+        choices=KEY_ALGORITHMS,
+        help="key algorithm. EC keys (ecdsa-p256, ecdsa-p384, ed25519) are much faster to generate and split",
+        required=False,
+        default=DEFAULT_KEY_ALGORITHM,
+    )
+    parser.add_argument(
+        "--key_size",
+        type=int,
+        help="RSA key size in bits. Ignored by the other algorithms",
+        required=False,
+        default=DEFAULT_RSA_KEY_SIZE,
+    )
+    parser.add_argument(
+        "--key_pool",
+        type=str,
+        help="path to a key pool of RSA keys filled with KeyPool.py, which this script does not refill. Leave empty to generate the key now",
+        required=False,
+    )
+    add_instrumentation_arguments(parser)
+    args = parser.parse_args(argv)
 
     if not args.file_name:
         logging.error("Invalid key file name. Length must be > 0.")
@@ -71,13 +127,18 @@ def main() -> None:
             logging.info("Aborted process.")
             sys.exit(1)
 
+    key_pool = KeyPool(args.key_pool, args.key_size) if args.key_pool else None
     try:
-        private_key_path, public_key_path = generate_keys(
-            args.file_name, folder_path
-        )
+        with instrumented_run("generate", args):
+            private_key_path, public_key_path = generate_keys(
+                args.file_name, folder_path, key_pool, args.key_algorithm, args.key_size
+            )
         logging.info(f"Files saved: {public_key_path}, {private_key_path}")
     except Exception as e:
         logging.error(f"Error!! {e}")
+    finally:
+        if key_pool:
+            key_pool.close()
 
 
 if __name__ == "__main__":
@@ -2,11 +2,43 @@ import argparse
 import os
 import sys
 import logging
-import json
-from typing import List
-from utils.encoding_functions import (
-    generate_rsa_key_and_public_key,
+from typing import List, Optional, Union
+
+if not __package__:
+    # run as a script: import the csr_utils package of this checkout
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from csr_utils.utils.encoding_functions import (
     split_and_encode_string,
+    SHARE_ENGINES,
+    DEFAULT_SHARE_ENGINE,
+)
+from csr_utils.utils.keys import (
+    generate_key_and_public_key,
+    KEY_ALGORITHMS,
+    DEFAULT_KEY_ALGORITHM,
+    DEFAULT_RSA_KEY_SIZE,
+)
+from csr_utils.utils.key_pool import KeyPool
+from csr_utils.utils.instrumentation import (
+    add_instrumentation_arguments,
+    count,
+    instrumented_run,
+    stage,
+)
+from csr_utils.utils.autotune import parse_chunk_size, resolve_split_parameters
+from csr_utils.utils.share_files import (
+    build_share_metadata,
+    write_share_files,
+    SHARE_FORMATS,
+    DEFAULT_SHARE_FORMAT,
+)
+from csr_utils.utils.integrity import SecretDigest
+from csr_utils.utils.key_encoding import (
+    check_key_encoding,
+    encode_private_key,
+    KEY_ENCODINGS,
+    DEFAULT_KEY_ENCODING,
 )
 
 # Configure logging
@@ -20,15 +52,39 @@ def generate_and_split_keys(
     folder_path: str,
     num_shares: int,
     num_shares_for_rebuild: int,
+    engine: str = DEFAULT_SHARE_ENGINE,
+    chunk_size: Union[int, str] = 1024,
+    prime_bits: Optional[int] = None,
+    calibrate: bool = False,
+    workers: Optional[int] = None,
+    share_format: str = DEFAULT_SHARE_FORMAT,
+    key_pool: Optional[KeyPool] = None,
+    key_algorithm: str = DEFAULT_KEY_ALGORITHM,
+    key_size: int = DEFAULT_RSA_KEY_SIZE,
+    key_encoding: str = DEFAULT_KEY_ENCODING,
 ) -> List[str]:
     """
-    Generates RSA public key and splits the private key into shares using Shamir's sharing algorithm.
+    Generates a public key and splits the private key into shares using Shamir's sharing algorithm.
 
     Args:
     file_name (str): The base name for the key files.
     folder_path (str): The directory where the key files will be saved.
     num_shares (int): The number of shares to be created.
     num_shares_for_rebuild (int): The number of shares needed to rebuild the original string.
+    engine (str): The share engine, "prime" (default), "bytes" or "gf256".
+    chunk_size (Union[int, str]): The number of characters per chunk, or "auto" to pick the
+                                  chunk size and prime with the best throughput.
+    prime_bits (Optional[int]): The bit length of the standard prime used for every chunk.
+                                Defaults to the smallest prime that fits each chunk.
+    calibrate (bool): Time the "auto" candidates on this host and cache the best one.
+    workers (Optional[int]): The number of worker processes used to split the chunks.
+    share_format (str): The share file format, "json" (default) or "binary".
+    key_pool (Optional[KeyPool]): A pool of pre-generated private keys to take the key from.
+                                  Only RSA keys are pooled.
+    key_algorithm (str): The key algorithm, "rsa" (default), "ecdsa-p256", "ecdsa-p384" or "ed25519".
+    key_size (int): The RSA key size in bits. Ignored by the other algorithms.
+    key_encoding (str): The encoding of the shared private key, "pem" (default), "der" or
+                        "der-zlib". The DER encodings need the bytes or gf256 engine.
 
     Returns:
     List[str]: A list of file paths of the saved key shares.
@@ -36,28 +92,64 @@ def generate_and_split_keys(
     Raises:
     Exception: If any error occurs during key generation or file writing.
     """
-    private_key, public_key = generate_rsa_key_and_public_key()
+    check_key_encoding(key_encoding, engine)
+    if key_pool and key_algorithm != "rsa":
+        raise ValueError("The key pool only holds RSA keys.")
+    private_key = key_pool.take() if key_pool else None
+    public_key, private_key = generate_key_and_public_key(
+        key_algorithm, key_size, private_key
+    )
     public_key_path = os.path.join(folder_path, f"{file_name}_public.csr")
-    with open(public_key_path, "w") as f:
-        f.write(public_key)
+    with stage("file_write"):
+        with open(public_key_path, "w") as f:
+            f.write(public_key)
+    count("bytes_written", len(public_key))
 
+    secret_digest = SecretDigest()
+    # the PEM text is split as a string, as before key encodings were recorded
+    secret = (
+        private_key
+        if key_encoding == "pem"
+        else encode_private_key(private_key, key_encoding)
+    )
+    chunk_size, prime = resolve_split_parameters(
+        secret, engine, chunk_size, prime_bits, calibrate
+    )
     share_chunks = split_and_encode_string(
-        private_key, k=num_shares_for_rebuild, n=num_shares, chunk_size=1024
+        secret,
+        k=num_shares_for_rebuild,
+        n=num_shares,
+        chunk_size=chunk_size,
+        engine=engine,
+        prime=prime,
+        workers=workers,
+        secret_digest=secret_digest,
     )
-    share_files = []
-    for client_n in range(num_shares):
-        client_chunks = [j[client_n] for j in share_chunks]
-        share_file_path = os.path.join(
+    share_files = [
+        os.path.join(
             folder_path, f"{file_name}_private_share_{client_n + 1}.key"
         )
-        with open(share_file_path, "w") as key_share_file:
-            key_share_file.write(json.dumps(client_chunks))
-        share_files.append(share_file_path)
+        for client_n in range(num_shares)
+    ]
+    write_share_files(
+        share_chunks,
+        share_files,
+        build_share_metadata(
+            engine,
+            num_shares_for_rebuild,
+            chunk_size,
+            prime,
+            secret_digest.salt,
+            key_encoding,
+        ),
+        share_format,
+        secret_digest.hexdigest(),
+    )
 
     return share_files
 
 
-def main() -> None:
+def main(argv: Optional[List[str]] = None) -> None:
     """
     Main function to parse arguments and call the key generation and splitting function.
     """
@@ -88,7 +180,79 @@ def main() -> None:
         required=False,
         default=2,
     )
-    args = parser.parse_args()
+    parser.add_argument(
+        "--engine",
+        type=str,
+        choices=SHARE_ENGINES,
+        help="share engine: big-prime Shamir on hex text (prime), big-prime Shamir on raw bytes (bytes) \
+        or byte-wise GF(256) Shamir (gf256)",
+        required=False,
+        default=DEFAULT_SHARE_ENGINE,
+    )
+    parser.add_argument(
+        "--chunk_size",
+        type=parse_chunk_size,
+        help='number of characters per chunk, or "auto" to pick chunk size and prime for the best throughput',
+        required=False,
+        default=1024,
+    )
+    parser.add_argument(
+        "--prime_bits",
+        type=int,
+        help="bit length of the standard prime used for every chunk. Leave empty to pick it automatically",
+        required=False,
+    )
+    parser.add_argument(
+        "--calibrate",
+        action="store_true",
+        help='time the "auto" candidates on this host and cache the best one',
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        help="number of worker processes used to split the chunks. Leave empty to split them sequentially",
+        required=False,
+    )
+    parser.add_argument(
+        "--share_format",
+        type=str,
+        choices=SHARE_FORMATS,
+        help="share file format: JSON text (json) or compact binary with a chunk index (binary)",
+        required=False,
+        default=DEFAULT_SHARE_FORMAT,
+    )
+    parser.add_argument(
+        "--key_algorithm",
+        type=str,
+        choices=KEY_ALGORITHMS,
+        help="key algorithm. EC keys (ecdsa-p256, ecdsa-p384, ed25519) are much faster to generate and split",
+        required=False,
+        default=DEFAULT_KEY_ALGORITHM,
+    )
+    parser.add_argument(
+        "--key_size",
+        type=int,
+        help="RSA key size in bits. Ignored by the other algorithms",
+        required=False,
+        default=DEFAULT_RSA_KEY_SIZE,
+    )
+    parser.add_argument(
+        "--key_encoding",
+        type=str,
+        choices=KEY_ENCODINGS,
+        help="encoding of the shared private key: PEM text (pem), DER bytes, about 27%% smaller (der), \
+        or zlib-compressed DER (der-zlib). The DER encodings need the bytes or gf256 engine",
+        required=False,
+        default=DEFAULT_KEY_ENCODING,
+    )
+    parser.add_argument(
+        "--key_pool",
+        type=str,
+        help="path to a key pool of RSA keys filled with KeyPool.py, which this script does not refill. Leave empty to generate the key now",
+        required=False,
+    )
+    add_instrumentation_arguments(parser)
+    args = parser.parse_args(argv)
 
     if not args.file_name:
         logging.error("Invalid file name. Length must be > 0.")
@@ -104,13 +268,31 @@ def main() -> None:
             logging.info("Aborted process.")
             sys.exit(1)
 
+    key_pool = KeyPool(args.key_pool, args.key_size) if args.key_pool else None
     try:
-        share_files = generate_and_split_keys(
-            args.file_name, folder_path, args.num_shares, args.num_shares_for_rebuild
-        )
+        with instrumented_run("generate-split", args):
+            share_files = generate_and_split_keys(
+                args.file_name,
+                folder_path,
+                args.num_shares,
+                args.num_shares_for_rebuild,
+                args.engine,
+                args.chunk_size,
+                args.prime_bits,
+                args.calibrate,
+                args.workers,
+                args.share_format,
+                key_pool,
+                args.key_algorithm,
+                args.key_size,
+                args.key_encoding,
+            )
         logging.info(f'Files saved: {", ".join(share_files)}')
     except Exception as e:
         logging.error(f"Error!! {e}")
+    finally:
+        if key_pool:
+            key_pool.close()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,112 @@
+import argparse
+import json
+import os
+import sys
+import time
+import logging
+from typing import List, Optional
+
+if not __package__:
+    # run as a script: import the csr_utils package of this checkout
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from csr_utils.utils.key_pool import (
+    KeyPool,
+    KEY_POOL_PATH,
+    DEFAULT_POOL_SIZE,
+)
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s"
+)
+
+
+def watch_key_pool(key_pool: KeyPool, interval: int = 60) -> None:
+    """
+    Keeps the pool refilled in the background and logs its metrics until interrupted.
+
+    Args:
+    key_pool (KeyPool): The pool to keep filled.
+    interval (int): Seconds between two metrics logs.
+    """
+    key_pool.start()
+    try:
+        while True:
+            time.sleep(interval)
+            logging.info(f"Key pool metrics: {json.dumps(key_pool.get_metrics())}")
+    except KeyboardInterrupt:
+        logging.info("Stopped.")
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    """
+    Main function to parse arguments and fill, watch or inspect a key pool.
+    """
+    parser = argparse.ArgumentParser(
+        description="Fills a pool of pre-generated RSA private keys used by GenerateKeys.py and \
+        GenerateSplitKeys.py with --key_pool, so that keys are handed out without waiting for key generation."
+    )
+    parser.add_argument(
+        "--key_pool",
+        type=str,
+        help="path to the key pool folder.",
+        required=False,
+        default=KEY_POOL_PATH,
+    )
+    parser.add_argument(
+        "--bits", type=int, help="RSA key size", required=False, default=4096
+    )
+    parser.add_argument(
+        "--size",
+        type=int,
+        help="number of keys the pool is filled up to",
+        required=False,
+        default=DEFAULT_POOL_SIZE,
+    )
+    parser.add_argument(
+        "--low_watermark",
+        type=int,
+        help="number of keys below which the pool is refilled when watching. Defaults to a quarter of the size",
+        required=False,
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        help="number of worker processes generating keys. Leave empty to use all cores",
+        required=False,
+    )
+    parser.add_argument(
+        "--watch",
+        action="store_true",
+        help="keep refilling the pool below the low watermark until interrupted",
+    )
+    parser.add_argument(
+        "--metrics",
+        action="store_true",
+        help="print the hit/miss and refill metrics of the pool and exit",
+    )
+    args = parser.parse_args(argv)
+
+    try:
+        with KeyPool(
+            args.key_pool, args.bits, args.size, args.low_watermark, args.workers
+        ) as key_pool:
+            if args.metrics:
+                metrics = key_pool.load_metrics()
+                metrics["available"] = key_pool.available()
+                print(json.dumps(metrics, indent=2))
+            elif args.watch:
+                watch_key_pool(key_pool)
+            else:
+                added = key_pool.refill()
+                logging.info(
+                    f"Added {added} keys, {key_pool.available()} available in {key_pool.path}"
+                )
+    except Exception as e:
+        logging.error(f"Error!! {e}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
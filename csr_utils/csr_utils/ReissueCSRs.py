@@ -0,0 +1,250 @@
+import argparse
+import os
+import sys
+import time
+import logging
+from typing import Any, Dict, List, Optional
+
+if not __package__:
+    # run as a script: import the csr_utils package of this checkout
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from csr_utils.BulkGenerateKeys import read_manifest_entries
+from csr_utils.CombineShares import recover_private_key
+from csr_utils.utils.batch import Checkpoint, run_batch
+from csr_utils.utils.buffers import zeroized
+from csr_utils.utils.keys import (
+    build_csr,
+    load_private_key,
+    parse_san_template,
+    parse_subject_template,
+    DEFAULT_CSR_SUBJECT,
+)
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s"
+)
+
+
+def read_reissue_manifest(
+    manifest_path: str, subject: str = DEFAULT_CSR_SUBJECT, san: Optional[str] = None
+) -> List[Dict[str, Any]]:
+    """
+    Reads a CSR re-issuance manifest.
+
+    The manifest is a CSV file with a header row or a JSONL file with one object
+    per line. Recognised fields are file_name (required), folder_path, key_path,
+    subject, san and csr_path; every field can also be used as a {field}
+    placeholder in the subject and san templates. Entries without key_path use
+    file_name_private.key in folder_path if it exists, and otherwise recombine
+    the key from its share files in memory.
+
+    Args:
+    manifest_path (str): The path to the .csv or .jsonl manifest.
+    subject (str): The subject template of the entries without one.
+    san (Optional[str]): The subject alternative name template of the entries without one.
+
+    Returns:
+    List[Dict[str, Any]]: The manifest entries.
+
+    Raises:
+    ValueError: If an entry has no file_name, an invalid template or the csr_path of another entry.
+    """
+    entries = read_manifest_entries(manifest_path)
+    csr_paths = set()
+    for line_number, entry in enumerate(entries, start=1):
+        if not entry.get("file_name"):
+            raise ValueError(f"Manifest entry {line_number} has no file_name.")
+        folder_path = entry["folder_path"] = entry.get("folder_path") or ""
+        entry["subject"] = entry.get("subject") or subject
+        entry["san"] = entry.get("san") or san
+        try:
+            # checked here so that a bad template stops the run before any CSR is signed
+            parse_subject_template(entry["subject"])
+            if entry["san"]:
+                parse_san_template(entry["san"])
+        except ValueError as e:
+            raise ValueError(f"Manifest entry {line_number}: {e}")
+        if not entry.get("key_path"):
+            key_path = os.path.join(folder_path, f"{entry['file_name']}_private.key")
+            entry["key_path"] = key_path if os.path.exists(key_path) else None
+        entry["csr_path"] = entry.get("csr_path") or os.path.join(
+            folder_path, f"{entry['file_name']}_public.csr"
+        )
+        if entry["csr_path"] in csr_paths:
+            raise ValueError(
+                f"Manifest entry {line_number} writes {entry['csr_path']} as well."
+            )
+        csr_paths.add(entry["csr_path"])
+    return entries
+
+
+def reissue_entry(entry: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Signs a new CSR for the existing private key of one manifest entry. Runs in
+    a worker process.
+
+    Args:
+    entry (Dict[str, Any]): A manifest entry as returned by read_reissue_manifest.
+
+    Returns:
+    Dict[str, Any]: The CSR path, the key source and the elapsed time, recorded in the checkpoint manifest.
+    """
+    start = time.perf_counter()
+    if entry["key_path"]:
+        # read into one buffer, which is zeroized once the key is loaded
+        with open(entry["key_path"], "rb") as file:
+            key_bytes = bytearray(os.fstat(file.fileno()).st_size)
+            del key_bytes[file.readinto(key_bytes) :]
+        key_source = entry["key_path"]
+    else:
+        key_bytes = recover_private_key(entry["file_name"], entry["folder_path"])
+        key_source = "shares"
+    with zeroized(key_bytes):
+        private_key = load_private_key(key_bytes)
+
+    csr = build_csr(private_key, entry["subject"], entry["san"], entry)
+    with open(entry["csr_path"], "w") as file:
+        file.write(csr)
+
+    return {
+        "file_name": entry["file_name"],
+        "folder_path": entry["folder_path"],
+        "key_source": key_source,
+        "csr_path": entry["csr_path"],
+        "seconds": round(time.perf_counter() - start, 6),
+    }
+
+
+def reissue_csrs(
+    manifest_path: str,
+    checkpoint_path: str,
+    subject: str = DEFAULT_CSR_SUBJECT,
+    san: Optional[str] = None,
+    workers: Optional[int] = None,
+    overwrite: bool = False,
+    restart: bool = False,
+) -> int:
+    """
+    Signs new CSRs for the existing private keys listed in a manifest, as
+    BatchCombineShares.py, in a process pool. No key is generated: each key is
+    read from its key file or recombined in memory from its share files. Entries
+    whose CSR file already exists are skipped unless overwrite is set. The CSR
+    path, key source and signing time of every entry are recorded in the
+    checkpoint manifest, so rerunning with the same manifest resumes an
+    interrupted run.
+
+    Args:
+    manifest_path (str): The path to the .csv or .jsonl manifest.
+    checkpoint_path (str): The path of the JSONL checkpoint manifest.
+    subject (str): The subject template of the entries without one.
+    san (Optional[str]): The subject alternative name template of the entries without one.
+    workers (Optional[int]): Number of worker processes. Defaults to the number of cores.
+    overwrite (bool): Sign again the entries whose CSR file already exists.
+    restart (bool): Start the checkpoint manifest over instead of resuming it.
+
+    Returns:
+    int: The number of entries that failed.
+    """
+    entries = {
+        entry["csr_path"]: entry
+        for entry in read_reissue_manifest(manifest_path, subject, san)
+    }
+    parameters = {
+        "manifest": os.path.abspath(manifest_path),
+        "subject": subject,
+        "san": san,
+    }
+    with Checkpoint(checkpoint_path, "reissue", parameters, restart) as checkpoint:
+        if checkpoint.items is None:
+            items = []
+            for csr_path in entries:
+                if not overwrite and os.path.exists(csr_path):
+                    logging.info(f"Skipped {csr_path}: it already exists.")
+                    continue
+                items.append(csr_path)
+            checkpoint.start(items)
+            logging.info(f"Found {len(checkpoint.items)} CSRs to sign in {manifest_path}.")
+        missing = [item for item in checkpoint.items if item not in entries]
+        if missing:
+            raise ValueError(
+                f"{checkpoint_path} lists CSRs that are no longer in {manifest_path}: "
+                f"{missing}. Pass --restart to start over."
+            )
+        items = [(item, (entries[item],)) for item in checkpoint.items]
+        return run_batch(items, reissue_entry, checkpoint, workers)
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    """
+    Main function to parse arguments and call the CSR re-issuance function.
+    """
+    parser = argparse.ArgumentParser(
+        description="Signs new CSRs for the existing private keys listed in a CSV or JSONL manifest in \
+        parallel, from key files or share files, with per-key subject and subject alternative name templates. \
+        Finished CSRs are recorded in a checkpoint manifest, so an interrupted run resumes."
+    )
+    parser.add_argument(
+        "--manifest", type=str, help="path to the .csv or .jsonl manifest.", required=True
+    )
+    parser.add_argument(
+        "--checkpoint",
+        type=str,
+        help="path of the JSONL checkpoint manifest with CSR paths and timings. Rerun with the same manifest to resume",
+        required=False,
+        default="reissue_checkpoint.jsonl",
+    )
+    parser.add_argument(
+        "--subject",
+        type=str,
+        help='subject template of the entries without one, e.g. "C=IT,O=Colossus,CN={file_name}.colossus.digital"',
+        required=False,
+        default=DEFAULT_CSR_SUBJECT,
+    )
+    parser.add_argument(
+        "--san",
+        type=str,
+        help='subject alternative name template of the entries without one, e.g. "DNS:{file_name}.colossus.digital"',
+        required=False,
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        help="number of worker processes. Leave empty to use all cores",
+        required=False,
+    )
+    parser.add_argument(
+        "--overwrite",
+        action="store_true",
+        help="sign again the entries whose CSR file already exists",
+    )
+    parser.add_argument(
+        "--restart",
+        action="store_true",
+        help="start the checkpoint manifest over instead of resuming it",
+    )
+    args = parser.parse_args(argv)
+
+    try:
+        failures = reissue_csrs(
+            args.manifest,
+            args.checkpoint,
+            args.subject,
+            args.san,
+            args.workers,
+            args.overwrite,
+            args.restart,
+        )
+    except Exception as e:
+        logging.error(f"Error!! {e}")
+        sys.exit(1)
+
+    logging.info(f"Checkpoint saved: {args.checkpoint}")
+    if failures:
+        logging.error(f"{failures} entries failed.")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,434 @@
+import argparse
+import os
+import sys
+import time
+import logging
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from contextlib import ExitStack
+from typing import Any, Dict, List, Optional, Union
+
+if not __package__:
+    # run as a script: import the csr_utils package of this checkout
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from csr_utils.utils.encoding_functions import (
+    iter_combine_stream,
+    iter_split_stream,
+    SHARE_ENGINES,
+)
+from csr_utils.utils.autotune import parse_chunk_size, resolve_split_parameters
+from csr_utils.utils.share_files import (
+    build_share_metadata,
+    find_share_files,
+    find_share_keys,
+    get_metadata_prime,
+    is_binary_share_file,
+    open_share_file,
+    select_share_files,
+    write_share_stream,
+    SHARE_FORMATS,
+)
+from csr_utils.utils.buffers import zeroize
+from csr_utils.utils.integrity import SecretDigest
+from csr_utils.utils.key_encoding import check_key_encoding
+from csr_utils.utils.instrumentation import add_instrumentation_arguments, instrumented_run
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s"
+)
+
+
+class _ChunkReader:
+    """
+    Reads the chunks yielded by a generator as a binary stream, so the
+    recovered chunks can be split again with a different chunk size. The
+    chunks are copied through memoryview slices straight into the buffer of
+    readinto, so no copy of the key is made, and each chunk is zeroized once
+    consumed.
+    """
+
+    def __init__(self, chunks):
+        self.chunks = chunks
+        self.chunk = bytearray()
+        self.offset = 0
+
+    def readinto(self, buffer):
+        view = memoryview(buffer).cast("B")
+        size = 0
+        while size < len(view):
+            if self.offset == len(self.chunk):
+                zeroize(self.chunk)
+                self.chunk = next(self.chunks, None)
+                self.offset = 0
+                if self.chunk is None:
+                    self.chunk = bytearray()
+                    break
+            step = min(len(view) - size, len(self.chunk) - self.offset)
+            view[size : size + step] = memoryview(self.chunk)[
+                self.offset : self.offset + step
+            ]
+            size += step
+            self.offset += step
+        return size
+
+    def close(self):
+        zeroize(self.chunk)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+def _iter_recovered_chunks(readers, prime):
+    """
+    Yields the chunks recovered from the share files and checks them against
+    the recorded digest of the key once the last one has been read.
+    """
+    salt = readers[0].metadata.get("salt")
+    secret_digest = SecretDigest(bytes.fromhex(salt)) if salt else None
+    for chunk in iter_combine_stream(readers, prime=prime):
+        if secret_digest:
+            secret_digest.update(chunk)
+        yield chunk
+    # JSON share files have their integrity trailer parsed once read to the end
+    integrity = readers[0].metadata.get("integrity")
+    if secret_digest and integrity:
+        if secret_digest.hexdigest() != integrity["secret_digest"]:
+            raise ValueError(
+                "The recovered key does not match the recorded digest. "
+                "Check the share files with CombineShares.py --verify."
+            )
+
+
+def reshare_shares(
+    file_name: str,
+    folder_path: str,
+    output_path: str,
+    num_shares: int,
+    num_shares_for_rebuild: int,
+    engine: Optional[str] = None,
+    chunk_size: Optional[Union[int, str]] = None,
+    prime_bits: Optional[int] = None,
+    share_format: Optional[str] = None,
+    indexes: Optional[List[int]] = None,
+) -> List[str]:
+    """
+    Splits a key again into new shares for a new threshold, straight from its
+    share files. The share files are read in lockstep and every recovered chunk
+    is split and appended to the new share files right away, so the key is
+    never written to disk and only one chunk of it is held in memory.
+
+    Args:
+    file_name (str): The prefix of the share files.
+    folder_path (str): The directory containing the share files.
+    output_path (str): The directory where the new share files will be saved. Must differ
+                       from folder_path, so the old share files are never overwritten.
+    num_shares (int): The number of new shares.
+    num_shares_for_rebuild (int): The number of new shares needed to rebuild the key.
+    engine (Optional[str]): The share engine of the new shares. Defaults to the engine of the old shares.
+    chunk_size (Optional[Union[int, str]]): The number of bytes per chunk, or "auto". Defaults to
+                                            the chunk size of the old shares.
+    prime_bits (Optional[int]): The bit length of the standard prime. Defaults to the prime of the
+                                old shares when the engine and the chunk size are unchanged.
+    share_format (Optional[str]): The share file format. Defaults to the format of the old shares.
+    indexes (Optional[List[int]]): The indexes of the share files to read. Defaults to the
+                                   first consistent share files up to the threshold.
+
+    Returns:
+    List[str]: The paths of the new share files.
+
+    Raises:
+    ValueError: If output_path is folder_path, no share files are found or the recovered key
+                does not match its recorded digest.
+    """
+    if os.path.realpath(output_path or ".") == os.path.realpath(folder_path or "."):
+        raise ValueError("The new share files must be saved to another folder.")
+    share_files = find_share_files(folder_path, file_name)
+    if not share_files:
+        raise ValueError(f"No share files found for {file_name}.")
+    selected = select_share_files(share_files, indexes)
+    metadata = selected[0][1]
+
+    if engine is None or engine == metadata.get("engine"):
+        engine = metadata.get("engine") or "prime"
+        if chunk_size is None and prime_bits is None:
+            prime_bits = metadata.get("prime_bits")
+    if chunk_size is None:
+        chunk_size = metadata.get("chunk_size") or 1024
+    if share_format is None:
+        share_format = "binary" if is_binary_share_file(selected[0][0]) else "json"
+    key_encoding = metadata.get("key_encoding") or "pem"
+    check_key_encoding(key_encoding, engine)
+    chunk_size, prime = resolve_split_parameters(b"", engine, chunk_size, prime_bits)
+
+    os.makedirs(output_path, exist_ok=True)
+    new_share_files = [
+        os.path.join(output_path, f"{file_name}_private_share_{client_n + 1}.key")
+        for client_n in range(num_shares)
+    ]
+    new_secret_digest = SecretDigest()
+    try:
+        with ExitStack() as stack:
+            readers = [
+                stack.enter_context(open_share_file(share_path))
+                for share_path, _ in selected
+            ]
+            old_prime = get_metadata_prime(
+                {reader.metadata.get("prime_bits") for reader in readers}
+            )
+            chunks = stack.enter_context(
+                _ChunkReader(_iter_recovered_chunks(readers, old_prime))
+            )
+            write_share_stream(
+                iter_split_stream(
+                    chunks,
+                    k=num_shares_for_rebuild,
+                    n=num_shares,
+                    chunk_size=chunk_size,
+                    engine=engine,
+                    prime=prime,
+                    secret_digest=new_secret_digest,
+                ),
+                new_share_files,
+                build_share_metadata(
+                    engine,
+                    num_shares_for_rebuild,
+                    chunk_size,
+                    prime,
+                    new_secret_digest.salt,
+                    key_encoding,
+                ),
+                share_format,
+                new_secret_digest,
+            )
+    except Exception:
+        for path in new_share_files:
+            if os.path.exists(path):
+                os.remove(path)
+        raise
+    return new_share_files
+
+
+def reshare_entry(
+    folder_path: str, file_name: str, output_path: str, *args: Any
+) -> Dict[str, Any]:
+    """
+    Reshares the share files of one key found by reshare_tree. Runs in a
+    worker process.
+    """
+    start = time.perf_counter()
+    paths = reshare_shares(file_name, folder_path, output_path, *args)
+    return {
+        "file_name": file_name,
+        "folder_path": folder_path,
+        "paths": paths,
+        "seconds": round(time.perf_counter() - start, 6),
+    }
+
+
+def reshare_tree(
+    root: str,
+    output_root: str,
+    num_shares: int,
+    num_shares_for_rebuild: int,
+    engine: Optional[str] = None,
+    chunk_size: Optional[Union[int, str]] = None,
+    prime_bits: Optional[int] = None,
+    share_format: Optional[str] = None,
+    workers: Optional[int] = None,
+) -> int:
+    """
+    Reshares every key with share files under a directory tree using a process
+    pool. The new share files are saved under output_root in the same relative
+    folders.
+
+    Args:
+    root (str): The root of the directory tree with the share files.
+    output_root (str): The root of the directory tree where the new share files will be saved.
+    num_shares (int): The number of new shares of every key.
+    num_shares_for_rebuild (int): The number of new shares needed to rebuild every key.
+    engine (Optional[str]): The share engine of the new shares, as in reshare_shares.
+    chunk_size (Optional[Union[int, str]]): The number of bytes per chunk, as in reshare_shares.
+    prime_bits (Optional[int]): The bit length of the standard prime, as in reshare_shares.
+    share_format (Optional[str]): The share file format, as in reshare_shares.
+    workers (Optional[int]): Number of worker processes. Defaults to the number of cores.
+
+    Returns:
+    int: The number of keys that failed.
+    """
+    output_root = os.path.realpath(output_root)
+    keys = [
+        (folder_path, file_name)
+        for folder_path, file_name in find_share_keys(root)
+        # a rerun into a folder under root would otherwise reshare its own output
+        if not os.path.realpath(folder_path).startswith(output_root + os.sep)
+        and os.path.realpath(folder_path) != output_root
+    ]
+    if not keys:
+        raise ValueError(f"No share files found under {root}.")
+
+    failures = 0
+    with ProcessPoolExecutor(max_workers=workers or os.cpu_count()) as executor:
+        futures = {
+            executor.submit(
+                reshare_entry,
+                folder_path,
+                file_name,
+                os.path.join(output_root, os.path.relpath(folder_path, root)),
+                num_shares,
+                num_shares_for_rebuild,
+                engine,
+                chunk_size,
+                prime_bits,
+                share_format,
+            ): (folder_path, file_name)
+            for folder_path, file_name in keys
+        }
+        for future in as_completed(futures):
+            folder_path, file_name = futures[future]
+            try:
+                record = future.result()
+                logging.info(
+                    f"Reshared {os.path.join(folder_path, file_name)} in {record['seconds']:.2f}s"
+                )
+            except Exception as e:
+                failures += 1
+                logging.error(f"Error!! {os.path.join(folder_path, file_name)}: {e}")
+
+    return failures
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    """
+    Main function to parse arguments and call the reshare function.
+    """
+    parser = argparse.ArgumentParser(
+        description="Splits a key again into shares for a new threshold straight from its share files, \
+        without writing the key to disk"
+    )
+    parser.add_argument(
+        "--file_name",
+        type=str,
+        help="name of key files. Leave empty with --recursive to reshare every key under folder_path",
+        required=False,
+    )
+    parser.add_argument(
+        "--folder_path",
+        type=str,
+        help="path to folder with share files. Leave empty if files are in current directory",
+        required=False,
+    )
+    parser.add_argument(
+        "--output_path",
+        type=str,
+        help="path to folder in which the new share files will be saved. Must differ from folder_path",
+        required=True,
+    )
+    parser.add_argument(
+        "--num_shares",
+        type=int,
+        help="number of new shares",
+        required=False,
+        default=4,
+    )
+    parser.add_argument(
+        "--num_shares_for_rebuild",
+        type=int,
+        help="number of new shares needed to rebuild the key. Must be <= num_shares.",
+        required=False,
+        default=2,
+    )
+    parser.add_argument(
+        "--engine",
+        type=str,
+        choices=SHARE_ENGINES,
+        help="share engine of the new shares. Leave empty to keep the engine of the old shares",
+        required=False,
+    )
+    parser.add_argument(
+        "--chunk_size",
+        type=parse_chunk_size,
+        help='number of bytes per chunk, or "auto". Leave empty to keep the chunk size of the old shares',
+        required=False,
+    )
+    parser.add_argument(
+        "--prime_bits",
+        type=int,
+        help="bit length of the standard prime used for every chunk. Leave empty to pick it automatically",
+        required=False,
+    )
+    parser.add_argument(
+        "--share_format",
+        type=str,
+        choices=SHARE_FORMATS,
+        help="share file format of the new shares. Leave empty to keep the format of the old shares",
+        required=False,
+    )
+    parser.add_argument(
+        "--indexes",
+        type=int,
+        nargs="+",
+        help="indexes of the share files to read. Leave empty to use the first ones up to the threshold",
+        required=False,
+    )
+    parser.add_argument(
+        "--recursive",
+        action="store_true",
+        help="reshare every key with share files under folder_path into the same folders under output_path",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        help="number of worker processes used with --recursive. Leave empty to use all cores",
+        required=False,
+    )
+    add_instrumentation_arguments(parser)
+    args = parser.parse_args(argv)
+
+    if not args.recursive and not args.file_name:
+        logging.error("file_name is required without --recursive.")
+        sys.exit(1)
+
+    try:
+        with instrumented_run("reshare", args):
+            if args.recursive:
+                failures = reshare_tree(
+                    args.folder_path or ".",
+                    args.output_path,
+                    args.num_shares,
+                    args.num_shares_for_rebuild,
+                    args.engine,
+                    args.chunk_size,
+                    args.prime_bits,
+                    args.share_format,
+                    args.workers,
+                )
+            else:
+                share_files = reshare_shares(
+                    args.file_name,
+                    args.folder_path or "",
+                    args.output_path,
+                    args.num_shares,
+                    args.num_shares_for_rebuild,
+                    args.engine,
+                    args.chunk_size,
+                    args.prime_bits,
+                    args.share_format,
+                    args.indexes,
+                )
+                failures = 0
+                logging.info(f'Files saved: {", ".join(share_files)}')
+    except Exception as e:
+        logging.error(f"Error!! {e}")
+        sys.exit(1)
+
+    if failures:
+        logging.error(f"{failures} keys failed.")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+import argparse
+import asyncio
+import os
+import sys
+import logging
+from typing import List, Optional
+
+if not __package__:
+    # run as a script: import the csr_utils package of this checkout
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from csr_utils.utils.daemon import (
+    Daemon,
+    DEFAULT_BATCH_WINDOW_MS,
+    DEFAULT_MAX_BATCH,
+    DEFAULT_SOCKET_PATH,
+)
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s"
+)
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    """
+    Main function to parse arguments and serve requests until interrupted.
+    """
+    parser = argparse.ArgumentParser(
+        description="Keeps a pool of warm worker processes and serves generate, split and combine \
+        requests sent as JSON lines over a Unix domain socket. Use ServeClient.py to send requests."
+    )
+    parser.add_argument(
+        "--socket_path",
+        type=str,
+        help="path of the Unix domain socket",
+        required=False,
+        default=DEFAULT_SOCKET_PATH,
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        help="number of worker processes. Leave empty to use all cores",
+        required=False,
+    )
+    parser.add_argument(
+        "--max_batch",
+        type=int,
+        help="maximum number of requests handed to a worker at once",
+        required=False,
+        default=DEFAULT_MAX_BATCH,
+    )
+    parser.add_argument(
+        "--batch_window_ms",
+        type=float,
+        help="milliseconds a free worker waits for more requests to fill its batch",
+        required=False,
+        default=DEFAULT_BATCH_WINDOW_MS,
+    )
+    parser.add_argument(
+        "--stats_interval",
+        type=int,
+        help="seconds between two logs of the queue depth and latency. Leave empty to disable",
+        required=False,
+    )
+    args = parser.parse_args(argv)
+
+    try:
+        daemon = Daemon(
+            args.socket_path, args.workers, args.max_batch, args.batch_window_ms
+        )
+        asyncio.run(daemon.serve(args.stats_interval))
+    except Exception as e:
+        logging.error(f"Error!! {e}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
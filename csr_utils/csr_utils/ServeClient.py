@@ -0,0 +1,62 @@
+import argparse
+import json
+import os
+import sys
+import logging
+from typing import List, Optional
+
+if not __package__:
+    # run as a script: import the csr_utils package of this checkout
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from csr_utils.utils.daemon import DaemonClient, DEFAULT_SOCKET_PATH, OPERATIONS, STATS_OP
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s"
+)
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    """
+    Main function to parse arguments and send one request to the daemon.
+    """
+    parser = argparse.ArgumentParser(
+        description="Sends a request to the daemon started with Serve.py and prints its result as JSON."
+    )
+    parser.add_argument(
+        "op",
+        choices=[*OPERATIONS, STATS_OP],
+        help="operation to run, or stats for the queue depth and latency of the daemon",
+    )
+    parser.add_argument(
+        "--args",
+        type=str,
+        help='keyword arguments of the operation as a JSON object, e.g. \'{"file_name": "my_key", "folder_path": "/abs/path"}\'. \
+        Relative paths are resolved in the working directory of the daemon',
+        required=False,
+        default="{}",
+    )
+    parser.add_argument(
+        "--socket_path",
+        type=str,
+        help="path of the Unix domain socket",
+        required=False,
+        default=DEFAULT_SOCKET_PATH,
+    )
+    parser.add_argument(
+        "--timeout", type=float, help="seconds to wait for the response", required=False
+    )
+    args = parser.parse_args(argv)
+
+    try:
+        with DaemonClient(args.socket_path, args.timeout) as client:
+            result = client.request(args.op, **json.loads(args.args))
+        print(json.dumps(result, indent=2))
+    except Exception as e:
+        logging.error(f"Error!! {e}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -2,9 +2,40 @@ import argparse
 import os
 import sys
 import logging
-import json
-from typing import List
-from utils.encoding_functions import split_and_encode_string
+from typing import List, Optional, Union
+
+if not __package__:
+    # run as a script: import the csr_utils package of this checkout
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from csr_utils.utils.encoding_functions import (
+    iter_split_stream,
+    split_and_encode_string,
+    SHARE_ENGINES,
+    DEFAULT_SHARE_ENGINE,
+)
+from csr_utils.utils.autotune import parse_chunk_size, resolve_split_parameters
+from csr_utils.utils.share_files import (
+    build_share_metadata,
+    write_share_files,
+    write_share_stream,
+    SHARE_FORMATS,
+    DEFAULT_SHARE_FORMAT,
+)
+from csr_utils.utils.buffers import zeroized
+from csr_utils.utils.integrity import SecretDigest
+from csr_utils.utils.key_encoding import (
+    check_key_encoding,
+    encode_private_key,
+    KEY_ENCODINGS,
+    DEFAULT_KEY_ENCODING,
+)
+from csr_utils.utils.instrumentation import (
+    add_instrumentation_arguments,
+    count,
+    instrumented_run,
+    stage,
+)
 
 # Configure logging
 logging.basicConfig(
@@ -17,6 +48,14 @@ def split_string_into_shares(
     file_name: str,
     num_shares: int,
     num_shares_for_rebuild: int,
+    engine: str = DEFAULT_SHARE_ENGINE,
+    chunk_size: Union[int, str] = 1024,
+    prime_bits: Optional[int] = None,
+    calibrate: bool = False,
+    workers: Optional[int] = None,
+    stream: bool = False,
+    share_format: str = DEFAULT_SHARE_FORMAT,
+    key_encoding: str = DEFAULT_KEY_ENCODING,
 ) -> List[str]:
     """
     Splits a string into different shares using Shamir's secret sharing algorithm.
@@ -26,6 +65,19 @@ def split_string_into_shares(
     file_name (str): The name of the key file.
     num_shares (int): The number of shares to be created.
     num_shares_for_rebuild (int): The number of shares needed to rebuild the original string.
+    engine (str): The share engine, "prime" (default), "bytes" or "gf256".
+    chunk_size (Union[int, str]): The number of characters per chunk, or "auto" to pick the
+                                  chunk size and prime with the best throughput.
+    prime_bits (Optional[int]): The bit length of the standard prime used for every chunk.
+                                Defaults to the smallest prime that fits each chunk.
+    calibrate (bool): Time the "auto" candidates on this host and cache the best one.
+    workers (Optional[int]): The number of worker processes used to split the chunks.
+    stream (bool): Read the file as binary chunk by chunk and append the shares of each chunk
+                   to the share files, so memory use does not depend on the file size.
+    share_format (str): The share file format, "json" (default) or "binary".
+    key_encoding (str): The encoding of the shared key, "pem" (default) to split the file as it
+                        is, "der" or "der-zlib" to split the DER bytes of a PKCS8 PEM key. The
+                        DER encodings need the bytes or gf256 engine and cannot be streamed.
 
     Returns:
     List[str]: A list of file paths of the saved key shares.
@@ -33,27 +85,94 @@ def split_string_into_shares(
     Raises:
     Exception: If any error occurs during the splitting process or file writing.
     """
-    with open(os.path.join(path_to_key, file_name), "r") as file:
-        secret_string = file.read()
-
-    share_chunks = split_and_encode_string(
-        secret_string, k=num_shares_for_rebuild, n=num_shares, chunk_size=1024
-    )
-    share_files = []
-    for client_n in range(num_shares):
-        client_chunks = [j[client_n] for j in share_chunks]
-        share_file_path = os.path.join(
+    share_files = [
+        os.path.join(
             path_to_key,
             file_name.replace(".key", "") + f"_share_{client_n + 1}.key",
         )
-        with open(share_file_path, "w") as key_share_file:
-            key_share_file.write(json.dumps(client_chunks))
-        share_files.append(share_file_path)
+        for client_n in range(num_shares)
+    ]
+
+    check_key_encoding(key_encoding, engine)
+    if stream and key_encoding != "pem":
+        raise ValueError("The DER key encodings cannot be streamed.")
+
+    secret_digest = SecretDigest()
+    if stream:
+        # chunks are read as bytes, so "auto" needs no room for multi-byte characters
+        chunk_size, prime = resolve_split_parameters(
+            b"", engine, chunk_size, prime_bits, calibrate
+        )
+        with open(os.path.join(path_to_key, file_name), "rb") as file:
+            write_share_stream(
+                iter_split_stream(
+                    file,
+                    k=num_shares_for_rebuild,
+                    n=num_shares,
+                    chunk_size=chunk_size,
+                    engine=engine,
+                    prime=prime,
+                    secret_digest=secret_digest,
+                ),
+                share_files,
+                build_share_metadata(
+                    engine,
+                    num_shares_for_rebuild,
+                    chunk_size,
+                    prime,
+                    secret_digest.salt,
+                    key_encoding,
+                ),
+                share_format,
+                secret_digest,
+            )
+        return share_files
+
+    # the file is read as bytes into one buffer, which is zeroized once split
+    with stage("file_read"):
+        with open(os.path.join(path_to_key, file_name), "rb") as file:
+            secret_buffer = bytearray(os.fstat(file.fileno()).st_size)
+            del secret_buffer[file.readinto(secret_buffer) :]
+    count("bytes_read", len(secret_buffer))
+
+    with zeroized(secret_buffer):
+        secret = (
+            secret_buffer
+            if key_encoding == "pem"
+            else encode_private_key(secret_buffer, key_encoding)
+        )
+        chunk_size, prime = resolve_split_parameters(
+            secret, engine, chunk_size, prime_bits, calibrate
+        )
+        share_chunks = split_and_encode_string(
+            secret,
+            k=num_shares_for_rebuild,
+            n=num_shares,
+            chunk_size=chunk_size,
+            engine=engine,
+            prime=prime,
+            workers=workers,
+            secret_digest=secret_digest,
+        )
+    write_share_files(
+        share_chunks,
+        share_files,
+        build_share_metadata(
+            engine,
+            num_shares_for_rebuild,
+            chunk_size,
+            prime,
+            secret_digest.salt,
+            key_encoding,
+        ),
+        share_format,
+        secret_digest.hexdigest(),
+    )
 
     return share_files
 
 
-def main() -> None:
+def main(argv: Optional[List[str]] = None) -> None:
     """
     Main function to parse arguments and call the string splitting function.
     """
@@ -80,7 +199,65 @@ def main() -> None:
         required=False,
         default=2,
     )
-    args = parser.parse_args()
+    parser.add_argument(
+        "--engine",
+        type=str,
+        choices=SHARE_ENGINES,
+        help="share engine: big-prime Shamir on hex text (prime), big-prime Shamir on raw bytes (bytes) \
+        or byte-wise GF(256) Shamir (gf256)",
+        required=False,
+        default=DEFAULT_SHARE_ENGINE,
+    )
+    parser.add_argument(
+        "--chunk_size",
+        type=parse_chunk_size,
+        help='number of characters per chunk, or "auto" to pick chunk size and prime for the best throughput',
+        required=False,
+        default=1024,
+    )
+    parser.add_argument(
+        "--prime_bits",
+        type=int,
+        help="bit length of the standard prime used for every chunk. Leave empty to pick it automatically",
+        required=False,
+    )
+    parser.add_argument(
+        "--calibrate",
+        action="store_true",
+        help='time the "auto" candidates on this host and cache the best one',
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        help="number of worker processes used to split the chunks. Leave empty to split them sequentially",
+        required=False,
+    )
+    parser.add_argument(
+        "--stream",
+        action="store_true",
+        help="read the file as binary chunk by chunk and write the shares as they are computed, \
+        with constant memory use",
+    )
+    parser.add_argument(
+        "--share_format",
+        type=str,
+        choices=SHARE_FORMATS,
+        help="share file format: JSON text (json) or compact binary with a chunk index (binary)",
+        required=False,
+        default=DEFAULT_SHARE_FORMAT,
+    )
+    parser.add_argument(
+        "--key_encoding",
+        type=str,
+        choices=KEY_ENCODINGS,
+        help="encoding of the shared key: the file as it is (pem), the DER bytes of a PKCS8 PEM key, \
+        about 27%% smaller (der), or zlib-compressed DER (der-zlib). The DER encodings need the bytes \
+        or gf256 engine",
+        required=False,
+        default=DEFAULT_KEY_ENCODING,
+    )
+    add_instrumentation_arguments(parser)
+    args = parser.parse_args(argv)
 
     path_to_key = args.path_to_key or ""
     if path_to_key and not path_to_key.endswith(os.sep):
@@ -105,9 +282,21 @@ def main() -> None:
         sys.exit(1)
 
     try:
-        share_files = split_string_into_shares(
-            path_to_key, file_name, args.num_shares, args.num_shares_for_rebuild
-        )
+        with instrumented_run("split", args):
+            share_files = split_string_into_shares(
+                path_to_key,
+                file_name,
+                args.num_shares,
+                args.num_shares_for_rebuild,
+                args.engine,
+                args.chunk_size,
+                args.prime_bits,
+                args.calibrate,
+                args.workers,
+                args.stream,
+                args.share_format,
+                args.key_encoding,
+            )
         logging.info(f'Files saved: {", ".join(share_files)}')
     except Exception as e:
         logging.error(f"Error!! {e}")
@@ -0,0 +1,51 @@
+"""
+Key pair and CSR generation, and Shamir secret sharing of private keys.
+
+The operations of the scripts are importable from the package:
+
+    from csr_utils import generate_and_split_keys, combine_shares
+
+They are imported on first access, so importing csr_utils is cheap and an
+operation only loads the modules it needs.
+"""
+import importlib
+
+# name: module that defines it
+_API = {
+    "generate_keys": "csr_utils.GenerateKeys",
+    "generate_and_split_keys": "csr_utils.GenerateSplitKeys",
+    "split_string_into_shares": "csr_utils.SplitKey",
+    "combine_shares": "csr_utils.CombineShares",
+    "reshare_shares": "csr_utils.ReshareKey",
+    "reshare_tree": "csr_utils.ReshareKey",
+    "bulk_generate_keys": "csr_utils.BulkGenerateKeys",
+    "batch_split_keys": "csr_utils.BatchSplitKeys",
+    "batch_combine_shares": "csr_utils.BatchCombineShares",
+    "reissue_csrs": "csr_utils.ReissueCSRs",
+    "recover_private_key": "csr_utils.CombineShares",
+    "convert_share_file": "csr_utils.utils.share_files",
+    "KeyPool": "csr_utils.utils.key_pool",
+    "AsyncCSRUtils": "csr_utils.aio",
+    "Daemon": "csr_utils.utils.daemon",
+    "DaemonClient": "csr_utils.utils.daemon",
+    "set_arithmetic_backend": "csr_utils.utils.arithmetic",
+    "generate_key_and_public_key": "csr_utils.utils.keys",
+    "build_csr": "csr_utils.utils.keys",
+    "split_and_encode_string": "csr_utils.utils.encoding_functions",
+    "combine_secret_shares": "csr_utils.utils.encoding_functions",
+    "combine_secret_shares_bytes": "csr_utils.utils.encoding_functions",
+    "encode_private_key": "csr_utils.utils.key_encoding",
+    "decode_private_key": "csr_utils.utils.key_encoding",
+}
+
+__all__ = list(_API)
+
+
+def __getattr__(name):
+    if name in _API:
+        return getattr(importlib.import_module(_API[name]), name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def __dir__():
+    return sorted(list(globals()) + __all__)
@@ -0,0 +1,349 @@
+"""
+asyncio API for key generation, split and combine.
+
+    async with AsyncCSRUtils(max_concurrency=8) as service:
+        share_files = await service.generate_and_split_keys("my_key", "keys/", 4, 2)
+        combined_key_path = await service.combine("my_key", "keys/")
+
+Key generation, splitting and combining run in a process or thread executor and
+the other file I/O runs in the default thread pool, so the event loop is never
+blocked. Combine runs CombineShares.recover_private_key in the executor, with
+the same digest checks and bad-share isolation as the command line.
+
+Split reads the key file and combine writes the combined key inside the executor
+job, which zeroizes its buffer once done, so no copy of the key bytes is pickled
+to or from a worker process.
+"""
+import asyncio
+import contextlib
+import os
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple, Union
+from csr_utils.CombineShares import recover_private_key
+from csr_utils.utils.encoding_functions import (
+    split_and_encode_string,
+    DEFAULT_SHARE_ENGINE,
+)
+from csr_utils.utils.share_files import (
+    build_share_metadata,
+    write_share_files,
+    DEFAULT_SHARE_FORMAT,
+)
+from csr_utils.utils.autotune import resolve_split_parameters
+from csr_utils.utils.buffers import zeroized
+from csr_utils.utils.integrity import SecretDigest
+from csr_utils.utils.key_encoding import (
+    check_key_encoding,
+    encode_private_key,
+    DEFAULT_KEY_ENCODING,
+)
+from csr_utils.utils.keys import (
+    generate_key_and_public_key,
+    DEFAULT_KEY_ALGORITHM,
+    DEFAULT_RSA_KEY_SIZE,
+)
+
+EXECUTOR_KINDS = ("process", "thread")
+
+
+def _split(
+    secret_string: Union[str, bytearray],
+    num_shares: int,
+    num_shares_for_rebuild: int,
+    engine: str,
+    chunk_size: Union[int, str],
+    prime_bits: Optional[int],
+    key_encoding: str = DEFAULT_KEY_ENCODING,
+) -> Tuple[List[List[str]], Dict[str, Any], str]:
+    check_key_encoding(key_encoding, engine)
+    secret_digest = SecretDigest()
+    if key_encoding != "pem":
+        secret_string = encode_private_key(secret_string, key_encoding)
+    chunk_size, prime = resolve_split_parameters(
+        secret_string, engine, chunk_size, prime_bits
+    )
+    share_chunks = split_and_encode_string(
+        secret_string,
+        k=num_shares_for_rebuild,
+        n=num_shares,
+        chunk_size=chunk_size,
+        engine=engine,
+        prime=prime,
+        secret_digest=secret_digest,
+    )
+    metadata = build_share_metadata(
+        engine, num_shares_for_rebuild, chunk_size, prime, secret_digest.salt, key_encoding
+    )
+    # the digest is returned as hex, hashlib objects do not pickle across workers
+    return share_chunks, metadata, secret_digest.hexdigest()
+
+
+def _generate_and_split(
+    key_algorithm: str, key_size: int, *split_args: Any
+) -> Tuple[str, List[List[str]], Dict[str, Any], str]:
+    public_key, private_key = generate_key_and_public_key(key_algorithm, key_size)
+    share_chunks, metadata, secret_digest = _split(private_key, *split_args)
+    return public_key, share_chunks, metadata, secret_digest
+
+
+def _read_bytes(path: str) -> bytearray:
+    with open(path, "rb") as file:
+        buffer = bytearray(os.fstat(file.fileno()).st_size)
+        del buffer[file.readinto(buffer) :]
+    return buffer
+
+
+def _write_text(path: str, text: str) -> None:
+    with open(path, "w") as file:
+        file.write(text)
+
+
+def _write_bytes(path: str, data: bytes) -> None:
+    with open(path, "wb") as file:
+        file.write(data)
+
+
+def _split_key_file(
+    key_path: str, *split_args: Any
+) -> Tuple[List[List[str]], Dict[str, Any], str]:
+    with zeroized(_read_bytes(key_path)) as secret_buffer:
+        return _split(secret_buffer, *split_args)
+
+
+def _combine_to_file(
+    combined_key_path: str,
+    file_name: str,
+    folder_path: str,
+    indexes: Optional[List[int]],
+    output_format: str,
+) -> None:
+    combined_key = recover_private_key(file_name, folder_path, None, indexes, output_format)
+    with zeroized(combined_key):
+        _write_bytes(combined_key_path, combined_key)
+
+
+class AsyncCSRUtils:
+    """
+    Runs generate, split and combine from asyncio code.
+
+    CPU work runs in the executor: a process pool by default, a thread pool with
+    executor="thread", or any Executor passed in, which is then left open on
+    close. The other file I/O runs in the default thread pool of the loop. At most
+    max_concurrency operations run at once, the others wait for a slot.
+
+    Cancelling an operation cancels its executor job if it has not started yet
+    and skips its remaining steps, so no share file is written once a split is
+    cancelled before its shares are computed. A job that already started runs
+    to completion in the executor and its result is discarded.
+    """
+
+    def __init__(
+        self,
+        executor: Union[str, Executor] = "process",
+        max_workers: Optional[int] = None,
+        max_concurrency: Optional[int] = None,
+    ):
+        if isinstance(executor, Executor):
+            self._executor = executor
+            self._owns_executor = False
+        elif executor == "process":
+            self._executor = ProcessPoolExecutor(max_workers=max_workers)
+            self._owns_executor = True
+        elif executor == "thread":
+            self._executor = ThreadPoolExecutor(max_workers=max_workers)
+            self._owns_executor = True
+        else:
+            raise ValueError(f"Executor must be one of {EXECUTOR_KINDS} or an Executor.")
+        if max_concurrency is not None and max_concurrency < 1:
+            raise ValueError("max_concurrency must be >= 1.")
+        self._semaphore = asyncio.Semaphore(max_concurrency) if max_concurrency else None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    async def close(self) -> None:
+        """
+        Shuts down the executor if it was created by this object, cancelling the
+        jobs that have not started.
+        """
+        if self._owns_executor:
+            await asyncio.to_thread(self._executor.shutdown, True, cancel_futures=True)
+
+    def _slot(self):
+        return self._semaphore if self._semaphore else contextlib.nullcontext()
+
+    async def _run(self, function, *args):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, function, *args)
+
+    async def generate_keys(
+        self,
+        file_name: str,
+        folder_path: str = "",
+        key_algorithm: str = DEFAULT_KEY_ALGORITHM,
+        key_size: int = DEFAULT_RSA_KEY_SIZE,
+    ) -> Tuple[str, str]:
+        """
+        Generates a private key and its CSR, as GenerateKeys.generate_keys.
+
+        Args:
+        file_name (str): The base name for the key files.
+        folder_path (str): The directory where the key files will be saved.
+        key_algorithm (str): The key algorithm, "rsa" (default), "ecdsa-p256", "ecdsa-p384" or "ed25519".
+        key_size (int): The RSA key size in bits. Ignored by the other algorithms.
+
+        Returns:
+        Tuple[str, str]: The paths of the private key and of the CSR.
+        """
+        async with self._slot():
+            public_key, private_key = await self._run(
+                generate_key_and_public_key, key_algorithm, key_size
+            )
+            public_key_path = os.path.join(folder_path, f"{file_name}_public.csr")
+            private_key_path = os.path.join(folder_path, f"{file_name}_private.key")
+            await asyncio.to_thread(_write_text, public_key_path, public_key)
+            await asyncio.to_thread(_write_text, private_key_path, private_key)
+        return private_key_path, public_key_path
+
+    async def generate_and_split_keys(
+        self,
+        file_name: str,
+        folder_path: str,
+        num_shares: int,
+        num_shares_for_rebuild: int,
+        engine: str = DEFAULT_SHARE_ENGINE,
+        chunk_size: Union[int, str] = 1024,
+        prime_bits: Optional[int] = None,
+        share_format: str = DEFAULT_SHARE_FORMAT,
+        key_algorithm: str = DEFAULT_KEY_ALGORITHM,
+        key_size: int = DEFAULT_RSA_KEY_SIZE,
+        key_encoding: str = DEFAULT_KEY_ENCODING,
+    ) -> List[str]:
+        """
+        Generates a private key and its CSR and splits the private key into share
+        files, as GenerateSplitKeys.generate_and_split_keys. The private key is
+        never written to disk.
+
+        Returns:
+        List[str]: The paths of the share files.
+        """
+        async with self._slot():
+            public_key, share_chunks, metadata, secret_digest = await self._run(
+                _generate_and_split,
+                key_algorithm,
+                key_size,
+                num_shares,
+                num_shares_for_rebuild,
+                engine,
+                chunk_size,
+                prime_bits,
+                key_encoding,
+            )
+            public_key_path = os.path.join(folder_path, f"{file_name}_public.csr")
+            share_files = [
+                os.path.join(folder_path, f"{file_name}_private_share_{client_n + 1}.key")
+                for client_n in range(num_shares)
+            ]
+            await asyncio.to_thread(_write_text, public_key_path, public_key)
+            await asyncio.to_thread(
+                write_share_files,
+                share_chunks,
+                share_files,
+                metadata,
+                share_format,
+                secret_digest,
+            )
+        return share_files
+
+    async def split(
+        self,
+        path_to_key: str,
+        file_name: str,
+        num_shares: int,
+        num_shares_for_rebuild: int,
+        engine: str = DEFAULT_SHARE_ENGINE,
+        chunk_size: Union[int, str] = 1024,
+        prime_bits: Optional[int] = None,
+        share_format: str = DEFAULT_SHARE_FORMAT,
+        key_encoding: str = DEFAULT_KEY_ENCODING,
+    ) -> List[str]:
+        """
+        Splits a key file into share files, as SplitKey.split_string_into_shares.
+        The key file is read and split in the executor.
+
+        Args:
+        path_to_key (str): The path to the folder containing the key file.
+        file_name (str): The name of the key file.
+        num_shares (int): The number of shares to be created.
+        num_shares_for_rebuild (int): The number of shares needed to rebuild the key.
+        key_encoding (str): The encoding of the shared key, "pem" (default), "der" or "der-zlib".
+
+        Returns:
+        List[str]: The paths of the share files.
+        """
+        async with self._slot():
+            share_chunks, metadata, secret_digest = await self._run(
+                _split_key_file,
+                os.path.join(path_to_key, file_name),
+                num_shares,
+                num_shares_for_rebuild,
+                engine,
+                chunk_size,
+                prime_bits,
+                key_encoding,
+            )
+            share_files = [
+                os.path.join(
+                    path_to_key,
+                    file_name.replace(".key", "") + f"_share_{client_n + 1}.key",
+                )
+                for client_n in range(num_shares)
+            ]
+            await asyncio.to_thread(
+                write_share_files,
+                share_chunks,
+                share_files,
+                metadata,
+                share_format,
+                secret_digest,
+            )
+        return share_files
+
+    async def combine(
+        self,
+        file_name: str,
+        folder_path: Optional[str] = None,
+        indexes: Optional[List[int]] = None,
+        output_format: str = "pem",
+    ) -> str:
+        """
+        Combines share files into the private key, as CombineShares.combine_shares.
+        The share files are read and combined and the key file is written in the
+        executor.
+
+        Args:
+        file_name (str): The prefix of the share files.
+        folder_path (Optional[str]): The directory containing the share files.
+        indexes (Optional[List[int]]): The indexes of the share files to combine.
+        output_format (str): The format of the combined key, "pem" (default) or "der".
+
+        Returns:
+        str: The path of the combined private key file.
+        """
+        folder_path = folder_path or ""
+        async with self._slot():
+            combined_key_path = os.path.join(
+                folder_path, file_name + "_combined_private.key"
+            )
+            await self._run(
+                _combine_to_file,
+                combined_key_path,
+                file_name,
+                folder_path,
+                indexes,
+                output_format,
+            )
+        return combined_key_path
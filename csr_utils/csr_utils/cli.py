@@ -0,0 +1,73 @@
+"""
+The csr-utils command. Each subcommand runs the main function of one script,
+whose module is imported only when that subcommand is run: combine and split
+never import cryptography, and no subcommand pays for the others.
+"""
+import argparse
+import importlib
+import sys
+from typing import List, Optional
+
+# subcommand: (module, help)
+COMMANDS = {
+    "generate": ("csr_utils.GenerateKeys", "generate a private key and its CSR"),
+    "generate-split": (
+        "csr_utils.GenerateSplitKeys",
+        "generate a private key and its CSR and split the private key into shares",
+    ),
+    "split": ("csr_utils.SplitKey", "split a private key file into shares"),
+    "combine": ("csr_utils.CombineShares", "combine share files into the private key"),
+    "reshare": (
+        "csr_utils.ReshareKey",
+        "split a key again for a new threshold straight from its share files",
+    ),
+    "convert": ("csr_utils.ConvertShares", "convert a share file between formats"),
+    "bulk-generate": (
+        "csr_utils.BulkGenerateKeys",
+        "generate the keys listed in a manifest in parallel",
+    ),
+    "batch-split": (
+        "csr_utils.BatchSplitKeys",
+        "split every key file under a directory tree in parallel, resumably",
+    ),
+    "batch-combine": (
+        "csr_utils.BatchCombineShares",
+        "combine every share set under a directory tree in parallel, resumably",
+    ),
+    "reissue": (
+        "csr_utils.ReissueCSRs",
+        "sign new CSRs for existing keys listed in a manifest in parallel",
+    ),
+    "key-pool": ("csr_utils.KeyPool", "fill, watch or inspect a pool of RSA keys"),
+    "serve": (
+        "csr_utils.Serve",
+        "serve generate, split and combine requests over a Unix domain socket",
+    ),
+    "client": ("csr_utils.ServeClient", "send a request to the serve daemon"),
+}
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    """
+    Parses the subcommand and hands the remaining arguments to its script.
+    """
+    parser = argparse.ArgumentParser(
+        prog="csr-utils",
+        description="Creates key pairs and CSRs and splits private keys with Shamir's secret sharing.",
+        epilog="commands:\n"
+        + "\n".join(f"  {name:<16}{help}" for name, (_, help) in COMMANDS.items())
+        + "\n\nRun csr-utils <command> --help for the options of a command.",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+    )
+    parser.add_argument("command", choices=COMMANDS, metavar="command")
+    parser.add_argument("arguments", nargs=argparse.REMAINDER, help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    module = importlib.import_module(COMMANDS[args.command][0])
+    # the script parsers take their usage line from the program name
+    sys.argv[0] = f"csr-utils {args.command}"
+    module.main(args.arguments)
+
+
+if __name__ == "__main__":
+    main()
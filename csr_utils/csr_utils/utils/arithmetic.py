@@ -0,0 +1,186 @@
+"""
+Big-integer arithmetic backends for the prime and bytes share engines.
+
+The conversions between secret strings and ints, the evaluation of the split
+polynomials, the Lagrange weights and the interpolation dot products run on the
+selected backend: GMP through gmpy2 when it is installed, CPython ints
+otherwise. Both compute the same exact integers, so a polynomial gives the same
+shares on either backend and shares split on one combine on the other. Two
+splits of a secret never give the same shares, as every split draws new random
+coefficients. The backend is chosen on first use and can be forced with
+set_arithmetic_backend() or the CSR_UTILS_ARITHMETIC environment variable,
+which worker processes inherit.
+"""
+import os
+
+# string.printable has 100 characters, so a base-100 digit is two decimal digits
+DECIMAL_PAIR_BASE = 100
+
+ARITHMETIC_BACKENDS = ("auto", "python", "gmpy2")
+ARITHMETIC_BACKEND_ENV = "CSR_UTILS_ARITHMETIC"
+
+# the backend in use, picked on first use
+_backend = None
+
+
+class PythonBackend:
+    """
+    CPython ints.
+    """
+
+    name = "python"
+
+    @staticmethod
+    def to_number(value):
+        return value
+
+    @staticmethod
+    def invert(value, modulus):
+        return pow(value, -1, modulus)
+
+    @staticmethod
+    def dot_mod(values, weights, modulus):
+        return sum(value * weight for value, weight in zip(values, weights)) % modulus
+
+    @staticmethod
+    def polynomials_points(coefficients_list, x_values, modulus):
+        points_list = []
+        for coefficients in coefficients_list:
+            leading, *lower = coefficients[::-1]
+            points = []
+            for x in x_values:
+                y = leading
+                for coefficient in lower:
+                    y = y * x + coefficient
+                points.append((x, y % modulus))
+            points_list.append(points)
+        return points_list
+
+    @staticmethod
+    def charset_to_int(s, charset):
+        from utilitybelt import charset_to_int
+
+        return charset_to_int(s, charset)
+
+    @staticmethod
+    def int_to_charset(value, charset):
+        from utilitybelt import int_to_charset
+
+        return int_to_charset(value, charset)
+
+
+class Gmpy2Backend:
+    """
+    GMP integers through gmpy2. Results are handed back as ints. Strings in a
+    100 character set, such as the hex digits of the prime engine read as
+    string.printable digits, are converted through their decimal digits, which
+    GMP parses and prints in subquadratic time; other character sets use the
+    CPython conversion.
+    """
+
+    name = "gmpy2"
+
+    def __init__(self):
+        import gmpy2
+
+        self.to_number = gmpy2.mpz
+        self._invert = gmpy2.invert
+
+    def invert(self, value, modulus):
+        return int(self._invert(value, modulus))
+
+    def dot_mod(self, values, weights, modulus):
+        mpz = self.to_number
+        total = mpz(0)
+        for value, weight in zip(values, weights):
+            total += mpz(value) * weight
+        return int(total % modulus)
+
+    def polynomials_points(self, coefficients_list, x_values, modulus):
+        mpz = self.to_number
+        points_list = []
+        for coefficients in coefficients_list:
+            leading, *lower = [mpz(coefficient) for coefficient in coefficients[::-1]]
+            points = []
+            for x in x_values:
+                y = leading
+                for coefficient in lower:
+                    y = y * x + coefficient
+                points.append((x, int(y % modulus)))
+            points_list.append(points)
+        return points_list
+
+    def charset_to_int(self, s, charset):
+        if len(charset) != DECIMAL_PAIR_BASE:
+            return PythonBackend.charset_to_int(s, charset)
+        pairs = _get_decimal_pairs(charset)
+        try:
+            decimal = "".join([pairs[char] for char in s])
+        except KeyError as e:
+            raise ValueError(f"{e} is not in the character set.")
+        return int(self.to_number(decimal or "0", 10))
+
+    def int_to_charset(self, value, charset):
+        if len(charset) != DECIMAL_PAIR_BASE:
+            return PythonBackend.int_to_charset(value, charset)
+        if not value >= 0:
+            raise ValueError('"val" must be a non-negative integer.')
+        decimal = self.to_number(value).digits(10)
+        if len(decimal) % 2:
+            decimal = "0" + decimal
+        return "".join(
+            [charset[int(decimal[i : i + 2])] for i in range(0, len(decimal), 2)]
+        )
+
+
+_decimal_pairs = {}
+
+
+def _get_decimal_pairs(charset):
+    # character: its first index as two decimal digits, as charset.index() finds
+    if charset not in _decimal_pairs:
+        pairs = {}
+        for index, char in enumerate(charset):
+            pairs.setdefault(char, f"{index:02d}")
+        _decimal_pairs[charset] = pairs
+    return _decimal_pairs[charset]
+
+
+def _load_backend(name):
+    if name == "python":
+        return PythonBackend()
+    if name == "gmpy2":
+        try:
+            return Gmpy2Backend()
+        except ImportError:
+            raise ValueError("The gmpy2 arithmetic backend needs gmpy2 installed.")
+    if name == "auto":
+        try:
+            return Gmpy2Backend()
+        except ImportError:
+            return PythonBackend()
+    raise ValueError(
+        f"Unknown arithmetic backend: {name}. Choose one of {ARITHMETIC_BACKENDS}."
+    )
+
+
+def get_arithmetic_backend():
+    """
+    Returns the backend in use, picked from CSR_UTILS_ARITHMETIC ("auto" by
+    default) on first use.
+    """
+    global _backend
+    if _backend is None:
+        _backend = _load_backend(os.environ.get(ARITHMETIC_BACKEND_ENV) or "auto")
+    return _backend
+
+
+def set_arithmetic_backend(name):
+    """
+    Forces the backend of this process: "python", "gmpy2" or "auto". Returns
+    the backend. Set CSR_UTILS_ARITHMETIC as well for worker processes started
+    with spawn.
+    """
+    global _backend
+    _backend = _load_backend(name)
+    return _backend
@@ -0,0 +1,170 @@
+import argparse
+import json
+import math
+import os
+import random
+import string
+import time
+from .encoding_functions import (
+    combine_secret_shares,
+    get_bytes_primes,
+    get_standard_prime,
+    get_standard_primes,
+    split_and_encode_string,
+)
+
+AUTO_CHUNK_SIZE = "auto"
+AUTOTUNE_CACHE_PATH = os.path.join(
+    os.path.expanduser("~"), ".cache", "csr_utils", "autotune.json"
+)
+CALIBRATION_SECRET_SIZE = 16384
+# the largest prime considered by the auto-tuning
+MAX_AUTO_PRIME_BITS = 19937
+# GF(2^8) has no field to choose, chunks only bound the size of the shares in memory
+GF256_CHUNK_SIZE = 65536
+# used until a calibration has been run on the host
+DEFAULT_AUTO_PRIME_BITS = {"prime": 257, "bytes": 385}
+
+
+def parse_chunk_size(value):
+    """
+    argparse type for chunk sizes: a positive number of characters or "auto".
+    """
+    if value == AUTO_CHUNK_SIZE:
+        return value
+    try:
+        chunk_size = int(value)
+    except ValueError:
+        chunk_size = 0
+    if chunk_size <= 0:
+        raise argparse.ArgumentTypeError(
+            f'chunk size must be a positive integer or "{AUTO_CHUNK_SIZE}"'
+        )
+    return chunk_size
+
+
+def max_chunk_size(engine, prime):
+    """
+    Returns the largest number of ASCII characters per chunk whose secret integer
+    stays below the prime.
+    """
+    if engine == "bytes":
+        # the chunk bytes follow a 0x01 marker byte
+        return (prime.bit_length() - 2) // 8
+    # the prime engine reads the hex encoded chunk as a base-100 number
+    chunk_size = int((prime.bit_length() - 1) * math.log10(2) / 4)
+    while chunk_size > 0 and 100 ** (2 * chunk_size) > prime:
+        chunk_size -= 1
+    while 100 ** (2 * (chunk_size + 1)) <= prime:
+        chunk_size += 1
+    return chunk_size
+
+
+def get_chunk_size_prime(engine, chunk_size):
+    """
+    Returns the smallest standard prime that fits every chunk of chunk_size
+    ASCII characters, or None if no standard prime is large enough.
+    """
+    for prime in get_standard_primes():
+        if max_chunk_size(engine, prime) >= chunk_size:
+            return prime
+    return None
+
+
+def get_candidates(engine):
+    """
+    Returns the (chunk size, prime) pairs considered by the auto-tuning: for each
+    prime, the largest chunk that fits it.
+    """
+    primes = get_bytes_primes() if engine == "bytes" else get_standard_primes()
+    candidates = []
+    for prime in primes:
+        if not 127 <= prime.bit_length() <= MAX_AUTO_PRIME_BITS:
+            continue
+        chunk_size = max_chunk_size(engine, prime)
+        if chunk_size > 0:
+            candidates.append((chunk_size, prime))
+    return candidates
+
+
+def load_autotune_cache(path=None):
+    """
+    Returns the cached calibrations by engine. A missing or unreadable cache is
+    empty, so a corrupt file only costs a new calibration.
+    """
+    try:
+        with open(path or AUTOTUNE_CACHE_PATH, "r") as file:
+            cache = json.load(file)
+    except (OSError, ValueError):
+        return {}
+    return cache if isinstance(cache, dict) else {}
+
+
+def calibrate(engine, k=2, n=4, path=None):
+    """
+    Times split and combine of a sample secret with every candidate and caches
+    the one with the best throughput.
+    """
+    path = path or AUTOTUNE_CACHE_PATH
+    sample = "".join(
+        random.choices(string.ascii_letters + string.digits, k=CALIBRATION_SECRET_SIZE)
+    )
+    results = []
+    for chunk_size, prime in get_candidates(engine):
+        start = time.perf_counter()
+        share_chunks = split_and_encode_string(
+            sample, k=k, n=n, chunk_size=chunk_size, engine=engine, prime=prime
+        )
+        combine_secret_shares(share_chunks, prime=prime)
+        elapsed = time.perf_counter() - start
+        results.append((len(sample) / elapsed, chunk_size, prime))
+
+    throughput, chunk_size, prime = max(results)
+    cache = load_autotune_cache(path)
+    cache[engine] = {
+        "chunk_size": chunk_size,
+        "prime_bits": prime.bit_length(),
+        "throughput": round(throughput),
+    }
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w") as file:
+        json.dump(cache, file, indent=2)
+    return cache[engine]
+
+
+def resolve_split_parameters(
+    secret_string, engine, chunk_size=1024, prime_bits=None, calibrate_host=False
+):
+    """
+    Returns the (chunk size, prime) to split a secret with. An explicit chunk size
+    or prime always wins; "auto" picks the chunk size and prime together, from the
+    cached calibration of the host if there is one. Without a prime, the prime
+    engine uses the smallest prime that fits a whole chunk, so that the prime is
+    recorded in the share files and combine resolves it once instead of
+    inferring it for every chunk. A None prime means that every chunk uses the
+    smallest prime that fits it.
+    """
+    prime = get_standard_prime(prime_bits) if prime_bits else None
+    if chunk_size != AUTO_CHUNK_SIZE:
+        if prime is None and engine == "prime":
+            # a character takes up to 4 bytes in UTF-8, bytes secrets are chunked by bytes
+            unicode = isinstance(secret_string, str) and not secret_string.isascii()
+            prime = get_chunk_size_prime(engine, chunk_size * 4 if unicode else chunk_size)
+        return chunk_size, prime
+    if engine == "gf256":
+        return GF256_CHUNK_SIZE, None
+
+    if prime is None:
+        tuned = (
+            calibrate(engine)
+            if calibrate_host
+            else load_autotune_cache().get(engine)
+        )
+        prime_bits = tuned["prime_bits"] if tuned else DEFAULT_AUTO_PRIME_BITS[engine]
+        prime = get_standard_prime(prime_bits)
+
+    chunk_size = max_chunk_size(engine, prime)
+    if isinstance(secret_string, str) and not secret_string.isascii():
+        # a character takes up to 4 bytes in UTF-8, bytes secrets are chunked by bytes
+        chunk_size //= 4
+    return chunk_size, prime
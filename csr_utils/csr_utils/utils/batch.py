@@ -0,0 +1,124 @@
+"""
+Runs one operation over many keys in a process pool, with a progress report
+and a checkpoint manifest.
+
+The manifest is a JSONL file. Its first line records the operation, its
+parameters and the items found by the first run, and every following line the
+outcome of one item. A rerun with the same manifest works on the same items,
+skips those already done and retries the others, so an interrupted batch
+resumes where it stopped without walking the tree again.
+"""
+import json
+import logging
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+# seconds between two progress reports
+PROGRESS_INTERVAL = 10
+
+
+class Checkpoint:
+    """
+    Checkpoint manifest of a batch run. Opening it for the same operation and
+    parameters resumes it, and items holds the items of the first run; other
+    parameters raise ValueError. With restart, or if there is no manifest yet,
+    items is None until start() records them.
+    """
+
+    def __init__(self, path, operation, parameters, restart=False):
+        self.path = path
+        self.operation = operation
+        self.parameters = parameters
+        self.items = None
+        self.done = set()
+        lines = []
+        if not restart and os.path.exists(path):
+            with open(path, "r") as file:
+                for line in file:
+                    try:
+                        lines.append(json.loads(line))
+                    except ValueError:
+                        # the last line of a run killed while writing it
+                        continue
+        if lines:
+            header = lines[0]
+            if (header["operation"], header["parameters"]) != (operation, parameters):
+                raise ValueError(
+                    f"{path} was written by a {header['operation']} run with parameters "
+                    f"{header['parameters']}. Pass --restart to start over."
+                )
+            self.items = header["items"]
+            self.done = {line["item"] for line in lines[1:] if line["status"] == "done"}
+            self.file = open(path, "a+")
+            self.file.seek(max(self.file.tell() - 1, 0))
+            if self.file.read(1) != "\n":
+                self.file.write("\n")
+        else:
+            self.file = open(path, "w")
+
+    def _write(self, record):
+        self.file.write(json.dumps(record) + "\n")
+        self.file.flush()
+        os.fsync(self.file.fileno())
+
+    def start(self, items):
+        """
+        Records the items of a new run in the header of the manifest.
+        """
+        self.items = list(items)
+        self._write(
+            {"operation": self.operation, "parameters": self.parameters, "items": self.items}
+        )
+
+    def record(self, item, status, **fields):
+        self._write({"item": item, "status": status, **fields})
+        if status == "done":
+            self.done.add(item)
+
+    def close(self):
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+def run_batch(items, function, checkpoint, workers=None):
+    """
+    Calls function(*args) in a process pool for every (item, args) pair whose
+    item is not done in the checkpoint, records each outcome and logs the
+    progress. Returns the number of items that failed.
+    """
+    pending = [(item, args) for item, args in items if item not in checkpoint.done]
+    skipped = len(items) - len(pending)
+    if skipped:
+        logging.info(f"Skipped {skipped} items already done in {checkpoint.path}.")
+    if not pending:
+        return 0
+
+    failures = 0
+    start = last_report = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers or os.cpu_count()) as executor:
+        futures = {executor.submit(function, *args): item for item, args in pending}
+        for finished, future in enumerate(as_completed(futures), start=1):
+            item = futures[future]
+            try:
+                result = future.result()
+                checkpoint.record(item, "done", result=result)
+            except Exception as e:
+                failures += 1
+                checkpoint.record(item, "failed", error=str(e))
+                logging.error(f"Error!! {item}: {e}")
+
+            now = time.perf_counter()
+            if now - last_report >= PROGRESS_INTERVAL or finished == len(pending):
+                last_report = now
+                rate = finished / (now - start)
+                logging.info(
+                    f"{finished}/{len(pending)} done, {failures} failed, {rate:.1f} items/s, "
+                    f"{(len(pending) - finished) / rate:.0f}s left"
+                )
+    return failures
@@ -0,0 +1,47 @@
+"""
+Mutable buffers for key material.
+
+str, bytes and int objects are immutable, so their copies of a key stay in the
+heap until the memory is reused. Split and combine keep a secret in one
+bytearray instead, hand memoryview slices of it to the share engines and
+zeroize it once done. The ints and share strings computed from each chunk are
+still immutable and cannot be wiped.
+"""
+from contextlib import contextmanager
+
+
+def zeroize(buffer):
+    """
+    Overwrites a bytearray or a writable memoryview with zeros. Immutable
+    objects are left alone.
+    """
+    if isinstance(buffer, (bytearray, memoryview)) and not (
+        isinstance(buffer, memoryview) and buffer.readonly
+    ):
+        view = memoryview(buffer).cast("B")
+        view[:] = bytes(len(view))
+
+
+@contextmanager
+def zeroized(buffer):
+    """
+    Yields the buffer and zeroizes it on exit, also on errors.
+    """
+    try:
+        yield buffer
+    finally:
+        zeroize(buffer)
+
+
+def join_chunks(chunks):
+    """
+    Joins byte chunks into one bytearray allocated at the final size, so no
+    resize leaves a stale copy of the secret behind.
+    """
+    output = bytearray(sum(map(len, chunks)))
+    view = memoryview(output)
+    start = 0
+    for chunk in chunks:
+        view[start : start + len(chunk)] = chunk
+        start += len(chunk)
+    return output
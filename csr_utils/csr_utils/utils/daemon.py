@@ -0,0 +1,342 @@
+import asyncio
+import collections
+import importlib
+import json
+import logging
+import math
+import os
+import signal
+import socket
+import time
+
+DEFAULT_SOCKET_PATH = os.path.join(
+    os.path.expanduser("~"), ".cache", "csr_utils", "serve.sock"
+)
+DEFAULT_MAX_BATCH = 32
+DEFAULT_BATCH_WINDOW_MS = 2
+# number of recent requests the latency percentiles are computed over
+LATENCY_WINDOW = 1000
+# a JSON request or response is one line; share lists of large keys are long
+MAX_LINE_LENGTH = 64 * 1024 * 1024
+STATS_OP = "stats"
+# op: (module, function). Every function takes the request args as keywords and
+# returns a JSON serializable result.
+OPERATIONS = {
+    "generate": ("csr_utils.GenerateKeys", "generate_keys"),
+    "generate_split": ("csr_utils.GenerateSplitKeys", "generate_and_split_keys"),
+    "split": ("csr_utils.SplitKey", "split_string_into_shares"),
+    "combine": ("csr_utils.CombineShares", "combine_shares"),
+}
+
+
+class DaemonError(Exception):
+    """Raised by the client when the daemon reports an error for a request."""
+
+
+def warm_worker():
+    """
+    Imports every operation and builds the prime tables once per worker process,
+    so that requests do not pay for them.
+    """
+    from .encoding_functions import get_bytes_primes_by_width
+
+    for module_name, _ in OPERATIONS.values():
+        importlib.import_module(module_name)
+    get_bytes_primes_by_width()
+
+
+def ping():
+    return os.getpid()
+
+
+def run_batch(requests):
+    """
+    Runs a batch of (op, args) requests in a worker process. Returns one
+    (ok, result or error message) pair per request, so that a failing request
+    does not fail the rest of its batch.
+    """
+    results = []
+    for op, args in requests:
+        try:
+            module_name, function_name = OPERATIONS[op]
+            function = getattr(importlib.import_module(module_name), function_name)
+            results.append((True, function(**args)))
+        except Exception as e:
+            results.append((False, f"{type(e).__name__}: {e}"))
+    return results
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, round(fraction * (len(sorted_values) - 1)))
+    return sorted_values[index]
+
+
+class Daemon:
+    """
+    Serves generate, split and combine requests over a Unix domain socket.
+
+    The protocol is one JSON object per line: a request is
+    {"id": ..., "op": "generate" | "generate_split" | "split" | "combine" | "stats",
+    "args": {...}}, where args are the keyword arguments of GenerateKeys.generate_keys,
+    GenerateSplitKeys.generate_and_split_keys, SplitKey.split_string_into_shares or
+    CombineShares.combine_shares, and the response is {"id": ..., "ok": true,
+    "result": ...} or {"id": ..., "ok": false, "error": "..."}. Paths are resolved
+    in the working directory of the daemon. A connection can pipeline requests;
+    responses come back in completion order.
+
+    Requests are queued and handed to a pool of warm worker processes in
+    batches: whenever a worker is free it takes up to max_batch queued requests,
+    waiting batch_window_ms for more, and a burst is spread over the free workers.
+    """
+
+    def __init__(
+        self,
+        socket_path=DEFAULT_SOCKET_PATH,
+        workers=None,
+        max_batch=DEFAULT_MAX_BATCH,
+        batch_window_ms=DEFAULT_BATCH_WINDOW_MS,
+    ):
+        self.socket_path = socket_path
+        self.workers = workers or os.cpu_count()
+        self.max_batch = max_batch
+        self.batch_window = batch_window_ms / 1000
+        self.started = time.time()
+        self.stats = collections.Counter()
+        self.max_queue_depth = 0
+        self.in_flight = 0
+        self.latencies = collections.deque(maxlen=LATENCY_WINDOW)
+        self._queue = None
+        self._free_workers = None
+        self._executor = None
+
+    def get_stats(self):
+        """
+        Returns the request counters, the current and maximum queue depth, the
+        mean batch size and the latency percentiles of the recent requests in ms.
+        """
+        latencies = sorted(self.latencies)
+        return {
+            "uptime": round(time.time() - self.started, 3),
+            "workers": self.workers,
+            "queue_depth": self._queue.qsize() if self._queue else 0,
+            "max_queue_depth": self.max_queue_depth,
+            "in_flight_batches": self.in_flight,
+            "requests": self.stats["requests"],
+            "errors": self.stats["errors"],
+            "batches": self.stats["batches"],
+            "mean_batch_size": (
+                self.stats["batched_requests"] / self.stats["batches"]
+                if self.stats["batches"]
+                else None
+            ),
+            "latency_ms": {
+                name: round(value * 1000, 3) if value is not None else None
+                for name, value in (
+                    ("p50", percentile(latencies, 0.5)),
+                    ("p90", percentile(latencies, 0.9)),
+                    ("p99", percentile(latencies, 0.99)),
+                    ("max", latencies[-1] if latencies else None),
+                )
+            },
+        }
+
+    async def serve(self, stats_interval=None):
+        """
+        Starts the workers and serves requests until SIGINT or SIGTERM.
+        """
+        from concurrent.futures import ProcessPoolExecutor
+
+        # checked before the workers start, so a second daemon fails fast
+        self._claim_socket_path()
+        loop = asyncio.get_running_loop()
+        self._queue = asyncio.Queue()
+        self._free_workers = asyncio.Semaphore(self.workers)
+        self._executor = ProcessPoolExecutor(
+            max_workers=self.workers, initializer=warm_worker
+        )
+        # one job per worker at once makes the pool start every worker now
+        await asyncio.gather(
+            *[loop.run_in_executor(self._executor, ping) for _ in range(self.workers)]
+        )
+
+        # the socket only accepts connections once it listens, which
+        # start_unix_server does after the chmod, so it is never open to others
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            sock.bind(self.socket_path)
+            os.chmod(self.socket_path, 0o600)
+            server = await asyncio.start_unix_server(
+                self._handle_connection, sock=sock, limit=MAX_LINE_LENGTH
+            )
+        except BaseException:
+            sock.close()
+            raise
+
+        stopped = asyncio.Event()
+        for signal_number in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(signal_number, stopped.set)
+        tasks = [asyncio.create_task(self._dispatch_batches())]
+        if stats_interval:
+            tasks.append(asyncio.create_task(self._log_stats(stats_interval)))
+        logging.info(
+            f"Serving on {self.socket_path} with {self.workers} warm workers."
+        )
+        try:
+            await stopped.wait()
+        finally:
+            server.close()
+            await server.wait_closed()
+            for task in tasks:
+                task.cancel()
+            self._executor.shutdown(cancel_futures=True)
+            os.remove(self.socket_path)
+            logging.info("Stopped.")
+
+    def _claim_socket_path(self):
+        """
+        Removes the socket left by a daemon that died, and refuses to start if
+        a daemon still answers on it.
+        """
+        os.makedirs(os.path.dirname(os.path.abspath(self.socket_path)), exist_ok=True)
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as probe:
+            try:
+                probe.connect(self.socket_path)
+            except FileNotFoundError:
+                return
+            except ConnectionRefusedError:
+                # nothing listens on it any more
+                os.remove(self.socket_path)
+                return
+        raise RuntimeError(f"A daemon is already serving on {self.socket_path}.")
+
+    async def _handle_connection(self, reader, writer):
+        lock = asyncio.Lock()
+        pending = set()
+        try:
+            while line := await reader.readline():
+                task = asyncio.create_task(self._handle_request(line, writer, lock))
+                pending.add(task)
+                task.add_done_callback(pending.discard)
+            await asyncio.gather(*pending)
+        finally:
+            writer.close()
+
+    async def _handle_request(self, line, writer, lock):
+        start = time.perf_counter()
+        request_id = op = None
+        try:
+            request = json.loads(line)
+            request_id = request.get("id")
+            op = request["op"]
+            if op == STATS_OP:
+                ok, result = True, self.get_stats()
+            elif op not in OPERATIONS:
+                raise ValueError(f"Unknown op: {op}")
+            else:
+                future = asyncio.get_running_loop().create_future()
+                await self._queue.put((op, request.get("args", {}), future))
+                self.max_queue_depth = max(self.max_queue_depth, self._queue.qsize())
+                ok, result = await future
+        except Exception as e:
+            ok, result = False, f"{type(e).__name__}: {e}"
+
+        response = {"id": request_id, "ok": ok, "result" if ok else "error": result}
+        # stats requests are not counted, so that polling does not skew the numbers
+        if op != STATS_OP:
+            self.stats["requests"] += 1
+            self.stats["errors"] += not ok
+            self.latencies.append(time.perf_counter() - start)
+        async with lock:
+            writer.write(json.dumps(response).encode() + b"\n")
+            await writer.drain()
+
+    async def _dispatch_batches(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            await self._free_workers.acquire()
+            batch = [await self._queue.get()]
+            # spread a burst over the workers that are free
+            free_workers = self.workers - self.in_flight
+            target = min(
+                self.max_batch, math.ceil((1 + self._queue.qsize()) / free_workers)
+            )
+            deadline = loop.time() + self.batch_window
+            while len(batch) < target:
+                if not self._queue.empty():
+                    batch.append(self._queue.get_nowait())
+                    continue
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+            self.in_flight += 1
+            asyncio.create_task(self._run_batch(batch))
+
+    async def _run_batch(self, batch):
+        loop = asyncio.get_running_loop()
+        self.stats["batches"] += 1
+        self.stats["batched_requests"] += len(batch)
+        try:
+            results = await loop.run_in_executor(
+                self._executor, run_batch, [(op, args) for op, args, _ in batch]
+            )
+        except Exception as e:
+            results = [(False, f"{type(e).__name__}: {e}")] * len(batch)
+        finally:
+            self.in_flight -= 1
+            self._free_workers.release()
+        for (_, _, future), result in zip(batch, results):
+            if not future.done():
+                future.set_result(result)
+
+    async def _log_stats(self, interval):
+        while True:
+            await asyncio.sleep(interval)
+            logging.info(f"Stats: {json.dumps(self.get_stats())}")
+
+
+class DaemonClient:
+    """
+    Blocking client of the daemon. Each request waits for its response.
+    """
+
+    def __init__(self, socket_path=DEFAULT_SOCKET_PATH, timeout=None):
+        self._socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self._socket.settimeout(timeout)
+        self._socket.connect(socket_path)
+        self._file = self._socket.makefile("rb")
+        self._next_id = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        self._file.close()
+        self._socket.close()
+
+    def request(self, op, **args):
+        """
+        Sends a request and returns its result. Raises DaemonError if the daemon
+        reports an error.
+        """
+        self._next_id += 1
+        message = {"id": self._next_id, "op": op, "args": args}
+        self._socket.sendall(json.dumps(message).encode() + b"\n")
+        line = self._file.readline()
+        if not line:
+            raise DaemonError("The daemon closed the connection.")
+        response = json.loads(line)
+        if not response["ok"]:
+            raise DaemonError(response["error"])
+        return response["result"]
+
+    def stats(self):
+        return self.request(STATS_OP)
@@ -1,86 +1,358 @@
-from cryptography.hazmat.primitives.asymmetric import rsa
-from cryptography.hazmat.primitives import serialization, hashes
-from cryptography.hazmat.backends import default_backend
-from cryptography.x509 import CertificateSigningRequestBuilder
-from cryptography.x509.oid import NameOID
-from cryptography import x509
+import base64
+import bisect
+import collections
+import math
+import secrets
 import string
-from utilitybelt import int_to_charset, charset_to_int
-from secretsharing.sharing import point_to_share_string, share_string_to_point
-from secretsharing.polynomials import (
-    get_polynomial_points,
-    modular_lagrange_interpolation,
+from functools import lru_cache
+from itertools import combinations, islice, repeat
+from .arithmetic import get_arithmetic_backend
+from .buffers import join_chunks, zeroize
+from .instrumentation import count, is_enabled, observe, stage
+
+# Key generation lives in keys.py so that splitting and combining do not import
+# cryptography; these names are still importable from this module.
+KEY_FUNCTION_NAMES = (
+    "KEY_ALGORITHMS",
+    "DEFAULT_KEY_ALGORITHM",
+    "DEFAULT_RSA_KEY_SIZE",
+    "generate_private_key",
+    "get_key_algorithm",
+    "generate_key_and_public_key",
+    "generate_rsa_key_and_public_key",
 )
-import sys
 
 
-def generate_rsa_key_and_public_key(bits: int = 4096):
+def __getattr__(name):
     """
-    Generates a public and private key.
+    Imports key generation and builds the prime tables on first access.
     """
-    private_key = rsa.generate_private_key(
-        public_exponent=65537, key_size=bits, backend=default_backend()
-    )
+    if name in KEY_FUNCTION_NAMES:
+        from . import keys
 
-    csr = (
-        CertificateSigningRequestBuilder()
-        .subject_name(
-            x509.Name(
-                [
-                    x509.NameAttribute(NameOID.COUNTRY_NAME, "IT"),
-                    x509.NameAttribute(NameOID.LOCALITY_NAME, "Rome"),
-                    x509.NameAttribute(NameOID.ORGANIZATION_NAME, "Colossus"),
-                    x509.NameAttribute(NameOID.COMMON_NAME, "colossus.digital"),
-                    x509.NameAttribute(NameOID.EMAIL_ADDRESS, ""),
-                ]
-            )
-        )
-        .sign(private_key, hashes.SHA256(), default_backend())
-    )
+        return getattr(keys, name)
+    if name == "STANDARD_PRIMES":
+        return list(get_standard_primes())
+    if name == "BYTES_PRIMES":
+        return list(get_bytes_primes())
+    if name == "BYTES_PRIMES_BY_WIDTH":
+        return dict(get_bytes_primes_by_width())
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
-    public = csr.public_bytes(serialization.Encoding.PEM)
-    private = private_key.private_bytes(
-        encoding=serialization.Encoding.PEM,
-        format=serialization.PrivateFormat.PKCS8,
-        encryption_algorithm=serialization.NoEncryption(),
-    )
-    return public.decode("utf-8"), private.decode("utf-8")
+
+SHARE_ENGINES = ("prime", "bytes", "gf256")
+DEFAULT_SHARE_ENGINE = "prime"
+ENGINE_TAG_SEPARATOR = ":"
+
+
+def get_share_engine(engine):
+    """
+    Returns the sharer class implementing the given share engine. The GF(256)
+    engine is imported on demand since it depends on NumPy.
+    """
+    if engine == "prime":
+        return PlaintextToHexSecretSharer
+    if engine == "bytes":
+        return BytesSecretSharer
+    if engine == "gf256":
+        from .gf256 import GF256SecretSharer
+
+        return GF256SecretSharer
+    raise ValueError(f"Unknown share engine: {engine}")
 
 
-def split_and_encode_string(secret_string, k=2, n=4, chunk_size=1024):
+def get_share_engine_name(share):
+    """
+    Returns the engine that produced a share. Untagged shares come from the
+    original big-prime engine.
+    """
+    if ENGINE_TAG_SEPARATOR in share:
+        return share.split(ENGINE_TAG_SEPARATOR, 1)[0]
+    return "prime"
+
+
+def split_and_encode_string(
+    secret_string,
+    k=2,
+    n=4,
+    chunk_size=1024,
+    engine=DEFAULT_SHARE_ENGINE,
+    prime=None,
+    workers=None,
+    secret_digest=None,
+):
     """
     Splits a string into n shares using Shamir's secret sharing algorithm. To rebuild
-    the original string, at least k shares are needed.
+    the original string, at least k shares are needed. If prime is None, each chunk
+    uses the smallest standard prime that fits it. With workers > 1 the chunks are
+    split in a process pool. A bytes secret, such as a DER key, is chunked by bytes
+    instead of characters.
+
+    The secret is encoded once into a bytearray, zeroized when the shares are
+    done, and the engines read memoryview slices of it. A bytes-like secret is
+    sliced in place and left to the caller to zeroize. The secret bytes are fed
+    to secret_digest, if given.
     """
     # Split the large string into smaller chunks
-    secret_chunks = _split_large_string(secret_string, chunk_size)
-    # Split each chunk into shares
-    share_chunks = []
-    for chunk in secret_chunks:
-        hex_chunk = string_to_hex(chunk)
-        shares = PlaintextToHexSecretSharer.split_secret(hex_chunk, k, n)
-        share_chunks.append(shares)
-    return share_chunks
+    with stage("chunking"):
+        if isinstance(secret_string, str):
+            buffer = bytearray(secret_string, "utf-8")
+        else:
+            buffer = secret_string
+        view = memoryview(buffer)
+        secret_chunks = [
+            view[start:end]
+            for start, end in _chunk_bounds(secret_string, len(view), chunk_size)
+        ]
+    try:
+        if secret_digest:
+            secret_digest.update(view)
+        if is_enabled():
+            count("chunks", len(secret_chunks))
+            count("secret_bytes", len(view))
+        if workers and workers > 1:
+            # memoryviews do not pickle, the workers get a copy of their chunks
+            secret_chunks = [chunk.tobytes() for chunk in secret_chunks]
+        # Split each chunk into shares
+        with stage("split"):
+            return _map_chunk_batches(
+                _split_chunk_batch, secret_chunks, workers, engine, k, n, prime
+            )
+    finally:
+        if buffer is not secret_string:
+            zeroize(buffer)
+
+
+def combine_secret_shares(share_chunks, prime=None, workers=None):
+    """
+    Combines shares to recover the original secret string. The engine of each
+    chunk is detected from the engine tag of its shares. If prime is None, the
+    prime is inferred from the shares. With workers > 1 the chunks are recovered
+    in a process pool.
+    """
+    secret_bytes = combine_secret_shares_bytes(share_chunks, prime, workers)
+    try:
+        return secret_bytes.decode()
+    finally:
+        zeroize(secret_bytes)
 
 
-def combine_secret_shares(share_chunks):
+def combine_secret_shares_bytes(share_chunks, prime=None, workers=None):
     """
-    Combines shares to recover the original secret string.
+    Combines shares as combine_secret_shares and returns the secret bytes, for
+    secrets that are not text, such as a DER key. The bytes are returned in a
+    bytearray that the caller can zeroize.
     """
     if (len(share_chunks) > 1) and (
-        share_chunks[0][0][0] != share_chunks[1][0][0]
+        _share_x(share_chunks[0][0]) != _share_x(share_chunks[1][0])
     ):
         share_chunks = prepare_shares_for_combine(share_chunks)
 
+    count("chunks", len(share_chunks))
     # Recover each chunk using a subset of the shares
-    recovered_secret_chunks = []
-    for shares in share_chunks:
-        recovered_hex_chunk = PlaintextToHexSecretSharer.recover_secret(shares)
-        recovered_chunk = hex_to_string(recovered_hex_chunk)
-        recovered_secret_chunks.append(recovered_chunk)
-    # Combine the recovered chunks to form the recovered secret string
-    recovered_secret_string = "".join(recovered_secret_chunks)
-    return recovered_secret_string
+    with stage("combine"):
+        recovered_secret_chunks = _map_chunk_batches(
+            _recover_chunk_batch, share_chunks, workers, prime
+        )
+    # Combine the recovered chunks to form the recovered secret
+    return join_chunks(recovered_secret_chunks)
+
+
+def combine_secret_shares_checked(
+    shares, threshold, prime=None, excluded=None, workers=None
+):
+    """
+    Combines the shares of more than threshold share files and finds the bad
+    ones. shares holds the list of chunk shares of every share file, and
+    excluded maps the position of a share file to the chunks to leave out, such
+    as those that failed their digest. A chunk whose shares agree costs one
+    interpolation and one check per extra share. Returns the secret bytes, in a
+    bytearray, and a dict from share file position to the chunks found
+    inconsistent.
+    """
+    excluded = excluded or {}
+    chunk_count = max(len(file_shares) for file_shares in shares)
+    count("chunks", chunk_count)
+    items = []
+    for index in range(chunk_count):
+        positions = [
+            position
+            for position, file_shares in enumerate(shares)
+            if index < len(file_shares) and index not in excluded.get(position, ())
+        ]
+        items.append(([shares[position][index] for position in positions], positions))
+    with stage("combine"):
+        results = _map_chunk_batches(
+            _recover_checked_chunk_batch, items, workers, threshold, prime
+        )
+
+    chunks = []
+    bad_chunks = {}
+    for index, ((chunk, bad), (_, positions)) in enumerate(zip(results, items)):
+        chunks.append(chunk)
+        for bad_index in bad:
+            bad_chunks.setdefault(positions[bad_index], []).append(index)
+    return join_chunks(chunks), bad_chunks
+
+
+def iter_split_stream(
+    stream, k=2, n=4, chunk_size=1024, engine="bytes", prime=None, secret_digest=None
+):
+    """
+    Reads a binary stream chunk by chunk and yields the n shares of each chunk,
+    so only one chunk and its shares are held in memory at a time. Each chunk is
+    fed to secret_digest, if given. Streams with readinto are read into one
+    buffer reused for every chunk and zeroized at the end.
+    """
+    sharer = get_share_engine(engine)
+    if not hasattr(stream, "readinto"):
+        while True:
+            chunk = stream.read(chunk_size)
+            if not chunk:
+                return
+            if secret_digest:
+                secret_digest.update(chunk)
+            count("chunks")
+            yield sharer.split_chunk(chunk, k, n, prime=prime)
+
+    buffer = bytearray(chunk_size)
+    view = memoryview(buffer)
+    try:
+        while True:
+            size = stream.readinto(buffer)
+            if not size:
+                return
+            chunk = view[:size]
+            if secret_digest:
+                secret_digest.update(chunk)
+            count("chunks")
+            yield sharer.split_chunk(chunk, k, n, prime=prime)
+    finally:
+        zeroize(buffer)
+
+
+def iter_combine_stream(share_iterators, prime=None):
+    """
+    Reads one share iterator per share file in lockstep and yields the bytes of
+    each recovered chunk, so only one chunk of every share is held in memory.
+    """
+    for shares in zip(*share_iterators, strict=True):
+        sharer = get_share_engine(get_share_engine_name(shares[0]))
+        count("chunks")
+        yield sharer.recover_chunk(list(shares), prime=prime)
+
+
+# Number of batches per worker: enough to balance the load, few enough to
+# amortize pickling the chunks and the shares
+BATCHES_PER_WORKER = 4
+
+
+def _map_chunk_batches(function, items, workers, *args):
+    """
+    Applies a batch function to the items, in batches spread over a process pool
+    when workers > 1. The results keep the order of the items.
+    """
+    if not workers or workers <= 1 or len(items) <= 1:
+        return function(items, *args)
+    batch_size = math.ceil(len(items) / (workers * BATCHES_PER_WORKER))
+    batches = [items[i : i + batch_size] for i in range(0, len(items), batch_size)]
+    from concurrent.futures import ProcessPoolExecutor
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        results = executor.map(function, batches, *[repeat(arg) for arg in args])
+        return [result for batch in results for result in batch]
+
+
+def _split_chunk_batch(secret_chunks, engine, k, n, prime):
+    return get_share_engine(engine).split_chunks(secret_chunks, k, n, prime=prime)
+
+
+def _recover_chunk_batch(share_chunks, prime):
+    return [
+        get_share_engine(get_share_engine_name(shares[0])).recover_chunk(
+            shares, prime=prime
+        )
+        for shares in share_chunks
+    ]
+
+
+def _recover_checked_chunk_batch(items, threshold, prime):
+    results = []
+    for shares, _ in items:
+        # a corrupted share may have lost its tag, most shares have the right one
+        engine = collections.Counter(map(get_share_engine_name, shares)).most_common(1)
+        if not engine:
+            raise ValueError(f"No shares are left for a chunk, {threshold} are needed.")
+        sharer = get_share_engine(engine[0][0])
+        results.append(sharer.recover_chunk_checked(shares, threshold, prime=prime))
+    return results
+
+
+# Bases tried for a chunk past the windows before giving up, so that shares
+# with too many bad ones fail quickly instead of enumerating every base
+MAX_CONSISTENCY_BASES = 4096
+
+
+def find_consistent_shares(x_values, threshold, lies_on):
+    """
+    Finds the shares that do not lie on the polynomial of the others.
+    lies_on(base, index) tells whether the share at index lies on the polynomial
+    through the shares at the base indexes. A base is accepted once at most
+    (count - threshold) // 2 of the other shares contradict it: with that many
+    bad shares at most, no other polynomial gathers as many shares, so any
+    decodable pattern of bad shares is found. Windows of threshold consecutive
+    shares are tried first; with good shares only, the first window is confirmed
+    by every other share. Then the other bases are enumerated, starting from the
+    shares that took part in the fewest rejected bases. Returns the base and the
+    bad indexes.
+    """
+    share_count = len(x_values)
+    if share_count < threshold:
+        raise ValueError(f"{share_count} shares are left for a chunk, {threshold} are needed.")
+    if share_count == threshold:
+        return list(range(share_count)), []
+    max_bad = (share_count - threshold) // 2
+    rejections = [0] * share_count
+
+    def find_bad(base):
+        bad = []
+        for index in range(share_count):
+            if index not in base and not lies_on(base, index):
+                bad.append(index)
+                if len(bad) > max_bad:
+                    for base_index in base:
+                        rejections[base_index] += 1
+                    return None
+        return bad
+
+    windows = [
+        [(start + i) % share_count for i in range(threshold)]
+        for start in range(share_count)
+    ]
+    for base in windows:
+        bad = find_bad(base)
+        if bad is not None:
+            return base, bad
+
+    tried = {tuple(sorted(base)) for base in windows}
+    order = sorted(range(share_count), key=rejections.__getitem__)
+    bases = (
+        sorted(base)
+        for base in combinations(order, threshold)
+        if tuple(sorted(base)) not in tried
+    )
+    for base in islice(bases, MAX_CONSISTENCY_BASES):
+        bad = find_bad(base)
+        if bad is not None:
+            return base, bad
+    raise ValueError(
+        "The shares of a chunk disagree and the bad ones cannot be told apart, "
+        "more shares are needed."
+    )
+
+
+def _share_x(share):
+    return share.split(ENGINE_TAG_SEPARATOR)[-1].split("-", 1)[0]
 
 
 def prepare_shares_for_combine(shares):
@@ -93,11 +365,23 @@ def prepare_shares_for_combine(shares):
     return share_chunks
 
 
-def _split_large_string(secret_string, chunk_size):
-    return [
-        secret_string[i : i + chunk_size]
-        for i in range(0, len(secret_string), chunk_size)
-    ]
+def _chunk_bounds(secret_string, length, chunk_size):
+    """
+    Returns the (start, end) byte offsets of the chunks of a secret of length
+    bytes. Text is chunked by characters, as chunk_size counts them.
+    """
+    if not isinstance(secret_string, str) or secret_string.isascii():
+        return [
+            (start, min(start + chunk_size, length))
+            for start in range(0, length, chunk_size)
+        ]
+    bounds = []
+    start = 0
+    for i in range(0, len(secret_string), chunk_size):
+        end = start + len(secret_string[i : i + chunk_size].encode())
+        bounds.append((start, end))
+        start = end
+    return bounds
 
 
 class SecretSharer:
@@ -117,22 +401,109 @@ class SecretSharer:
         pass
 
     @classmethod
-    def split_secret(cls, secret_string, share_threshold, num_shares):
-        secret_int = charset_to_int(secret_string, cls.secret_charset)
-        points = secret_int_to_points(secret_int, share_threshold, num_shares)
-        shares = []
-        for point in points:
-            shares.append(point_to_share_string(point, cls.share_charset))
-        return shares
+    def split_secret(cls, secret_string, share_threshold, num_shares, prime=None):
+        return cls.split_secrets([secret_string], share_threshold, num_shares, prime)[0]
+
+    @classmethod
+    def split_secrets(cls, secret_strings, share_threshold, num_shares, prime=None):
+        charset_to_int = get_arithmetic_backend().charset_to_int
+        with stage("charset_to_int"):
+            secret_ints = [charset_to_int(s, cls.secret_charset) for s in secret_strings]
+        observe("secret_int_bits", (i.bit_length() for i in secret_ints))
+        with stage("polynomial_evaluation"):
+            points_list = secret_ints_to_points(
+                secret_ints, share_threshold, num_shares, prime=prime
+            )
+        with stage("share_encoding"):
+            return [
+                [_point_to_share_string(point, cls.share_charset) for point in points]
+                for points in points_list
+            ]
+
+    @classmethod
+    def recover_secret(cls, shares, prime=None):
+        with stage("share_decoding"):
+            points = []
+            for share in shares:
+                points.append(_share_string_to_point(share, cls.share_charset))
+        with stage("lagrange_interpolation"):
+            secret_int = points_to_secret_int(points, prime=prime)
+        with stage("int_to_charset"):
+            secret_string = get_arithmetic_backend().int_to_charset(
+                secret_int, cls.secret_charset
+            )
+        return secret_string
 
     @classmethod
-    def recover_secret(cls, shares):
+    def _parse_points(cls, shares, prime=None):
+        # unreadable shares and shares out of the field are None
         points = []
         for share in shares:
-            points.append(share_string_to_point(share, cls.share_charset))
-        secret_int = points_to_secret_int(points)
-        secret_string = int_to_charset(secret_int, cls.secret_charset)
-        return secret_string
+            try:
+                points.append(_share_string_to_point(share, cls.share_charset))
+            except ValueError:
+                points.append(None)
+        if not prime:
+            prime = get_large_enough_prime([point[1] for point in points if point])
+        return [point if point and point[1] < prime else None for point in points], prime
+
+    @classmethod
+    def _secret_int_to_chunk(cls, secret_int):
+        return get_arithmetic_backend().int_to_charset(secret_int, cls.secret_charset)
+
+    @classmethod
+    def recover_chunk_checked(cls, shares, threshold, prime=None):
+        """
+        Recovers a chunk from at least threshold shares and finds the shares that
+        do not lie on the polynomial of the others, using Lagrange weights cached
+        per set of x-coordinates. Returns the chunk and the indexes of the bad shares.
+        """
+        points, prime = cls._parse_points(shares, prime)
+        valid = [index for index, point in enumerate(points) if point is not None]
+        x_values = [points[index][0] for index in valid]
+        y_values = [points[index][1] for index in valid]
+
+        def lies_on(base, target):
+            weights = lagrange_weights_at(
+                tuple(x_values[index] for index in base), x_values[target], prime
+            )
+            predicted = get_arithmetic_backend().dot_mod(
+                [y_values[index] for index in base], weights, prime
+            )
+            return predicted == y_values[target]
+
+        with stage("lagrange_interpolation"):
+            base, bad = find_consistent_shares(x_values, threshold, lies_on)
+            secret_int = points_to_secret_ints(
+                [x_values[index] for index in base],
+                [[y_values[index] for index in base]],
+                prime,
+            )[0]
+        unreadable = [index for index, point in enumerate(points) if point is None]
+        return cls._secret_int_to_chunk(secret_int), sorted(
+            unreadable + [valid[index] for index in bad]
+        )
+
+
+HEX_CHARSET = string.hexdigits[0:16]
+
+
+def _point_to_share_string(point, charset):
+    # int_to_charset is quadratic in the number of digits, hex has a native path
+    if charset == HEX_CHARSET:
+        return f"{point[0]:x}-{point[1]:x}"
+    from secretsharing.sharing import point_to_share_string
+
+    return point_to_share_string(point, charset)
+
+
+def _share_string_to_point(share_string, charset):
+    if charset == HEX_CHARSET:
+        x_string, y_string = share_string.split("-")
+        return int(x_string, 16), int(y_string, 16)
+    from secretsharing.sharing import share_string_to_point
+
+    return share_string_to_point(share_string, charset)
 
 
 class PlaintextToHexSecretSharer(SecretSharer):
@@ -143,6 +514,146 @@ class PlaintextToHexSecretSharer(SecretSharer):
     secret_charset = string.printable
     share_charset = string.hexdigits[0:16]
 
+    @classmethod
+    def split_chunk(cls, chunk, share_threshold, num_shares, prime=None):
+        return cls.split_chunks([chunk], share_threshold, num_shares, prime=prime)[0]
+
+    @classmethod
+    def split_chunks(cls, chunks, share_threshold, num_shares, prime=None):
+        for chunk in chunks:
+            if chunk[:1] == b"\x00":
+                # leading zero digits are lost in the charset conversion
+                raise ValueError(
+                    "The prime engine cannot share chunks starting with a NUL byte, "
+                    "use the bytes or gf256 engine for binary data."
+                )
+        with stage("string_to_hex"):
+            hex_chunks = [chunk.hex() for chunk in chunks]
+        return cls.split_secrets(hex_chunks, share_threshold, num_shares, prime=prime)
+
+    @classmethod
+    def recover_chunk(cls, shares, prime=None):
+        return cls._hex_to_chunk(cls.recover_secret(shares, prime=prime))
+
+    @classmethod
+    def _secret_int_to_chunk(cls, secret_int):
+        return cls._hex_to_chunk(super()._secret_int_to_chunk(secret_int))
+
+    @staticmethod
+    def _hex_to_chunk(hex_chunk):
+        # a leading "0" is lost in the charset conversion when the chunk starts
+        # with a control character such as a newline
+        if len(hex_chunk) % 2:
+            hex_chunk = "0" + hex_chunk
+        return bytes.fromhex(hex_chunk)
+
+
+class BytesSecretSharer(SecretSharer):
+    """
+    Shares raw bytes without hex or charset conversion. The secret bytes are
+    mapped straight to an integer with int.from_bytes and the shares are written
+    as "bytes:<x>-<base64 y>". The y value is padded to the byte width of the
+    prime, which identifies the prime on recovery.
+    """
+
+    engine_tag = "bytes"
+
+    @classmethod
+    def split_secret(cls, secret_bytes, share_threshold, num_shares, prime=None):
+        return cls.split_secrets([secret_bytes], share_threshold, num_shares, prime)[0]
+
+    @classmethod
+    def split_secrets(cls, secrets_bytes, share_threshold, num_shares, prime=None):
+        if prime and prime not in get_bytes_primes():
+            raise ValueError(
+                f"The bytes engine needs a standard prime of at least "
+                f"{BYTES_MIN_PRIME_BITS} bits."
+            )
+        # the leading 0x01 keeps leading zero bytes of the secret, it is set as a
+        # bit rather than prepended so the chunk is not copied
+        with stage("bytes_to_int"):
+            secret_ints = [
+                int.from_bytes(s, "big") | (1 << (8 * len(s))) for s in secrets_bytes
+            ]
+        observe("secret_int_bits", (i.bit_length() for i in secret_ints))
+        primes = [prime or get_bytes_prime([i, num_shares]) for i in secret_ints]
+        if None in primes:
+            raise ValueError("Error! Secret is too long for share calculation!")
+        with stage("polynomial_evaluation"):
+            points_list = secret_ints_to_points(
+                secret_ints, share_threshold, num_shares, primes=primes
+            )
+        with stage("share_encoding"):
+            share_lists = []
+            for points, secret_prime in zip(points_list, primes):
+                width = (secret_prime.bit_length() + 7) // 8
+                share_lists.append(
+                    [
+                        f"{cls.engine_tag}:{x:x}-"
+                        + base64.b64encode(y.to_bytes(width, "big")).decode("ascii")
+                        for x, y in points
+                    ]
+                )
+        return share_lists
+
+    @classmethod
+    def recover_secret(cls, shares, prime=None):
+        # the prime is identified by the width of the shares
+        with stage("share_decoding"):
+            points = []
+            widths = set()
+            for share in shares:
+                tag, point = share.split(ENGINE_TAG_SEPARATOR, 1)
+                if tag != cls.engine_tag:
+                    raise ValueError(f"Share is not a {cls.engine_tag} share.")
+                x_string, y_string = point.split("-")
+                y_bytes = base64.b64decode(y_string)
+                widths.add(len(y_bytes))
+                points.append((int(x_string, 16), int.from_bytes(y_bytes, "big")))
+        width = widths.pop() if len(widths) == 1 else None
+        primes_by_width = get_bytes_primes_by_width()
+        if width not in primes_by_width:
+            raise ValueError("Shares have an invalid length.")
+        prime = primes_by_width[width]
+        with stage("lagrange_interpolation"):
+            secret_int = points_to_secret_int(points, prime=prime)
+        return cls._secret_int_to_chunk(secret_int)
+
+    @classmethod
+    def _parse_points(cls, shares, prime=None):
+        # the prime is identified by the width most of the shares have
+        parsed = []
+        for share in shares:
+            try:
+                tag, point = share.split(ENGINE_TAG_SEPARATOR, 1)
+                x_string, y_string = point.split("-")
+                y_bytes = base64.b64decode(y_string, validate=True)
+                if tag != cls.engine_tag:
+                    raise ValueError(f"Share is not a {cls.engine_tag} share.")
+                parsed.append((int(x_string, 16), y_bytes))
+            except ValueError:
+                parsed.append(None)
+        widths = collections.Counter(len(point[1]) for point in parsed if point)
+        width = widths.most_common(1)[0][0] if widths else None
+        primes_by_width = get_bytes_primes_by_width()
+        if width not in primes_by_width:
+            raise ValueError("Shares have an invalid length.")
+        prime = primes_by_width[width]
+        points = []
+        for point in parsed:
+            y = int.from_bytes(point[1], "big") if point and len(point[1]) == width else None
+            points.append((point[0], y) if y is not None and y < prime else None)
+        return points, prime
+
+    @classmethod
+    def _secret_int_to_chunk(cls, secret_int):
+        secret_bytes = secret_int.to_bytes((secret_int.bit_length() + 7) // 8, "big")
+        return secret_bytes[1:]
+
+    split_chunk = split_secret
+    split_chunks = split_secrets
+    recover_chunk = recover_secret
+
 
 def secret_int_to_points(secret_int, point_threshold, num_points, prime=None):
     """Split a secret (integer) into shares (pair of integers / x,y coordinates).
@@ -150,24 +661,68 @@ def secret_int_to_points(secret_int, point_threshold, num_points, prime=None):
     Sample the points of a random polynomial with the y intercept equal to
     the secret int.
     """
+    return secret_ints_to_points(
+        [secret_int], point_threshold, num_points, prime=prime
+    )[0]
+
+
+def secret_ints_to_points(
+    secret_ints, point_threshold, num_points, prime=None, primes=None
+):
+    """Split many secret ints into shares in one batch. Each secret uses prime,
+    its entry in primes, or the smallest standard prime that fits it; the
+    secrets sharing a prime are evaluated together by get_polynomials_points.
+    """
     if point_threshold < 2:
         raise ValueError("Threshold must be >= 2.")
     if point_threshold > num_points:
         raise ValueError("Threshold must be < the total number of points.")
-    if not prime:
-        prime = get_large_enough_prime([secret_int, num_points])
-    if not prime:
-        raise ValueError("Error! Secret is too long for share calculation!")
-    coefficients = large_enough_polynomial(
-        point_threshold - 1, secret_int, prime
+    if primes is None:
+        primes = [
+            prime or get_large_enough_prime([secret_int, num_points])
+            for secret_int in secret_ints
+        ]
+    groups = {}
+    for index, (secret_int, secret_prime) in enumerate(zip(secret_ints, primes)):
+        if not secret_prime:
+            raise ValueError("Error! Secret is too long for share calculation!")
+        if secret_int >= secret_prime or num_points >= secret_prime:
+            raise ValueError("Error! Secret is too long for the given prime!")
+        groups.setdefault(secret_prime, []).append(index)
+
+    points_list = [None] * len(secret_ints)
+    for secret_prime, indexes in groups.items():
+        coefficients_list = [
+            large_enough_polynomial(
+                point_threshold - 1, secret_ints[index], secret_prime
+            )
+            for index in indexes
+        ]
+        group_points = get_polynomials_points(
+            coefficients_list, num_points, secret_prime
+        )
+        for index, points in zip(indexes, group_points):
+            points_list[index] = points
+    return points_list
+
+
+def get_polynomials_points(coefficients_list, num_points, prime):
+    """Evaluates many polynomials at x = 1..num_points with Horner's method, on
+    the arithmetic backend. The x values are small, so each Horner step
+    multiplies by a small int and every point is reduced once at the end. The
+    coefficients are random for every chunk, so nothing is cached across
+    polynomials.
+    """
+    return get_arithmetic_backend().polynomials_points(
+        coefficients_list, range(1, num_points + 1), prime
     )
-    points = get_polynomial_points(coefficients, num_points, prime)
-    return points
 
 
 def points_to_secret_int(points, prime=None):
     """Join int points into a secret int.
-    Get the intercept of a random polynomial defined by the given points.
+    Get the intercept of a random polynomial defined by the given points. The
+    prime is inferred from the points only for shares split without a recorded
+    prime; combine resolves the recorded one once and passes it down.
     """
     if not isinstance(points, list):
         raise ValueError("Points must be in list form.")
@@ -179,11 +734,81 @@ def points_to_secret_int(points, prime=None):
     x_values, y_values = zip(*points)
     if not prime:
         prime = get_large_enough_prime(y_values)
-    free_coefficient = modular_lagrange_interpolation(0, points, prime)
-    secret_int = free_coefficient  # the secret int is the free coefficient
+    weights = lagrange_weights_at_zero(x_values, prime)
+    # the secret int is the free coefficient
+    secret_int = get_arithmetic_backend().dot_mod(y_values, weights, prime)
     return secret_int
 
 
+def points_to_secret_ints(x_values, y_values_per_chunk, prime):
+    """Recovers the secret int of every chunk shared at the same x-coordinates.
+    The Lagrange weights are computed once and each chunk costs a dot product.
+    """
+    weights = lagrange_weights_at_zero(tuple(x_values), prime)
+    dot_mod = get_arithmetic_backend().dot_mod
+    return [dot_mod(y_values, weights, prime) for y_values in y_values_per_chunk]
+
+
+LAGRANGE_WEIGHTS_CACHE_SIZE = 64
+
+
+def lagrange_weights_at_zero(x_values, prime):
+    """Returns the Lagrange basis polynomials of the x-coordinates evaluated at 0,
+    so that f(0) = sum(y_i * w_i) mod prime. Every chunk of a secret is shared at
+    the same x-coordinates, so the weights are cached per (x-coordinates, prime).
+    """
+    return lagrange_weights_at(x_values, 0, prime)
+
+
+@lru_cache(maxsize=LAGRANGE_WEIGHTS_CACHE_SIZE)
+def lagrange_weights_at(x_values, x, prime):
+    """Returns the Lagrange basis polynomials of the x-coordinates evaluated at x,
+    so that f(x) = sum(y_i * w_i) mod prime. Checking the other shares of a chunk
+    against the polynomial of a base costs one dot product per share.
+    """
+    if len(set(x_values)) != len(x_values):
+        raise ValueError("Share x-coordinates must be distinct.")
+    backend = get_arithmetic_backend()
+    weights = []
+    for i, x_i in enumerate(x_values):
+        numerator, denominator = 1, 1
+        for j, x_j in enumerate(x_values):
+            if i != j:
+                numerator = (numerator * (x - x_j)) % prime
+                denominator = (denominator * (x_i - x_j)) % prime
+        weights.append((numerator * backend.invert(denominator, prime)) % prime)
+    return tuple(weights)
+
+
+MERSENNE_PRIME_EXPONENTS = (
+    2,
+    3,
+    5,
+    7,
+    13,
+    17,
+    19,
+    31,
+    61,
+    89,
+    107,
+    127,
+    521,
+    607,
+    1279,
+    2203,
+    2281,
+    3217,
+    4253,
+    4423,
+    9689,
+    9941,
+    11213,
+    19937,
+    21701,
+)
+
+
 def calculate_mersenne_primes():
     """Returns all the mersenne primes with less than 500 digits.
     All primes:
@@ -194,87 +819,82 @@ def calculate_mersenne_primes():
     53113799281676709868...70835393219031728127L, (183 digits)
     10407932194664399081...20710555703168729087L, (386 digits)
     """
-    mersenne_prime_exponents = [
-        2,
-        3,
-        5,
-        7,
-        13,
-        17,
-        19,
-        31,
-        61,
-        89,
-        107,
-        127,
-        521,
-        607,
-        1279,
-        2203,
-        2281,
-        3217,
-        4253,
-        4423,
-        9689,
-        9941,
-        11213,
-        19937,
-        21701,
-    ]
-    primes = []
-    for exp in mersenne_prime_exponents:
-        prime = 1
-        for i in range(exp):
-            prime *= 2
-        prime -= 1
-        primes.append(prime)
-    return primes
-
-
-SMALLEST_257BIT_PRIME = 2**256 + 297
-SMALLEST_321BIT_PRIME = 2**320 + 27
-SMALLEST_385BIT_PRIME = 2**384 + 231
-STANDARD_PRIMES = calculate_mersenne_primes() + [
-    SMALLEST_257BIT_PRIME,
-    SMALLEST_321BIT_PRIME,
-    SMALLEST_385BIT_PRIME,
-]
-STANDARD_PRIMES.sort()
+    return [(1 << exp) - 1 for exp in MERSENNE_PRIME_EXPONENTS]
+
+
+SMALLEST_257BIT_PRIME = (1 << 256) + 297
+SMALLEST_321BIT_PRIME = (1 << 320) + 27
+SMALLEST_385BIT_PRIME = (1 << 384) + 231
+
+
+@lru_cache(maxsize=None)
+def get_standard_primes():
+    """Returns the sorted standard primes. They are built on first use rather
+    than at import, which keeps the scripts quick to start."""
+    return tuple(
+        sorted(
+            calculate_mersenne_primes()
+            + [SMALLEST_257BIT_PRIME, SMALLEST_321BIT_PRIME, SMALLEST_385BIT_PRIME]
+        )
+    )
 
 
 def get_large_enough_prime(batch):
     """Returns a prime number that is greater all the numbers in the batch."""
-    # build a list of primes
-    primes = STANDARD_PRIMES
-    # find a prime that is greater than all the numbers in the batch
-    for prime in primes:
-        numbers_greater_than_prime = [i for i in batch if i > prime]
-        if len(numbers_greater_than_prime) == 0:
+    standard_primes = get_standard_primes()
+    # find the first prime that is not smaller than the largest number
+    index = bisect.bisect_left(standard_primes, max(batch))
+    if index == len(standard_primes):
+        return None
+    return standard_primes[index]
+
+
+# Primes used by the bytes engine, which all have a distinct byte width
+BYTES_MIN_PRIME_BITS = 127
+
+
+@lru_cache(maxsize=None)
+def get_bytes_primes():
+    return tuple(
+        p for p in get_standard_primes() if p.bit_length() >= BYTES_MIN_PRIME_BITS
+    )
+
+
+@lru_cache(maxsize=None)
+def get_bytes_primes_by_width():
+    return {(p.bit_length() + 7) // 8: p for p in get_bytes_primes()}
+
+
+def get_standard_prime(bits):
+    """Returns the standard prime with the given bit length."""
+    for prime in get_standard_primes():
+        if prime.bit_length() == bits:
+            return prime
+    raise ValueError(f"No standard prime has {bits} bits.")
+
+
+def get_bytes_prime(batch):
+    """Returns the smallest bytes engine prime greater than all the numbers in the batch."""
+    largest = max(batch)
+    for prime in get_bytes_primes():
+        if largest < prime:
             return prime
     return None
 
 
 def large_enough_polynomial(degree, intercept, upper_bound):
-    """Generates a random polynomial with positive coefficients."""
+    """Generates a random polynomial with the given intercept. Every other
+    coefficient is drawn uniformly below upper_bound from the secrets module, so
+    each chunk gets its own polynomial and fewer than threshold shares reveal
+    nothing about the intercept."""
     if degree < 0:
         raise ValueError("Degree must be a non-negative number.")
     coefficients = [intercept]
-    try:
-        sys.set_int_max_str_digits(6500)
-    except AttributeError:
-        pass
-    for i in range(degree):
-        coefficient = get_large_enough_coefficient(upper_bound, i)
-        coefficients.append(coefficient)
+    for _ in range(degree):
+        coefficients.append(secrets.randbelow(upper_bound))
     return coefficients
 
 
-def get_large_enough_coefficient(prime, i):
-    kkk = "5462458264" * 1000
-    c = kkk[i * 3 : (i * 3) + (len(str(prime)) - 1)]
-    return int(c)
-
-
 def string_to_hex(s):
     return s.encode().hex()
 
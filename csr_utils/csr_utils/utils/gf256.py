@@ -0,0 +1,186 @@
+import collections
+import secrets
+import numpy as np
+from .encoding_functions import find_consistent_shares
+
+GF256_ENGINE_TAG = "gf256"
+
+
+def _build_tables():
+    """
+    Builds the exp/log tables of GF(2^8) with the AES reduction polynomial
+    x^8 + x^4 + x^3 + x + 1 and generator 3. The exp table is doubled so that
+    the sum of two logs can index it without a modulo.
+    """
+    exp = np.zeros(510, dtype=np.uint8)
+    log = np.zeros(256, dtype=np.int16)
+    value = 1
+    for i in range(255):
+        exp[i] = value
+        log[value] = i
+        value ^= ((value << 1) ^ (0x11B if value & 0x80 else 0)) & 0xFF
+    exp[255:] = exp[:255]
+    return exp, log
+
+
+GF256_EXP, GF256_LOG = _build_tables()
+
+
+def gf256_mul(a, b):
+    """
+    Multiplies two arrays (or an array and a scalar) element-wise in GF(2^8).
+    """
+    product = GF256_EXP[GF256_LOG[a] + GF256_LOG[b]]
+    return np.where((np.asarray(a) == 0) | (np.asarray(b) == 0), 0, product).astype(
+        np.uint8
+    )
+
+
+def gf256_split(secret_bytes, share_threshold, num_shares):
+    """
+    Splits every byte of the secret with its own random polynomial of degree
+    share_threshold - 1. All bytes and all shares are evaluated at once with
+    Horner's method. Returns a (num_shares, len(secret_bytes)) array whose row i
+    is the share at x = i + 1.
+    """
+    if share_threshold < 2:
+        raise ValueError("Threshold must be >= 2.")
+    if share_threshold > num_shares:
+        raise ValueError("Threshold must be < the total number of points.")
+    if num_shares > 255:
+        raise ValueError("GF(256) supports at most 255 shares.")
+    length = len(secret_bytes)
+    # the secret is copied straight into the coefficient array, which is
+    # zeroized once the shares are evaluated
+    coefficients = np.empty((share_threshold, length), dtype=np.uint8)
+    coefficients[0] = np.frombuffer(secret_bytes, dtype=np.uint8)
+    coefficients[1:] = np.frombuffer(
+        secrets.token_bytes((share_threshold - 1) * length), dtype=np.uint8
+    ).reshape(share_threshold - 1, length)
+    x_values = np.arange(1, num_shares + 1, dtype=np.uint8).reshape(num_shares, 1)
+    y_values = np.zeros((num_shares, length), dtype=np.uint8)
+    try:
+        for coefficient in coefficients[::-1]:
+            y_values = gf256_mul(y_values, x_values) ^ coefficient
+    finally:
+        coefficients.fill(0)
+    return y_values
+
+
+def gf256_lagrange_weights(x_values, x=0):
+    """
+    Returns the Lagrange basis weights evaluated at x, 0 by default, for the
+    given x-coordinates. Subtraction is XOR in GF(2^8).
+    """
+    if len(set(x_values)) != len(x_values) or 0 in x_values or x in x_values:
+        raise ValueError("Share x-coordinates must be distinct and non-zero.")
+    log = GF256_LOG.tolist()
+    weights = []
+    for i, x_i in enumerate(x_values):
+        log_weight = 0
+        for j, x_j in enumerate(x_values):
+            if i != j:
+                log_weight += log[x ^ x_j] - log[x_i ^ x_j]
+        weights.append(int(GF256_EXP[log_weight % 255]))
+    return weights
+
+
+def gf256_combine(x_values, y_values):
+    """
+    Recovers the secret bytes from the shares at the given x-coordinates.
+    y_values is a (len(x_values), secret length) array of share bytes.
+    """
+    weights = gf256_lagrange_weights(list(x_values))
+    result = gf256_evaluate(weights, y_values)
+    try:
+        return result.tobytes()
+    finally:
+        result.fill(0)
+
+
+def gf256_evaluate(weights, y_values):
+    """
+    Returns the XOR of the share rows multiplied by their Lagrange weights.
+    """
+    result = np.zeros(y_values.shape[1], dtype=np.uint8)
+    for weight, row in zip(weights, y_values):
+        result ^= gf256_mul(row, weight)
+    return result
+
+
+class GF256SecretSharer:
+    """
+    Shares secrets byte by byte over GF(2^8). Shares have the same length as the
+    secret and are written as "gf256:<x>-<hex bytes>".
+    """
+
+    engine_tag = GF256_ENGINE_TAG
+
+    @classmethod
+    def split_chunk(cls, chunk, share_threshold, num_shares, prime=None):
+        # GF(2^8) has a fixed modulus, the prime is ignored
+        y_values = gf256_split(chunk, share_threshold, num_shares)
+        return [
+            f"{cls.engine_tag}:{x:x}-{row.tobytes().hex()}"
+            for x, row in enumerate(y_values, start=1)
+        ]
+
+    @classmethod
+    def split_chunks(cls, chunks, share_threshold, num_shares, prime=None):
+        return [cls.split_chunk(chunk, share_threshold, num_shares) for chunk in chunks]
+
+    @classmethod
+    def recover_chunk(cls, shares, prime=None):
+        x_values = []
+        rows = []
+        for share in shares:
+            tag, point = share.split(":", 1)
+            if tag != cls.engine_tag:
+                raise ValueError(f"Share is not a {cls.engine_tag} share.")
+            x_string, y_string = point.split("-")
+            x_values.append(int(x_string, 16))
+            rows.append(np.frombuffer(bytes.fromhex(y_string), dtype=np.uint8))
+        if len({len(row) for row in rows}) != 1:
+            raise ValueError("Shares have different lengths.")
+        return gf256_combine(x_values, np.vstack(rows))
+
+    @classmethod
+    def recover_chunk_checked(cls, shares, threshold, prime=None):
+        """
+        Recovers a chunk from at least threshold shares and finds the shares whose
+        bytes do not lie on the polynomials of the others. Returns the chunk and
+        the indexes of the bad shares.
+        """
+        parsed = []
+        for share in shares:
+            try:
+                tag, point = share.split(":", 1)
+                x_string, y_string = point.split("-")
+                x = int(x_string, 16)
+                if tag != cls.engine_tag or not 0 < x < 256:
+                    raise ValueError(f"Share is not a {cls.engine_tag} share.")
+                parsed.append((x, np.frombuffer(bytes.fromhex(y_string), dtype=np.uint8)))
+            except ValueError:
+                parsed.append(None)
+        # a truncated share has a different length than most of the others
+        lengths = collections.Counter(len(point[1]) for point in parsed if point)
+        length = lengths.most_common(1)[0][0] if lengths else None
+        valid = [
+            index
+            for index, point in enumerate(parsed)
+            if point and len(point[1]) == length
+        ]
+        x_values = [parsed[index][0] for index in valid]
+        rows = np.vstack([parsed[index][1] for index in valid]) if valid else None
+
+        def lies_on(base, target):
+            weights = gf256_lagrange_weights(
+                [x_values[index] for index in base], x_values[target]
+            )
+            return np.array_equal(gf256_evaluate(weights, rows[base]), rows[target])
+
+        base, bad = find_consistent_shares(x_values, threshold, lies_on)
+        chunk = gf256_combine([x_values[index] for index in base], rows[base])
+        bad_shares = set(range(len(shares))) - set(valid)
+        bad_shares.update(valid[index] for index in bad)
+        return chunk, sorted(bad_shares)
@@ -0,0 +1,308 @@
+"""
+Per-stage timers and counters for key generation, splitting and combining.
+
+Instrumentation is off unless a run is wrapped in instrument(), which installs
+a Recorder for the process and hands its record to the sinks when the run ends:
+
+    with instrument("split", [JsonLinesSink("metrics.jsonl")]):
+        split_string_into_shares(...)
+
+While it is off, stage() returns a shared no-op context manager and count()
+and observe() return right away. The code paths call them at most once per
+chunk, never per share or per polynomial term. Stages may nest, so their times overlap.
+With workers > 1 the chunk stages run in worker processes and are not
+recorded; the enclosing split and combine stages are.
+"""
+import contextlib
+import os
+import time
+
+# the Recorder of the current run, None while instrumentation is off
+_recorder = None
+_NULL_STAGE = contextlib.nullcontext()
+
+PROMETHEUS_PREFIX = "csr_utils"
+# metric: (type, help)
+PROMETHEUS_METRICS = {
+    "run_seconds": ("gauge", "Wall time of the last run."),
+    "last_run_timestamp_seconds": ("gauge", "Unix time at which the last run ended."),
+    "last_run_success": ("gauge", "1 if the last run succeeded, 0 if it failed."),
+    "stage_seconds": ("gauge", "Seconds spent in each stage during the last run."),
+    "stage_calls": ("gauge", "Number of times each stage ran during the last run."),
+    "count": ("gauge", "Counters of the last run, such as chunks and bytes written."),
+    "observation_min": ("gauge", "Smallest observed value during the last run."),
+    "observation_max": ("gauge", "Largest observed value during the last run."),
+    "observation_mean": ("gauge", "Mean observed value during the last run."),
+}
+
+
+def is_enabled():
+    return _recorder is not None
+
+
+def stage(name):
+    """
+    Times the enclosed block as the given stage of the current run.
+    """
+    if _recorder is None:
+        return _NULL_STAGE
+    return _recorder.stage(name)
+
+
+def count(name, value=1):
+    """
+    Adds value to a counter of the current run.
+    """
+    if _recorder is not None:
+        _recorder.count(name, value)
+
+
+def observe(name, values):
+    """
+    Records the minimum, maximum and mean of an iterable of values, such as the
+    bit widths of the secret ints of a batch.
+    """
+    if _recorder is not None:
+        _recorder.observe(name, values)
+
+
+class Recorder:
+    """
+    Accumulates the stage times, counters and observations of one run.
+    """
+
+    def __init__(self, command):
+        self.command = command
+        self.started = time.perf_counter()
+        self.stages = {}
+        self.counters = {}
+        self.observations = {}
+
+    @contextlib.contextmanager
+    def stage(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            calls, seconds = self.stages.get(name, (0, 0.0))
+            self.stages[name] = (calls + 1, seconds + time.perf_counter() - start)
+
+    def count(self, name, value=1):
+        self.counters[name] = self.counters.get(name, 0) + value
+
+    def observe(self, name, values):
+        values = list(values)
+        if not values:
+            return
+        observation = self.observations.setdefault(
+            name, {"count": 0, "sum": 0, "min": values[0], "max": values[0]}
+        )
+        observation["count"] += len(values)
+        observation["sum"] += sum(values)
+        observation["min"] = min(observation["min"], *values)
+        observation["max"] = max(observation["max"], *values)
+
+    def to_record(self, success=True):
+        """
+        Returns the run as a JSON serializable dict.
+        """
+        return {
+            "timestamp": time.time(),
+            "command": self.command,
+            "success": success,
+            "seconds": time.perf_counter() - self.started,
+            "stages": {
+                name: {"calls": calls, "seconds": seconds}
+                for name, (calls, seconds) in self.stages.items()
+            },
+            "counters": dict(self.counters),
+            "observations": {
+                name: {
+                    "count": observation["count"],
+                    "min": observation["min"],
+                    "max": observation["max"],
+                    "mean": observation["sum"] / observation["count"],
+                }
+                for name, observation in self.observations.items()
+            },
+        }
+
+
+class JsonLinesSink:
+    """
+    Appends the record of every run to a file as one JSON object per line.
+    """
+
+    def __init__(self, path):
+        self.path = path
+
+    def emit(self, record):
+        import json
+
+        with open(self.path, "a") as file:
+            file.write(json.dumps(record) + "\n")
+
+
+class PrometheusTextfileSink:
+    """
+    Writes the last run of every command to a Prometheus text file, as read by
+    the node_exporter textfile collector. The samples of the other commands
+    already in the file are kept and the file is replaced atomically.
+    """
+
+    def __init__(self, path):
+        self.path = path
+
+    def emit(self, record):
+        command_label = f'command="{record["command"]}"'
+        samples = {name: [] for name in PROMETHEUS_METRICS}
+        if os.path.exists(self.path):
+            with open(self.path, "r") as file:
+                for line in file:
+                    if line.startswith("#") or command_label in line:
+                        continue
+                    name = line.split("{", 1)[0][len(PROMETHEUS_PREFIX) + 1 :]
+                    if name in samples:
+                        samples[name].append(line.rstrip("\n"))
+
+        def add(metric, value, **labels):
+            label_string = ",".join(
+                [command_label] + [f'{key}="{label}"' for key, label in labels.items()]
+            )
+            samples[metric].append(
+                f"{PROMETHEUS_PREFIX}_{metric}{{{label_string}}} {value}"
+            )
+
+        add("run_seconds", record["seconds"])
+        add("last_run_timestamp_seconds", record["timestamp"])
+        add("last_run_success", int(record["success"]))
+        for name, values in record["stages"].items():
+            add("stage_seconds", values["seconds"], stage=name)
+            add("stage_calls", values["calls"], stage=name)
+        for name, value in record["counters"].items():
+            add("count", value, name=name)
+        for name, values in record["observations"].items():
+            for statistic in ("min", "max", "mean"):
+                add(f"observation_{statistic}", values[statistic], name=name)
+
+        lines = []
+        for name, (metric_type, help) in PROMETHEUS_METRICS.items():
+            if samples[name]:
+                lines.append(f"# HELP {PROMETHEUS_PREFIX}_{name} {help}")
+                lines.append(f"# TYPE {PROMETHEUS_PREFIX}_{name} {metric_type}")
+                lines.extend(samples[name])
+        temporary_path = f"{self.path}.{os.getpid()}.tmp"
+        with open(temporary_path, "w") as file:
+            file.write("\n".join(lines) + "\n")
+        os.replace(temporary_path, self.path)
+
+
+METRICS_SINKS = {"jsonl": JsonLinesSink, "prometheus": PrometheusTextfileSink}
+
+
+def get_metrics_sink(spec):
+    """
+    Builds a sink from a "<kind>:<path>" string, e.g. "jsonl:metrics.jsonl" or
+    "prometheus:/var/lib/node_exporter/csr_utils.prom".
+    """
+    kind, separator, path = spec.partition(":")
+    if not separator or not path or kind not in METRICS_SINKS:
+        raise ValueError(
+            f"Metrics sink must be <kind>:<path> with kind one of {tuple(METRICS_SINKS)}."
+        )
+    return METRICS_SINKS[kind](path)
+
+
+@contextlib.contextmanager
+def instrument(command, sinks):
+    """
+    Records the stages of the enclosed run and emits its record to every sink,
+    an object with an emit(record) method, when the run ends, also on failure.
+    """
+    global _recorder
+    previous = _recorder
+    recorder = _recorder = Recorder(command)
+    success = False
+    try:
+        yield recorder
+        success = True
+    finally:
+        _recorder = previous
+        record = recorder.to_record(success)
+        for sink in sinks:
+            sink.emit(record)
+
+
+PROFILE_TOP = 30
+
+
+@contextlib.contextmanager
+def profile(path_prefix):
+    """
+    Runs the enclosed block under cProfile and tracemalloc. The cProfile stats
+    are dumped to <path_prefix>.prof, for pstats or snakeviz, and a summary of
+    the slowest functions and of the lines that allocated the most memory to
+    <path_prefix>.txt.
+    """
+    import cProfile
+    import io
+    import pstats
+    import tracemalloc
+
+    profiler = cProfile.Profile()
+    tracemalloc.start()
+    profiler.enable()
+    try:
+        yield
+    finally:
+        profiler.disable()
+        snapshot = tracemalloc.take_snapshot()
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        profiler.dump_stats(f"{path_prefix}.prof")
+        summary = io.StringIO()
+        pstats.Stats(profiler, stream=summary).sort_stats("cumulative").print_stats(
+            PROFILE_TOP
+        )
+        summary.write(f"Peak traced memory: {peak} bytes\n\n")
+        summary.write(f"Top {PROFILE_TOP} allocations by line:\n")
+        for statistic in snapshot.statistics("lineno")[:PROFILE_TOP]:
+            summary.write(f"{statistic}\n")
+        with open(f"{path_prefix}.txt", "w") as file:
+            file.write(summary.getvalue())
+
+
+def add_instrumentation_arguments(parser):
+    """
+    Adds the --metrics_sink and --profile options shared by the scripts.
+    """
+    parser.add_argument(
+        "--metrics_sink",
+        type=str,
+        action="append",
+        help='record the time of each stage and the chunk, bit width and byte counters to a sink, \
+        "jsonl:<path>" or "prometheus:<path>". Can be repeated',
+        required=False,
+    )
+    parser.add_argument(
+        "--profile",
+        type=str,
+        help="run under cProfile and tracemalloc and dump the results to <profile>.prof and <profile>.txt",
+        required=False,
+    )
+
+
+@contextlib.contextmanager
+def instrumented_run(command, args):
+    """
+    Applies the --metrics_sink and --profile options of a script to the
+    enclosed run. Does nothing when neither is given.
+    """
+    with contextlib.ExitStack() as stack:
+        if args.profile:
+            stack.enter_context(profile(args.profile))
+        if args.metrics_sink:
+            sinks = [get_metrics_sink(spec) for spec in args.metrics_sink]
+            stack.enter_context(instrument(command, sinks))
+        yield
@@ -0,0 +1,62 @@
+"""
+Digests that let share files be checked without combining them.
+
+Every share file stores a short digest of each of its shares, so a corrupted
+chunk is found by hashing the file alone, and the salted SHA-256 digest of the
+whole secret, so the combined key can be checked. The salt is drawn once per
+split and recorded in the metadata of every share file, which also tells apart
+share files of different splits.
+"""
+import hashlib
+import os
+
+SALT_SIZE = 16
+SECRET_DIGEST_SIZE = 32
+CHUNK_DIGEST_SIZE = 8
+
+
+def chunk_digest(share):
+    """
+    Returns the digest of one share string as bytes.
+    """
+    return hashlib.blake2b(share.encode(), digest_size=CHUNK_DIGEST_SIZE).digest()
+
+
+class SecretDigest:
+    """
+    Salted SHA-256 digest of a secret, fed chunk by chunk.
+    """
+
+    def __init__(self, salt=None):
+        self.salt = salt if salt is not None else os.urandom(SALT_SIZE)
+        self._hash = hashlib.sha256(self.salt)
+
+    def update(self, data):
+        self._hash.update(data)
+
+    def hexdigest(self):
+        return self._hash.hexdigest()
+
+
+def get_secret_digest(secret_bytes, salt):
+    """
+    Returns the hex digest of a whole secret with the given salt.
+    """
+    digest = SecretDigest(salt)
+    digest.update(secret_bytes)
+    return digest.hexdigest()
+
+
+def verify_chunk_digests(shares, chunk_digests):
+    """
+    Returns the indexes of the shares that do not match their recorded digest,
+    given as hex strings. Shares beyond the recorded digests and missing shares
+    are reported as well.
+    """
+    bad_chunks = [
+        index
+        for index, (share, digest) in enumerate(zip(shares, chunk_digests))
+        if chunk_digest(share).hex() != digest
+    ]
+    shortest, longest = sorted((len(shares), len(chunk_digests)))
+    return bad_chunks + list(range(shortest, longest))
@@ -0,0 +1,322 @@
+import fcntl
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from itertools import repeat
+from cryptography.hazmat.backends import default_backend
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+
+KEY_POOL_PATH = os.path.join(
+    os.path.expanduser("~"), ".local", "share", "csr_utils", "key_pool"
+)
+KEY_POOL_PASSPHRASE_ENV = "CSR_UTILS_KEY_POOL_PASSPHRASE"
+DEFAULT_POOL_SIZE = 16
+# seconds between two checks of the watermark by the background refill
+REFILL_POLL_INTERVAL = 5
+POOL_KEY_SUFFIX = ".pem"
+CLAIMED_SUFFIX = ".claimed"
+# one empty file per key a refill is generating, so that concurrent refills
+# of a store count the keys on their way
+RESERVED_SUFFIX = ".reserved"
+# pool files that fail to load are moved aside with this suffix
+UNREADABLE_SUFFIX = ".unreadable"
+METRICS_FILE_NAME = "metrics.json"
+LOCK_FILE_NAME = ".lock"
+METRIC_NAMES = ("hits", "misses", "refills", "keys_generated", "refill_seconds")
+
+
+def generate_pool_key(bits, passphrase=None):
+    """
+    Generates an RSA private key and returns it as PKCS8 PEM, encrypted with the
+    passphrase if one is given. Runs in the refill worker processes.
+    """
+    private_key = rsa.generate_private_key(
+        public_exponent=65537, key_size=bits, backend=default_backend()
+    )
+    encryption = (
+        serialization.BestAvailableEncryption(passphrase)
+        if passphrase
+        else serialization.NoEncryption()
+    )
+    return private_key.private_bytes(
+        encoding=serialization.Encoding.PEM,
+        format=serialization.PrivateFormat.PKCS8,
+        encryption_algorithm=encryption,
+    )
+
+
+def _is_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        # a process of another user
+        return True
+    return True
+
+
+class KeyPool:
+    """
+    A store of pre-generated RSA private keys, one file per key in a directory
+    only readable by the owner. Keys are encrypted when a passphrase is given or
+    set in the CSR_UTILS_KEY_POOL_PASSPHRASE environment variable.
+
+    take() hands out a stored key, or generates one when the pool is empty. Once
+    start() is called, a background thread refills the pool up to size with a
+    process pool whenever it drops below the low watermark, a quarter of the size
+    by default. Several processes can share a store: a key is claimed with an
+    atomic rename before it is read, a refill reserves the keys it generates
+    and the metrics file is updated under an exclusive lock on the store.
+    Claims and reservations carry the pid of their process, so those left by a
+    process that died are cleared by the next refill. GenerateKeys.py and
+    GenerateSplitKeys.py only take keys; a long-running KeyPool.py --watch keeps
+    their store filled.
+    """
+
+    def __init__(
+        self,
+        path=KEY_POOL_PATH,
+        bits=4096,
+        size=DEFAULT_POOL_SIZE,
+        low_watermark=None,
+        workers=None,
+        passphrase=None,
+    ):
+        if low_watermark is None:
+            low_watermark = max(1, size // 4)
+        if not 0 <= low_watermark <= size:
+            raise ValueError("Low watermark must be between 0 and the pool size.")
+        self.path = os.path.join(path, f"rsa-{bits}")
+        self.bits = bits
+        self.size = size
+        self.low_watermark = low_watermark
+        self.workers = workers
+        if passphrase is None:
+            passphrase = os.environ.get(KEY_POOL_PASSPHRASE_ENV)
+        self.passphrase = passphrase.encode() if isinstance(passphrase, str) else passphrase
+        self.metrics = dict.fromkeys(METRIC_NAMES, 0)
+
+        os.makedirs(self.path, mode=0o700, exist_ok=True)
+        os.chmod(self.path, 0o700)
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._closed = threading.Event()
+        self._executor = None
+        self._thread = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def available(self):
+        return self._count(POOL_KEY_SUFFIX)
+
+    def take(self):
+        """
+        Returns a private key from the pool, or a freshly generated one if the
+        pool is empty. Pool files that cannot be loaded are renamed with the
+        .unreadable suffix and the next one is tried.
+        """
+        for name in sorted(os.listdir(self.path)):
+            if not name.endswith(POOL_KEY_SUFFIX):
+                continue
+            path = os.path.join(self.path, name)
+            claimed_path = f"{path}.{os.getpid()}{CLAIMED_SUFFIX}"
+            try:
+                os.rename(path, claimed_path)
+                with open(claimed_path, "rb") as file:
+                    data = file.read()
+            except FileNotFoundError:
+                # claimed by another process
+                continue
+            try:
+                private_key = serialization.load_pem_private_key(
+                    data, self.passphrase, backend=default_backend()
+                )
+            except (TypeError, ValueError) as e:
+                # a truncated file or another passphrase: keep it for inspection
+                os.replace(claimed_path, path + UNREADABLE_SUFFIX)
+                logging.warning(f"{path}: cannot load the pooled key ({e}), moved aside.")
+                continue
+            os.remove(claimed_path)
+            self._record(hits=1)
+            self._wakeup.set()
+            return private_key
+
+        self._record(misses=1)
+        self._wakeup.set()
+        return rsa.generate_private_key(
+            public_exponent=65537, key_size=self.bits, backend=default_backend()
+        )
+
+    def refill(self):
+        """
+        Generates keys in worker processes until the pool holds size keys.
+        Returns the number of keys added. The missing keys are counted and
+        reserved under the lock of the store and generated outside it, so
+        processes refilling the same store at once do not overshoot size and
+        the lock is never held during key generation.
+        """
+        if self._executor is None:
+            # workers are forked outside the lock of the store, so none inherits it
+            self._executor = ProcessPoolExecutor(max_workers=self.workers)
+        with self._file_lock():
+            self._remove_dead_claims()
+            missing = self.size - self.available() - self._count(RESERVED_SUFFIX)
+            reservations = [self._reserve() for _ in range(max(missing, 0))]
+        if not reservations:
+            return 0
+
+        start = time.perf_counter()
+        try:
+            for data, reservation in zip(
+                self._executor.map(
+                    generate_pool_key, repeat(self.bits, missing), repeat(self.passphrase)
+                ),
+                reservations,
+            ):
+                self._store(data)
+                os.remove(reservation)
+        finally:
+            for reservation in reservations:
+                if os.path.exists(reservation):
+                    os.remove(reservation)
+        self._record(
+            refills=1,
+            keys_generated=missing,
+            refill_seconds=time.perf_counter() - start,
+        )
+        return missing
+
+    def start(self):
+        """
+        Starts the background refill thread.
+        """
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._refill_loop, daemon=True)
+            self._thread.start()
+        return self
+
+    def close(self):
+        """
+        Stops the background refill and adds the metrics of this process to the
+        metrics file of the store.
+        """
+        self._closed.set()
+        self._wakeup.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+        self.save_metrics()
+
+    def get_metrics(self):
+        """
+        Returns the metrics of this process with the current pool level and hit rate.
+        """
+        with self._lock:
+            metrics = dict(self.metrics)
+        requests = metrics["hits"] + metrics["misses"]
+        metrics["hit_rate"] = metrics["hits"] / requests if requests else None
+        metrics["available"] = self.available()
+        return metrics
+
+    def load_metrics(self):
+        """
+        Returns the metrics accumulated by every process that closed this store.
+        """
+        path = os.path.join(self.path, METRICS_FILE_NAME)
+        if not os.path.exists(path):
+            return dict.fromkeys(METRIC_NAMES, 0)
+        with open(path, "r") as file:
+            return json.load(file)
+
+    def save_metrics(self):
+        """
+        Adds the metrics of this process to the metrics file of the store. The
+        file is read and rewritten under the lock of the store, so processes
+        closing at the same time do not lose each other's counts.
+        """
+        with self._lock:
+            metrics, self.metrics = self.metrics, dict.fromkeys(METRIC_NAMES, 0)
+        if not any(metrics.values()):
+            return
+        path = os.path.join(self.path, METRICS_FILE_NAME)
+        with self._file_lock():
+            totals = self.load_metrics()
+            for name, value in metrics.items():
+                totals[name] = totals.get(name, 0) + value
+            with open(path + ".tmp", "w") as file:
+                json.dump(totals, file, indent=2)
+            os.replace(path + ".tmp", path)
+
+    @contextmanager
+    def _file_lock(self):
+        # flock is released when the descriptor is closed, also if the process dies
+        fd = os.open(
+            os.path.join(self.path, LOCK_FILE_NAME),
+            os.O_RDWR | os.O_CREAT | os.O_CLOEXEC,
+            0o600,
+        )
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            yield
+        finally:
+            os.close(fd)
+
+    def _record(self, **increments):
+        with self._lock:
+            for name, value in increments.items():
+                self.metrics[name] += value
+
+    def _count(self, suffix):
+        return sum(1 for name in os.listdir(self.path) if name.endswith(suffix))
+
+    def _reserve(self):
+        name = f"{uuid.uuid4().hex}.{os.getpid()}{RESERVED_SUFFIX}"
+        path = os.path.join(self.path, name)
+        os.close(os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600))
+        return path
+
+    def _remove_dead_claims(self):
+        # a claimed key was read by a take() that died before handing it out,
+        # so it is deleted rather than put back; keys claimed by live processes
+        # are still being read and are left alone
+        for name in os.listdir(self.path):
+            if not name.endswith((CLAIMED_SUFFIX, RESERVED_SUFFIX)):
+                continue
+            pid = name.rsplit(".", 2)[-2]
+            if not pid.isdigit() or _is_alive(int(pid)):
+                continue
+            try:
+                os.remove(os.path.join(self.path, name))
+            except FileNotFoundError:
+                continue
+            if name.endswith(CLAIMED_SUFFIX):
+                logging.warning(f"{name}: removed the key of an interrupted take.")
+
+    def _store(self, data):
+        # written under a temporary name so that take() never reads a partial key
+        path = os.path.join(self.path, uuid.uuid4().hex)
+        fd = os.open(path + ".tmp", os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+        with os.fdopen(fd, "wb") as file:
+            file.write(data)
+        os.replace(path + ".tmp", path + POOL_KEY_SUFFIX)
+
+    def _refill_loop(self):
+        while not self._closed.is_set():
+            if self.available() < self.low_watermark:
+                self.refill()
+            self._wakeup.wait(REFILL_POLL_INTERVAL)
+            self._wakeup.clear()
@@ -0,0 +1,225 @@
+import ipaddress
+from functools import lru_cache
+from cryptography.hazmat.primitives.asymmetric import ec, ed25519, rsa
+from cryptography.hazmat.primitives import serialization, hashes
+from cryptography.hazmat.backends import default_backend
+from cryptography.x509 import CertificateSigningRequestBuilder
+from cryptography.x509.oid import NameOID
+from cryptography import x509
+from .instrumentation import stage
+
+KEY_ALGORITHMS = ("rsa", "ecdsa-p256", "ecdsa-p384", "ed25519")
+DEFAULT_KEY_ALGORITHM = "rsa"
+DEFAULT_RSA_KEY_SIZE = 4096
+MIN_RSA_KEY_SIZE = 2048
+# curve and CSR signature hash of each ECDSA algorithm
+EC_CURVES = {
+    "ecdsa-p256": (ec.SECP256R1, hashes.SHA256),
+    "ecdsa-p384": (ec.SECP384R1, hashes.SHA384),
+}
+# subject of the CSRs, attributes in the order they are written
+DEFAULT_CSR_SUBJECT = "C=IT,L=Rome,O=Colossus,CN=colossus.digital,emailAddress="
+SUBJECT_ATTRIBUTES = {
+    "C": NameOID.COUNTRY_NAME,
+    "ST": NameOID.STATE_OR_PROVINCE_NAME,
+    "L": NameOID.LOCALITY_NAME,
+    "O": NameOID.ORGANIZATION_NAME,
+    "OU": NameOID.ORGANIZATIONAL_UNIT_NAME,
+    "CN": NameOID.COMMON_NAME,
+    "emailAddress": NameOID.EMAIL_ADDRESS,
+    "serialNumber": NameOID.SERIAL_NUMBER,
+}
+SAN_TYPES = ("DNS", "IP", "email", "URI")
+TEMPLATE_CACHE_SIZE = 256
+
+
+def generate_private_key(
+    algorithm: str = DEFAULT_KEY_ALGORITHM, bits: int = DEFAULT_RSA_KEY_SIZE
+):
+    """
+    Generates a private key. The key size only applies to RSA, EC keys have the
+    size of their curve.
+    """
+    if algorithm == "rsa":
+        if bits < MIN_RSA_KEY_SIZE:
+            raise ValueError(f"RSA keys must have at least {MIN_RSA_KEY_SIZE} bits.")
+        return rsa.generate_private_key(
+            public_exponent=65537, key_size=bits, backend=default_backend()
+        )
+    if algorithm in EC_CURVES:
+        curve, _ = EC_CURVES[algorithm]
+        return ec.generate_private_key(curve(), default_backend())
+    if algorithm == "ed25519":
+        return ed25519.Ed25519PrivateKey.generate()
+    raise ValueError(f"Unknown key algorithm: {algorithm}")
+
+
+def get_key_algorithm(private_key):
+    """
+    Returns the name of the algorithm of a private key.
+    """
+    if isinstance(private_key, rsa.RSAPrivateKey):
+        return "rsa"
+    if isinstance(private_key, ed25519.Ed25519PrivateKey):
+        return "ed25519"
+    if isinstance(private_key, ec.EllipticCurvePrivateKey):
+        for algorithm, (curve, _) in EC_CURVES.items():
+            if isinstance(private_key.curve, curve):
+                return algorithm
+    raise ValueError(f"Unsupported private key type: {type(private_key).__name__}")
+
+
+def _split_template(template):
+    # splits on the commas not escaped with a backslash, and unescapes the parts
+    parts = [""]
+    escaped = False
+    for char in template:
+        if escaped:
+            parts[-1] += char
+            escaped = False
+        elif char == "\\":
+            escaped = True
+        elif char == ",":
+            parts.append("")
+        else:
+            parts[-1] += char
+    return [part.strip() for part in parts if part.strip()]
+
+
+@lru_cache(maxsize=TEMPLATE_CACHE_SIZE)
+def parse_subject_template(template):
+    """
+    Parses a subject template such as "C=IT,O=Colossus,CN={file_name}.colossus.digital"
+    into a tuple of (OID, value template), in the order written. Values may hold
+    {field} placeholders and backslash-escaped commas. Templates are parsed once
+    per process and cached.
+    """
+    attributes = []
+    for part in _split_template(template):
+        name, separator, value = part.partition("=")
+        if not separator or name.strip() not in SUBJECT_ATTRIBUTES:
+            raise ValueError(
+                f"Invalid subject attribute: {part}. Use NAME=value with NAME in {list(SUBJECT_ATTRIBUTES)}."
+            )
+        attributes.append((SUBJECT_ATTRIBUTES[name.strip()], value))
+    return tuple(attributes)
+
+
+@lru_cache(maxsize=TEMPLATE_CACHE_SIZE)
+def parse_san_template(template):
+    """
+    Parses a subject alternative name template such as
+    "DNS:{file_name}.colossus.digital,IP:10.0.0.1" into a tuple of (type, value
+    template). Templates are parsed once per process and cached.
+    """
+    names = []
+    for part in _split_template(template):
+        name_type, separator, value = part.partition(":")
+        if not separator or name_type not in SAN_TYPES:
+            raise ValueError(
+                f"Invalid subject alternative name: {part}. Use TYPE:value with TYPE in {list(SAN_TYPES)}."
+            )
+        names.append((name_type, value))
+    return tuple(names)
+
+
+def _render(value, fields):
+    try:
+        return value.format_map(fields)
+    except (KeyError, IndexError) as e:
+        raise ValueError(f"The template needs the field {e}.")
+
+
+def _general_name(name_type, value):
+    if name_type == "DNS":
+        return x509.DNSName(value)
+    if name_type == "IP":
+        return x509.IPAddress(ipaddress.ip_address(value))
+    if name_type == "email":
+        return x509.RFC822Name(value)
+    return x509.UniformResourceIdentifier(value)
+
+
+def get_signature_hash(private_key):
+    """
+    Returns the hash the CSR of a private key is signed with.
+    """
+    algorithm = get_key_algorithm(private_key)
+    if algorithm == "ed25519":
+        # Ed25519 hashes internally, the CSR is signed without a separate hash
+        return None
+    if algorithm in EC_CURVES:
+        return EC_CURVES[algorithm][1]()
+    return hashes.SHA256()
+
+
+def build_csr(private_key, subject=DEFAULT_CSR_SUBJECT, san=None, fields=None):
+    """
+    Signs a CSR for an existing private key and returns it in PEM. subject and
+    san are templates as parsed by parse_subject_template and parse_san_template,
+    whose {field} placeholders are filled from fields.
+    """
+    fields = fields or {}
+    builder = CertificateSigningRequestBuilder().subject_name(
+        x509.Name(
+            [
+                x509.NameAttribute(oid, _render(value, fields))
+                for oid, value in parse_subject_template(subject)
+            ]
+        )
+    )
+    if san:
+        builder = builder.add_extension(
+            x509.SubjectAlternativeName(
+                [
+                    _general_name(name_type, _render(value, fields))
+                    for name_type, value in parse_san_template(san)
+                ]
+            ),
+            critical=False,
+        )
+    with stage("csr_signing"):
+        csr = builder.sign(private_key, get_signature_hash(private_key), default_backend())
+    return csr.public_bytes(serialization.Encoding.PEM).decode("utf-8")
+
+
+def load_private_key(data):
+    """
+    Loads an unencrypted private key from its PEM or DER bytes. A bytearray is
+    passed to cryptography as it is, so no copy of the key is left to zeroize.
+    """
+    # a DER private key is an ASN.1 SEQUENCE, which starts with the 0x30 tag
+    if data[:1] == b"\x30":
+        return serialization.load_der_private_key(data, None, default_backend())
+    return serialization.load_pem_private_key(data, None, default_backend())
+
+
+def generate_key_and_public_key(
+    algorithm: str = DEFAULT_KEY_ALGORITHM,
+    bits: int = DEFAULT_RSA_KEY_SIZE,
+    private_key=None,
+):
+    """
+    Generates a private key of the given algorithm and the CSR of its public key.
+    A private key taken from a key pool can be passed in, in which case only the
+    CSR is signed.
+    """
+    if private_key is None:
+        with stage("key_generation"):
+            private_key = generate_private_key(algorithm, bits)
+    public = build_csr(private_key)
+
+    with stage("pem_serialization"):
+        private = private_key.private_bytes(
+            encoding=serialization.Encoding.PEM,
+            format=serialization.PrivateFormat.PKCS8,
+            encryption_algorithm=serialization.NoEncryption(),
+        )
+    return public, private.decode("utf-8")
+
+
+def generate_rsa_key_and_public_key(bits: int = DEFAULT_RSA_KEY_SIZE, private_key=None):
+    """
+    Generates an RSA public and private key.
+    """
+    return generate_key_and_public_key("rsa", bits, private_key)
@@ -0,0 +1,615 @@
+import base64
+import json
+import logging
+import mmap
+import os
+import re
+import struct
+from contextlib import ExitStack
+from .encoding_functions import (
+    ENGINE_TAG_SEPARATOR,
+    get_share_engine_name,
+    get_standard_prime,
+)
+from .instrumentation import count, is_enabled, stage
+from .integrity import chunk_digest, verify_chunk_digests, CHUNK_DIGEST_SIZE
+
+SHARE_FILE_VERSION = 1
+READ_BLOCK_SIZE = 65536
+SHARE_FORMATS = ("json", "binary")
+DEFAULT_SHARE_FORMAT = "json"
+
+# Binary share files: a fixed header, the length-prefixed share payloads, then an
+# index with the offset of every payload. The header is rewritten on close with
+# the chunk count and the offset of the index, so the file can be streamed.
+BINARY_SHARE_MAGIC = b"CSRS"
+BINARY_SHARE_VERSION = 2
+# magic, version, engine id, x, threshold, prime bits, chunk size, chunk count,
+# index offset, key encoding id. Version 1 headers have no key encoding.
+BINARY_HEADER = struct.Struct("<4sBBHHIIQQB")
+BINARY_HEADERS = {1: struct.Struct("<4sBBHHIIQQ"), 2: BINARY_HEADER}
+BINARY_KEY_ENCODING_IDS = {None: 0, "pem": 0, "der": 1, "der-zlib": 2}
+BINARY_KEY_ENCODING_NAMES = {0: "pem", 1: "der", 2: "der-zlib"}
+BINARY_LENGTH = struct.Struct("<I")
+BINARY_OFFSET = struct.Struct("<Q")
+BINARY_ENGINE_IDS = {"prime": 0, "bytes": 1, "gf256": 2}
+BINARY_ENGINE_NAMES = {v: k for k, v in BINARY_ENGINE_IDS.items()}
+# Optional integrity trailer after the index: magic, salt, secret digest, then
+# the digest of every share. Readers that predate it stop at the index.
+BINARY_INTEGRITY_MAGIC = b"CSRI"
+BINARY_INTEGRITY = struct.Struct("<4s16s32s")
+
+SHARE_FILE_PATTERN = r"{}_private_share_(\d+)\.key"
+# share files of the same split agree on these metadata fields
+CONSISTENT_METADATA_KEYS = (
+    "engine",
+    "threshold",
+    "chunk_size",
+    "prime_bits",
+    "salt",
+    "key_encoding",
+)
+
+
+def build_share_metadata(
+    engine, threshold, chunk_size, prime=None, salt=None, key_encoding=None
+):
+    """
+    Builds the metadata stored in the header of every share file. salt is the
+    salt of the secret digest of the split and key_encoding the encoding of the
+    shared key bytes, "pem" by default.
+    """
+    return {
+        "version": SHARE_FILE_VERSION,
+        "engine": engine,
+        "threshold": threshold,
+        "chunk_size": chunk_size,
+        "prime_bits": prime.bit_length() if prime else None,
+        "salt": salt.hex() if salt else None,
+        "key_encoding": key_encoding or "pem",
+    }
+
+
+def get_metadata_prime(prime_bits):
+    """
+    Returns the prime recorded in the metadata of the share files, given the set
+    of their prime_bits, or None if it is not recorded.
+    """
+    if len(prime_bits) > 1:
+        raise ValueError("Share files were split with different primes.")
+    return get_standard_prime(prime_bits.pop()) if None not in prime_bits else None
+
+
+class ShareFileWriter:
+    """
+    Writes the shares of one client as a JSON object, one share at a time. The
+    metadata is written on the first line and each share on a line of its own.
+    The digest of every share and secret_digest, if set before closing, are
+    written on the last line.
+    """
+
+    def __init__(self, path, metadata):
+        self.path = path
+        self.count = 0
+        self.chunk_digests = []
+        self.secret_digest = None
+        self.file = open(path, "w")
+        self.file.write('{"metadata": ' + json.dumps(metadata) + ', "shares": [\n')
+
+    def write(self, share):
+        self.file.write((",\n" if self.count else "") + json.dumps(share))
+        self.chunk_digests.append(chunk_digest(share).hex())
+        self.count += 1
+
+    def close(self):
+        integrity = {
+            "secret_digest": self.secret_digest,
+            "chunk_digests": self.chunk_digests,
+        }
+        self.file.write('\n], "integrity": ' + json.dumps(integrity) + "}\n")
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+def share_to_payload(share):
+    """
+    Splits a share string into its engine, its x-coordinate and the raw bytes
+    of its y value.
+    """
+    engine = get_share_engine_name(share)
+    x_string, y_string = share.split(ENGINE_TAG_SEPARATOR)[-1].split("-")
+    if engine == "bytes":
+        payload = base64.b64decode(y_string)
+    elif engine == "gf256":
+        payload = bytes.fromhex(y_string)
+    else:
+        y = int(y_string, 16)
+        payload = y.to_bytes((y.bit_length() + 7) // 8, "big")
+    return engine, int(x_string, 16), payload
+
+
+def payload_to_share(engine, x, payload):
+    """
+    Rebuilds the share string of a raw y value.
+    """
+    if engine == "bytes":
+        return f"bytes:{x:x}-" + base64.b64encode(payload).decode("ascii")
+    if engine == "gf256":
+        return f"gf256:{x:x}-{bytes(payload).hex()}"
+    return f"{x:x}-{int.from_bytes(payload, 'big'):x}"
+
+
+class BinaryShareFileWriter:
+    """
+    Writes the shares of one client in the binary share format, one share at a
+    time, followed by the integrity trailer.
+    """
+
+    def __init__(self, path, metadata):
+        self.path = path
+        self.metadata = metadata
+        self.count = 0
+        self.chunk_digests = []
+        self.secret_digest = None
+        self.x = 0
+        self.engine = metadata.get("engine") or "prime"
+        self.offsets = []
+        self.file = open(path, "wb")
+        self.file.write(bytes(BINARY_HEADER.size))
+
+    def write(self, share):
+        engine, x, payload = share_to_payload(share)
+        if engine != self.engine or (self.count and x != self.x):
+            raise ValueError("All the shares of a file must have the same engine and x.")
+        self.x = x
+        self.offsets.append(self.file.tell())
+        self.file.write(BINARY_LENGTH.pack(len(payload)))
+        self.file.write(payload)
+        self.chunk_digests.append(chunk_digest(share))
+        self.count += 1
+
+    def close(self):
+        index_offset = self.file.tell()
+        for offset in self.offsets:
+            self.file.write(BINARY_OFFSET.pack(offset))
+        salt = self.metadata.get("salt")
+        self.file.write(
+            BINARY_INTEGRITY.pack(
+                BINARY_INTEGRITY_MAGIC,
+                bytes.fromhex(salt) if salt else b"",
+                bytes.fromhex(self.secret_digest) if self.secret_digest else b"",
+            )
+        )
+        self.file.write(b"".join(self.chunk_digests))
+        self.file.seek(0)
+        self.file.write(
+            BINARY_HEADER.pack(
+                BINARY_SHARE_MAGIC,
+                BINARY_SHARE_VERSION,
+                BINARY_ENGINE_IDS[self.engine],
+                self.x,
+                self.metadata.get("threshold") or 0,
+                self.metadata.get("prime_bits") or 0,
+                self.metadata.get("chunk_size") or 0,
+                self.count,
+                index_offset,
+                BINARY_KEY_ENCODING_IDS[self.metadata.get("key_encoding")],
+            )
+        )
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+def open_share_writer(path, metadata, share_format=DEFAULT_SHARE_FORMAT):
+    """
+    Opens a writer for a share file in the given format, "json" or "binary".
+    """
+    if share_format == "binary":
+        return BinaryShareFileWriter(path, metadata)
+    if share_format == "json":
+        return ShareFileWriter(path, metadata)
+    raise ValueError(f"Unknown share file format: {share_format}")
+
+
+def _count_bytes(counter, paths):
+    if is_enabled():
+        count(counter, sum(os.path.getsize(path) for path in paths))
+
+
+def write_share_file(
+    path, shares, metadata, share_format=DEFAULT_SHARE_FORMAT, secret_digest=None
+):
+    """
+    Writes the shares of one client. secret_digest is the hex digest of the
+    secret, recorded in the integrity trailer.
+    """
+    with open_share_writer(path, metadata, share_format) as writer:
+        for share in shares:
+            writer.write(share)
+        writer.secret_digest = secret_digest
+
+
+def write_share_files(
+    share_chunks,
+    share_file_paths,
+    metadata,
+    share_format=DEFAULT_SHARE_FORMAT,
+    secret_digest=None,
+):
+    """
+    Writes the i-th share of every chunk to share_file_paths[i].
+    """
+    with stage("file_write"):
+        for client_n, share_file_path in enumerate(share_file_paths):
+            client_chunks = [j[client_n] for j in share_chunks]
+            write_share_file(
+                share_file_path, client_chunks, metadata, share_format, secret_digest
+            )
+    _count_bytes("bytes_written", share_file_paths)
+
+
+def write_share_stream(
+    share_chunks,
+    share_file_paths,
+    metadata,
+    share_format=DEFAULT_SHARE_FORMAT,
+    secret_digest=None,
+):
+    """
+    Appends the shares of each chunk to the share files as the chunks arrive.
+    share_chunks can be a generator, so only one chunk is held in memory. The
+    SecretDigest, fed by the generator, is read once the last chunk is written.
+    Returns the number of chunks written.
+    """
+    chunk_count = 0
+    with ExitStack() as stack:
+        writers = [
+            stack.enter_context(open_share_writer(path, metadata, share_format))
+            for path in share_file_paths
+        ]
+        for shares in share_chunks:
+            for writer, share in zip(writers, shares):
+                writer.write(share)
+            chunk_count += 1
+        if secret_digest:
+            for writer in writers:
+                writer.secret_digest = secret_digest.hexdigest()
+    _count_bytes("bytes_written", share_file_paths)
+    return chunk_count
+
+
+def is_binary_share_file(path):
+    with open(path, "rb") as file:
+        return file.read(len(BINARY_SHARE_MAGIC)) == BINARY_SHARE_MAGIC
+
+
+def read_share_file(path):
+    """
+    Reads a share file and returns its metadata and its shares. Share files
+    written before the metadata header existed are a plain JSON list of shares,
+    for which empty metadata is returned.
+    """
+    _count_bytes("bytes_read", [path])
+    with stage("file_read"):
+        if is_binary_share_file(path):
+            with BinaryShareFileReader(path) as reader:
+                return reader.metadata, list(reader)
+        with open(path, "r") as file:
+            content = json.load(file)
+    if isinstance(content, list):
+        return {}, content
+    if "integrity" in content:
+        return {**content["metadata"], "integrity": content["integrity"]}, content["shares"]
+    return content["metadata"], content["shares"]
+
+
+class ShareFileReader:
+    """
+    Reads a share file incrementally: the metadata is parsed when the file is
+    opened and iterating over the reader yields one share at a time. The
+    integrity trailer is added to the metadata once the last share is read.
+    Plain-list share files are scanned block by block, since they are written
+    on one line.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.file = open(path, "r")
+        first_char = self.file.read(1)
+        if first_char == "{":
+            header = first_char + self.file.readline()
+            self.metadata = json.loads(header.rstrip() + "]}")["metadata"]
+            self.legacy = False
+        else:
+            self.metadata = {}
+            self.legacy = True
+
+    def __iter__(self):
+        return self._iter_legacy_shares() if self.legacy else self._iter_shares()
+
+    def _iter_shares(self):
+        for line in self.file:
+            line = line.strip().rstrip(",")
+            if line.startswith('"'):
+                yield json.loads(line)
+            elif line.startswith("],"):
+                trailer = json.loads("{" + line[2:].lstrip())
+                self.metadata["integrity"] = trailer["integrity"]
+
+    def _iter_legacy_shares(self):
+        # shares are made of letters, digits and "+/=:-", so they contain no escapes
+        buffer = ""
+        while True:
+            block = self.file.read(READ_BLOCK_SIZE)
+            if not block:
+                return
+            buffer += block
+            position = 0
+            while True:
+                start = buffer.find('"', position)
+                end = buffer.find('"', start + 1) if start != -1 else -1
+                if end == -1:
+                    break
+                yield buffer[start + 1 : end]
+                position = end + 1
+            buffer = buffer[start:] if start != -1 else ""
+
+    def close(self):
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+class BinaryShareFileReader:
+    """
+    Reads a binary share file through mmap. The header, the index and the
+    integrity trailer are parsed when the file is opened, so any chunk can be
+    loaded without reading the others.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.file = open(path, "rb")
+        self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version = struct.unpack_from("<4sB", self.map, 0)
+        if magic != BINARY_SHARE_MAGIC or version not in BINARY_HEADERS:
+            raise ValueError(f"{path} is not a supported binary share file.")
+        (
+            magic,
+            version,
+            engine_id,
+            self.x,
+            threshold,
+            prime_bits,
+            chunk_size,
+            self.chunk_count,
+            self.index_offset,
+            *key_encoding_id,
+        ) = BINARY_HEADERS[version].unpack_from(self.map, 0)
+        self.engine = BINARY_ENGINE_NAMES[engine_id]
+        self.metadata = {
+            "version": SHARE_FILE_VERSION,
+            "engine": self.engine,
+            "threshold": threshold or None,
+            "chunk_size": chunk_size or None,
+            "prime_bits": prime_bits or None,
+            "x": self.x,
+            "chunk_count": self.chunk_count,
+            "key_encoding": BINARY_KEY_ENCODING_NAMES[key_encoding_id[0]]
+            if key_encoding_id
+            else None,
+        }
+        trailer_offset = self.index_offset + self.chunk_count * BINARY_OFFSET.size
+        if len(self.map) >= trailer_offset + BINARY_INTEGRITY.size:
+            magic, salt, secret_digest = BINARY_INTEGRITY.unpack_from(
+                self.map, trailer_offset
+            )
+            if magic == BINARY_INTEGRITY_MAGIC:
+                self.metadata["salt"] = salt.hex() if any(salt) else None
+                start = trailer_offset + BINARY_INTEGRITY.size
+                digests = self.map[start : start + self.chunk_count * CHUNK_DIGEST_SIZE]
+                self.metadata["integrity"] = {
+                    "secret_digest": secret_digest.hex() if any(secret_digest) else None,
+                    "chunk_digests": [
+                        digests[i : i + CHUNK_DIGEST_SIZE].hex()
+                        for i in range(0, len(digests), CHUNK_DIGEST_SIZE)
+                    ],
+                }
+
+    def __len__(self):
+        return self.chunk_count
+
+    def payload(self, index):
+        """
+        Returns a memoryview of the raw y value of the given chunk. The view must be
+        released before the reader is closed.
+        """
+        if not 0 <= index < self.chunk_count:
+            raise IndexError("chunk index out of range")
+        (offset,) = BINARY_OFFSET.unpack_from(
+            self.map, self.index_offset + index * BINARY_OFFSET.size
+        )
+        (length,) = BINARY_LENGTH.unpack_from(self.map, offset)
+        start = offset + BINARY_LENGTH.size
+        return memoryview(self.map)[start : start + length]
+
+    def share(self, index):
+        """
+        Returns the share string of the given chunk.
+        """
+        payload = self.payload(index)
+        try:
+            return payload_to_share(self.engine, self.x, payload)
+        finally:
+            payload.release()
+
+    def __iter__(self):
+        for index in range(self.chunk_count):
+            yield self.share(index)
+
+    def close(self):
+        self.map.close()
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+def open_share_file(path):
+    """
+    Opens a reader for a share file in any format. Readers expose the metadata
+    and yield the shares one at a time.
+    """
+    if is_binary_share_file(path):
+        return BinaryShareFileReader(path)
+    return ShareFileReader(path)
+
+
+def convert_share_file(source_path, target_path, share_format):
+    """
+    Converts a share file to the given format, "json" or "binary", one share at a
+    time. Plain-list share files are converted too; the engine is then read from
+    the shares.
+    """
+    with open_share_file(source_path) as reader:
+        metadata = {
+            key: reader.metadata.get(key)
+            for key in (
+                "version",
+                "engine",
+                "threshold",
+                "chunk_size",
+                "prime_bits",
+                "salt",
+                "key_encoding",
+            )
+        }
+        metadata["version"] = SHARE_FILE_VERSION
+        shares = iter(reader)
+        first_share = next(shares, None)
+        if not metadata["engine"] and first_share is not None:
+            metadata["engine"] = get_share_engine_name(first_share)
+        with open_share_writer(target_path, metadata, share_format) as writer:
+            if first_share is not None:
+                writer.write(first_share)
+            for share in shares:
+                writer.write(share)
+            # the trailer of a JSON share file is read with the last share
+            writer.secret_digest = reader.metadata.get("integrity", {}).get(
+                "secret_digest"
+            )
+
+
+def verify_share_file(path):
+    """
+    Checks every share of a share file against the digest recorded when it was
+    written, without combining. Returns the indexes of the chunks that do not
+    match, or None if the file has no digests.
+    """
+    with open_share_file(path) as reader:
+        shares = list(reader)
+        integrity = reader.metadata.get("integrity")
+    if not integrity:
+        return None
+    return verify_chunk_digests(shares, integrity["chunk_digests"])
+
+
+def find_share_files(folder_path, file_name):
+    """
+    Returns the share files of a key as a dict from share index to path, sorted
+    by index. Only names matching exactly <file_name>_private_share_<i>.key are
+    returned, so keys whose name contains file_name are not picked up.
+    """
+    pattern = re.compile(SHARE_FILE_PATTERN.format(re.escape(file_name)))
+    share_files = {}
+    with os.scandir(folder_path or ".") as entries:
+        for entry in entries:
+            match = pattern.fullmatch(entry.name)
+            if match and entry.is_file():
+                share_files[int(match.group(1))] = os.path.join(
+                    folder_path or "", entry.name
+                )
+    return dict(sorted(share_files.items()))
+
+
+def find_share_keys(root):
+    """
+    Walks a directory tree and returns the (folder path, file name) of every key
+    that has share files, sorted by path.
+    """
+    pattern = re.compile(SHARE_FILE_PATTERN.format("(.+)"))
+    keys = set()
+    for folder_path, _, file_names in os.walk(root):
+        for name in file_names:
+            match = pattern.fullmatch(name)
+            if match:
+                keys.add((folder_path, match.group(1)))
+    return sorted(keys)
+
+
+def select_share_files(share_files, indexes=None):
+    """
+    Picks the share files to combine and returns their paths and metadata. Only
+    the headers are read, in index order, and reading stops at the first
+    threshold share files whose metadata agrees, so a share file of another
+    split is skipped and the other share files are not opened. If no threshold
+    agreeing share files are found, the share files whose metadata agrees with
+    most of the others are kept. With indexes, all the consistent share files
+    among those are used. Share files without a recorded threshold are all used.
+    """
+    if indexes:
+        missing = [index for index in indexes if index not in share_files]
+        if missing:
+            raise ValueError(f"Share files not found for indexes {missing}.")
+        candidates = [share_files[index] for index in indexes]
+    else:
+        candidates = list(share_files.values())
+
+    groups = {}
+    selected = None
+    for path in candidates:
+        with open_share_file(path) as reader:
+            metadata = reader.metadata
+        # share files written before encodings were recorded hold PEM
+        fields = tuple(
+            metadata.get(key) or ("pem" if key == "key_encoding" else None)
+            for key in CONSISTENT_METADATA_KEYS
+        )
+        group = groups.setdefault(fields, [])
+        group.append((path, metadata))
+        if not indexes and metadata.get("threshold") == len(group):
+            selected = group
+            break
+    if selected is None:
+        # ties go to the group of the first share file
+        selected = max(groups.values(), key=len) if groups else []
+    for group in groups.values():
+        if group is not selected:
+            for path, _ in group:
+                logging.warning(f"Skipped {path}: its metadata differs from the other shares.")
+
+    threshold = selected[0][1].get("threshold") if selected else None
+    if not indexes and threshold:
+        selected = selected[:threshold]
+    if not selected or (threshold and len(selected) < threshold):
+        raise ValueError(
+            f"Found {len(selected)} consistent share files, {threshold or 2} are needed."
+        )
+    return selected
@@ -0,0 +1,92 @@
+import json
+import os
+import tempfile
+import unittest
+from unittest import mock
+from csr_utils.utils import autotune
+from csr_utils.utils.autotune import (
+    calibrate,
+    get_candidates,
+    load_autotune_cache,
+    resolve_split_parameters,
+)
+from csr_utils.utils.encoding_functions import (
+    combine_secret_shares,
+    split_and_encode_string,
+)
+from tests.test_primes import SECRET
+
+
+class AutotuneTest(unittest.TestCase):
+    def setUp(self):
+        self.folder = tempfile.TemporaryDirectory()
+        self.cache_path = os.path.join(self.folder.name, "csr_utils", "autotune.json")
+        patcher = mock.patch.object(autotune, "AUTOTUNE_CACHE_PATH", self.cache_path)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        self.folder.cleanup()
+
+    def test_calibration_is_cached_and_reused(self):
+        chunk_size, prime = resolve_split_parameters(
+            SECRET, "bytes", "auto", calibrate_host=True
+        )
+        with open(self.cache_path, "r") as file:
+            cache = json.load(file)
+        self.assertEqual(list(cache), ["bytes"])
+        self.assertEqual(cache["bytes"]["prime_bits"], prime.bit_length())
+        self.assertEqual(cache["bytes"]["chunk_size"], chunk_size)
+        self.assertIn((chunk_size, prime), get_candidates("bytes"))
+
+        # a second engine is added next to the first one
+        calibrate("prime")
+        self.assertEqual(sorted(load_autotune_cache()), ["bytes", "prime"])
+
+        # later runs read the cache instead of timing the candidates again
+        with mock.patch.object(autotune, "calibrate") as calibrate_mock:
+            self.assertEqual(
+                resolve_split_parameters(SECRET, "bytes", "auto"), (chunk_size, prime)
+            )
+        calibrate_mock.assert_not_called()
+
+    def test_corrupt_cache_is_ignored(self):
+        os.makedirs(os.path.dirname(self.cache_path))
+        for content in ('{"bytes": {"chunk_', "[1, 2]"):
+            with self.subTest(content=content):
+                with open(self.cache_path, "w") as file:
+                    file.write(content)
+                self.assertEqual(load_autotune_cache(), {})
+                _, prime = resolve_split_parameters(SECRET, "bytes", "auto")
+                self.assertEqual(
+                    prime.bit_length(), autotune.DEFAULT_AUTO_PRIME_BITS["bytes"]
+                )
+                # a calibration replaces the corrupt cache
+                calibrate("bytes")
+                self.assertEqual(list(load_autotune_cache()), ["bytes"])
+
+    def test_auto_round_trips(self):
+        for engine in ("prime", "bytes", "gf256"):
+            for calibrate_host in (False, True):
+                with self.subTest(engine=engine, calibrate_host=calibrate_host):
+                    chunk_size, prime = resolve_split_parameters(
+                        SECRET, engine, "auto", calibrate_host=calibrate_host
+                    )
+                    if engine == "gf256":
+                        self.assertEqual(
+                            (chunk_size, prime), (autotune.GF256_CHUNK_SIZE, None)
+                        )
+                    else:
+                        self.assertIn((chunk_size, prime), get_candidates(engine))
+                    share_chunks = split_and_encode_string(
+                        SECRET, 3, 5, chunk_size, engine, prime
+                    )
+                    # any 3 of the 5 shares of each chunk
+                    share_chunks = [shares[1:4] for shares in share_chunks]
+                    self.assertEqual(
+                        combine_secret_shares(share_chunks, prime=prime), SECRET
+                    )
+
+
+if __name__ == "__main__":
+    unittest.main()
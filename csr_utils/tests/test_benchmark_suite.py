@@ -0,0 +1,88 @@
+import contextlib
+import io
+import json
+import os
+import tempfile
+import unittest
+from benchmarks.split_scaling import get_polynomial_points
+from benchmarks.suite import compare, compare_results
+from csr_utils.utils.encoding_functions import (
+    get_polynomials_points,
+    get_standard_prime,
+    large_enough_polynomial,
+)
+
+
+def result(name, p50, peak_memory):
+    return {"name": name, "p50": p50, "peak_memory": peak_memory}
+
+
+BASELINE = {
+    "results": [
+        result("split/bytes", 0.010, 1000),
+        result("combine/bytes", 0.020, 1000),
+        result("split/gf256", 0.030, 0),
+        result("keygen/rsa", 0.500, 2000),
+    ]
+}
+RESULTS = {
+    "results": [
+        # within the threshold
+        result("split/bytes", 0.0109, 1090),
+        # latency regressed
+        result("combine/bytes", 0.0230, 900),
+        # a baseline without peak memory is compared on latency only
+        result("split/gf256", 0.015, 5000),
+        # not in the baseline
+        result("combine/gf256", 1.0, 10**9),
+    ]
+}
+
+
+class CompareTest(unittest.TestCase):
+    def compare(self, baseline, results, threshold=0.1):
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            regressions = compare_results(baseline, results, threshold)
+        return regressions, output.getvalue()
+
+    def test_regressions(self):
+        regressions, output = self.compare(BASELINE, RESULTS)
+        self.assertEqual(regressions, ["combine/bytes"])
+        self.assertIn("+15.0%", output)
+        self.assertNotIn("combine/gf256", output)
+        self.assertIn("1 regressions over 4 cases.", output)
+
+    def test_memory_regression(self):
+        baseline = {"results": [result("split/bytes", 0.010, 1000)]}
+        results = {"results": [result("split/bytes", 0.005, 1200)]}
+        self.assertEqual(self.compare(baseline, results)[0], ["split/bytes"])
+        self.assertEqual(self.compare(baseline, results, threshold=0.25)[0], [])
+
+    def test_identical_results(self):
+        self.assertEqual(self.compare(BASELINE, BASELINE)[0], [])
+
+    def test_compare_files(self):
+        with tempfile.TemporaryDirectory() as folder:
+            paths = []
+            for name, content in (("baseline", BASELINE), ("results", RESULTS)):
+                paths.append(os.path.join(folder, f"{name}.json"))
+                with open(paths[-1], "w") as file:
+                    json.dump({"environment": {}, **content}, file)
+            with contextlib.redirect_stdout(io.StringIO()):
+                self.assertEqual(compare(*paths, 0.1), 1)
+                self.assertEqual(compare(*paths, 0.2), 0)
+
+
+class SplitScalingTest(unittest.TestCase):
+    def test_reference_evaluation_matches_the_split(self):
+        prime = get_standard_prime(521)
+        coefficients_list = [large_enough_polynomial(k - 1, 42, prime) for k in (1, 3, 8)]
+        self.assertEqual(
+            [get_polynomial_points(c, 10, prime) for c in coefficients_list],
+            get_polynomials_points(coefficients_list, 10, prime),
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
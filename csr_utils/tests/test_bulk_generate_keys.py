@@ -0,0 +1,157 @@
+import os
+import tempfile
+import unittest
+from csr_utils.BulkGenerateKeys import (
+    bulk_generate_keys,
+    generate_entry,
+    main,
+    read_manifest,
+)
+from csr_utils.CombineShares import recover_private_key
+from csr_utils.utils.keys import DEFAULT_KEY_ALGORITHM, DEFAULT_RSA_KEY_SIZE
+from tests.test_batch import interrupt_manifest, read_manifest as read_checkpoint
+
+MANIFEST_CSV = """file_name,folder_path,num_shares,num_shares_for_rebuild,key_algorithm,key_size
+plain,{root}/plain,,,ed25519,
+split,{root}/split,3,2,ecdsa-p256,
+small,{root}/small,,,rsa,1024
+"""
+
+
+def read_records(path):
+    """Returns the last record of every key in a checkpoint manifest, by file name."""
+    return {
+        os.path.basename(record["item"]): record for record in read_checkpoint(path)[1:]
+    }
+
+
+class BulkGenerateKeysTest(unittest.TestCase):
+    def setUp(self):
+        self.folder = tempfile.TemporaryDirectory()
+        self.root = self.folder.name
+        self.checkpoint_path = os.path.join(self.root, "checkpoint.jsonl")
+
+    def tearDown(self):
+        self.folder.cleanup()
+
+    def write_manifest(self, content, name="manifest.csv"):
+        manifest_path = os.path.join(self.root, name)
+        with open(manifest_path, "w") as file:
+            file.write(content)
+        return manifest_path
+
+    def test_read_manifest_defaults(self):
+        manifest_path = self.write_manifest(
+            '{"file_name": "a"}\n\n{"file_name": "b", "num_shares": "3", "key_size": 2048}\n',
+            "manifest.jsonl",
+        )
+        first, second = read_manifest(manifest_path)
+        self.assertEqual(
+            first,
+            {
+                "file_name": "a",
+                "folder_path": "",
+                "num_shares": None,
+                "num_shares_for_rebuild": None,
+                "key_algorithm": DEFAULT_KEY_ALGORITHM,
+                "key_size": DEFAULT_RSA_KEY_SIZE,
+            },
+        )
+        self.assertEqual((second["num_shares"], second["key_size"]), (3, 2048))
+
+    def test_read_manifest_rejects_bad_rows(self):
+        for rows, message in (
+            ("file_name,key_size\na,\n,2048\n", "Manifest entry 2 has no file_name"),
+            ("file_name,num_shares\na,three\n", "Manifest entry 1: invalid literal"),
+            ("file_name,key_algorithm\na,dsa\n", "unknown key_algorithm: dsa"),
+            ("file_name,folder_path\na,x\nb,x\na,x\n", "Manifest entry 3 generates"),
+        ):
+            with self.subTest(rows=rows):
+                with self.assertRaisesRegex(ValueError, message):
+                    read_manifest(self.write_manifest(rows))
+
+    def test_generate_entry(self):
+        manifest_path = self.write_manifest(MANIFEST_CSV.format(root=self.root))
+        plain, split, _ = read_manifest(manifest_path)
+        record = generate_entry(plain)
+        self.assertEqual(
+            record["paths"],
+            [
+                os.path.join(self.root, "plain", "plain_private.key"),
+                os.path.join(self.root, "plain", "plain_public.csr"),
+            ],
+        )
+        record = generate_entry(split)
+        self.assertEqual(
+            record["paths"],
+            [os.path.join(self.root, "split", "split_public.csr")]
+            + [
+                os.path.join(self.root, "split", f"split_private_share_{index}.key")
+                for index in (1, 2, 3)
+            ],
+        )
+        self.assertFalse(
+            os.path.exists(os.path.join(self.root, "split", "split_private.key"))
+        )
+        self.assertIn(
+            b"PRIVATE KEY",
+            bytes(recover_private_key("split", split["folder_path"], indexes=[1, 3])),
+        )
+
+    def test_bulk_generate_with_an_error_row(self):
+        manifest_path = self.write_manifest(MANIFEST_CSV.format(root=self.root))
+        with self.assertLogs(level="INFO") as logs:
+            failures = bulk_generate_keys(manifest_path, self.checkpoint_path, workers=2)
+        self.assertEqual(failures, 1)
+        self.assertTrue(any("small: RSA keys must" in line for line in logs.output))
+
+        records = read_records(self.checkpoint_path)
+        self.assertEqual(sorted(records), ["plain", "small", "split"])
+        self.assertEqual(records["small"]["status"], "failed")
+        self.assertIn("2048 bits", records["small"]["error"])
+        for file_name in ("plain", "split"):
+            self.assertEqual(records[file_name]["status"], "done")
+            result = records[file_name]["result"]
+            self.assertGreater(result["seconds"], 0)
+            for path in result["paths"]:
+                self.assertTrue(os.path.exists(path))
+
+        # a rerun keeps the records, retries the error row only and fails it again
+        with self.assertRaises(SystemExit) as exit_info, self.assertLogs(level="INFO"):
+            main(["--manifest", manifest_path, "--checkpoint", self.checkpoint_path])
+        self.assertEqual(exit_info.exception.code, 1)
+        records = read_checkpoint(self.checkpoint_path)
+        self.assertEqual(len(records), 5)
+        self.assertEqual(os.path.basename(records[-1]["item"]), "small")
+
+    def test_resumes_from_the_checkpoint(self):
+        manifest_path = self.write_manifest(
+            "file_name,folder_path,key_algorithm\n"
+            + "".join(f"key{index},{self.root}/keys,ed25519\n" for index in range(4))
+        )
+        self.assertEqual(bulk_generate_keys(manifest_path, self.checkpoint_path), 0)
+        done = interrupt_manifest(self.checkpoint_path, 2)
+        remaining = sorted(set(read_checkpoint(self.checkpoint_path)[0]["items"]) - set(done))
+        for item in remaining:
+            for suffix in ("_private.key", "_public.csr"):
+                os.remove(item + suffix)
+        done_mtimes = {item: os.stat(item + "_public.csr").st_mtime_ns for item in done}
+
+        with self.assertLogs(level="INFO") as logs:
+            self.assertEqual(bulk_generate_keys(manifest_path, self.checkpoint_path), 0)
+        self.assertTrue(any("Skipped 2 items" in line for line in logs.output))
+        records = read_checkpoint(self.checkpoint_path)[3:]
+        self.assertEqual(sorted(record["item"] for record in records), remaining)
+        for item, mtime in done_mtimes.items():
+            self.assertEqual(os.stat(item + "_public.csr").st_mtime_ns, mtime)
+        for item in remaining:
+            self.assertTrue(os.path.exists(item + "_private.key"))
+
+        # another manifest does not resume this checkpoint
+        other_path = self.write_manifest("file_name\nother\n", "other.csv")
+        with self.assertRaises(ValueError):
+            bulk_generate_keys(other_path, self.checkpoint_path)
+
+
+if __name__ == "__main__":
+    unittest.main()
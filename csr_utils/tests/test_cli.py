@@ -0,0 +1,83 @@
+import os
+import subprocess
+import sys
+import unittest
+import csr_utils
+from csr_utils.cli import COMMANDS
+
+# the folder holding the csr_utils package, to run it without installing it
+PACKAGE_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def run_python(*args):
+    return subprocess.run(
+        [sys.executable, *args],
+        cwd=PACKAGE_ROOT,
+        capture_output=True,
+        text=True,
+        timeout=60,
+    )
+
+
+def imported_modules(code):
+    """Returns the top-level modules imported by running code in a new interpreter."""
+    result = run_python(
+        "-c", f"import sys\n{code}\nprint(' '.join(sorted(sys.modules)))"
+    )
+    if result.returncode:
+        raise AssertionError(result.stderr)
+    return {name.split(".")[0] for name in result.stdout.split()}
+
+
+class CLITest(unittest.TestCase):
+    def test_every_subcommand_help(self):
+        for command in COMMANDS:
+            with self.subTest(command=command):
+                result = run_python("-m", "csr_utils.cli", command, "--help")
+                self.assertEqual(result.returncode, 0, result.stderr)
+                self.assertTrue(
+                    result.stdout.startswith(f"usage: csr-utils {command} "),
+                    result.stdout,
+                )
+
+    def test_help_lists_every_subcommand(self):
+        result = run_python("-m", "csr_utils.cli", "--help")
+        self.assertEqual(result.returncode, 0, result.stderr)
+        for command in COMMANDS:
+            self.assertIn(f"\n  {command} ", result.stdout)
+
+    def test_unknown_subcommand(self):
+        result = run_python("-m", "csr_utils.cli", "sign")
+        self.assertEqual(result.returncode, 2)
+        self.assertIn("invalid choice: 'sign'", result.stderr)
+
+
+class LazyImportTest(unittest.TestCase):
+    def test_import_is_lazy(self):
+        modules = imported_modules("import csr_utils")
+        self.assertNotIn("cryptography", modules)
+        self.assertNotIn("numpy", modules)
+
+    def test_share_commands_do_not_import_cryptography(self):
+        for command in ("split", "combine", "convert"):
+            with self.subTest(command=command):
+                modules = imported_modules(
+                    "from csr_utils.cli import main\n"
+                    "try:\n"
+                    f"    main([{command!r}, '--help'])\n"
+                    "except SystemExit:\n"
+                    "    pass"
+                )
+                self.assertNotIn("cryptography", modules)
+
+    def test_api_names_resolve(self):
+        for name in csr_utils.__all__:
+            with self.subTest(name=name):
+                self.assertEqual(getattr(csr_utils, name).__name__, name)
+        self.assertIn("combine_shares", dir(csr_utils))
+        with self.assertRaises(AttributeError):
+            csr_utils.sign_csr
+
+
+if __name__ == "__main__":
+    unittest.main()
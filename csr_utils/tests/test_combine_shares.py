@@ -0,0 +1,181 @@
+import os
+import shutil
+import tempfile
+import unittest
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+from csr_utils.CombineShares import combine_shares, recover_private_key, verify_shares
+from csr_utils.SplitKey import split_string_into_shares
+from csr_utils.utils.share_files import read_share_file, write_share_file
+from tests.test_share_files import corrupt_chunk
+
+ENGINES = ("prime", "bytes", "gf256")
+SHARE_FORMATS = ("json", "binary")
+
+
+class CombineSharesTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+        cls.private_key = key.private_bytes(
+            serialization.Encoding.PEM,
+            serialization.PrivateFormat.PKCS8,
+            serialization.NoEncryption(),
+        )
+        cls.private_key_der = key.private_bytes(
+            serialization.Encoding.DER,
+            serialization.PrivateFormat.PKCS8,
+            serialization.NoEncryption(),
+        )
+
+    def setUp(self):
+        self.folder = tempfile.TemporaryDirectory()
+        self.folder_path = self.folder.name
+        with open(os.path.join(self.folder_path, "key_private.key"), "wb") as file:
+            file.write(self.private_key)
+
+    def tearDown(self):
+        self.folder.cleanup()
+
+    def split(
+        self, engine, share_format, k=2, n=3, key_encoding="pem", folder_path=None
+    ):
+        folder_path = folder_path or self.folder_path
+        if folder_path != self.folder_path:
+            shutil.copy(os.path.join(self.folder_path, "key_private.key"), folder_path)
+        return split_string_into_shares(
+            folder_path,
+            "key_private.key",
+            n,
+            k,
+            engine=engine,
+            chunk_size=256,
+            share_format=share_format,
+            key_encoding=key_encoding,
+        )
+
+    def for_each_engine_and_format(self, check):
+        for engine in ENGINES:
+            for share_format in SHARE_FORMATS:
+                with self.subTest(engine=engine, share_format=share_format):
+                    check(engine, share_format)
+
+    def test_round_trip(self):
+        def check(engine, share_format):
+            self.split(engine, share_format)
+            combined_key = recover_private_key("key", self.folder_path)
+            self.assertEqual(bytes(combined_key), self.private_key)
+            for stream in (False, True):
+                combined_key_path = combine_shares("key", self.folder_path, stream=stream)
+                with open(combined_key_path, "rb") as file:
+                    self.assertEqual(file.read(), self.private_key)
+
+        self.for_each_engine_and_format(check)
+
+    def test_der_key_encodings(self):
+        for engine in ("bytes", "gf256"):
+            for key_encoding in ("der", "der-zlib"):
+                with self.subTest(engine=engine, key_encoding=key_encoding):
+                    self.split(engine, "binary", key_encoding=key_encoding)
+                    self.assertEqual(
+                        bytes(recover_private_key("key", self.folder_path)), self.private_key
+                    )
+                    combined_key = recover_private_key(
+                        "key", self.folder_path, output_format="der"
+                    )
+                    self.assertEqual(bytes(combined_key), self.private_key_der)
+                    for stream in (False, True):
+                        combined_key_path = combine_shares(
+                            "key", self.folder_path, stream=stream, output_format="der"
+                        )
+                        with open(combined_key_path, "rb") as file:
+                            self.assertEqual(file.read(), self.private_key_der)
+
+    def test_corrupted_chunk(self):
+        # the chunk failing its digest is left out and the third share file used
+        def check(engine, share_format):
+            share_paths = self.split(engine, share_format)
+            corrupt_chunk(share_paths[0], 1)
+            self.assertFalse(verify_shares("key", self.folder_path))
+            with self.assertLogs(level="WARNING"):
+                combined_key = recover_private_key("key", self.folder_path)
+            self.assertEqual(bytes(combined_key), self.private_key)
+
+        self.for_each_engine_and_format(check)
+
+    def test_inconsistent_share_file(self):
+        # the shares of another split, with digests of their own, pass the chunk
+        # digests: the combined key fails the secret digest and all the share
+        # files are combined again to isolate the bad one
+        def check(engine, share_format):
+            share_paths = self.split(engine, share_format, k=2, n=4)
+            metadata, _ = read_share_file(share_paths[1])
+            with tempfile.TemporaryDirectory() as other_folder_path:
+                other_paths = self.split(
+                    engine, share_format, k=2, n=4, folder_path=other_folder_path
+                )
+                _, other_shares = read_share_file(other_paths[1])
+            write_share_file(
+                share_paths[1],
+                other_shares,
+                metadata,
+                share_format,
+                metadata["integrity"]["secret_digest"],
+            )
+            self.assertTrue(verify_shares("key", self.folder_path))
+            with self.assertLogs(level="WARNING") as logs:
+                combined_key = recover_private_key("key", self.folder_path)
+            self.assertEqual(bytes(combined_key), self.private_key)
+            self.assertTrue(
+                any(
+                    share_paths[1] in line and "inconsistent" in line
+                    for line in logs.output
+                )
+            )
+
+        self.for_each_engine_and_format(check)
+
+    def test_too_many_bad_share_files(self):
+        def check(engine, share_format):
+            share_paths = self.split(engine, share_format)
+            corrupt_chunk(share_paths[0], 0)
+            corrupt_chunk(share_paths[1], 0)
+            with self.assertRaises(ValueError):
+                recover_private_key("key", self.folder_path)
+
+        self.for_each_engine_and_format(check)
+
+    def test_stream_leaves_no_partial_key(self):
+        def check(engine, share_format):
+            # no other share file is left to recover the corrupted chunk from
+            share_paths = self.split(engine, share_format, k=2, n=2)
+            corrupt_chunk(share_paths[0], 1)
+            with self.assertRaises(ValueError):
+                combine_shares("key", self.folder_path, stream=True)
+            self.assertEqual(
+                sorted(os.listdir(self.folder_path)),
+                sorted(["key_private.key"] + [os.path.basename(p) for p in share_paths]),
+            )
+
+        self.for_each_engine_and_format(check)
+
+    def test_stream_falls_back_on_corruption(self):
+        def check(engine, share_format):
+            share_paths = self.split(engine, share_format)
+            corrupt_chunk(share_paths[0], 1)
+            with self.assertLogs(level="WARNING") as logs:
+                combined_key_path = combine_shares("key", self.folder_path, stream=True)
+            with open(combined_key_path, "rb") as file:
+                self.assertEqual(file.read(), self.private_key)
+            self.assertTrue(any("in memory" in line for line in logs.output))
+
+        self.for_each_engine_and_format(check)
+
+    def test_stream_output_mode(self):
+        self.split("bytes", "binary")
+        combined_key_path = combine_shares("key", self.folder_path, stream=True)
+        self.assertEqual(os.stat(combined_key_path).st_mode & 0o777, 0o600)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,58 @@
+import os
+import tempfile
+import unittest
+from cryptography.hazmat.primitives import serialization
+from csr_utils.GenerateKeys import generate_keys
+from csr_utils.GenerateSplitKeys import generate_and_split_keys
+from csr_utils.utils.key_pool import KeyPool
+from csr_utils.utils.keys import get_key_algorithm
+
+
+class GenerateKeysTest(unittest.TestCase):
+    def setUp(self):
+        self.folder = tempfile.TemporaryDirectory()
+        self.folder_path = self.folder.name
+        self.key_pool = KeyPool(os.path.join(self.folder_path, "pool"), bits=2048, size=1)
+
+    def tearDown(self):
+        self.key_pool.close()
+        self.folder.cleanup()
+
+    def test_key_algorithms(self):
+        for key_algorithm in ("ecdsa-p256", "ed25519"):
+            with self.subTest(key_algorithm=key_algorithm):
+                private_key_path, _ = generate_keys(
+                    "key", self.folder_path, key_algorithm=key_algorithm
+                )
+                with open(private_key_path, "rb") as file:
+                    private_key = serialization.load_pem_private_key(file.read(), None)
+                self.assertEqual(get_key_algorithm(private_key), key_algorithm)
+
+    def test_key_pool_only_holds_rsa_keys(self):
+        self.key_pool.refill()
+        with self.assertRaises(ValueError):
+            generate_keys("key", self.folder_path, self.key_pool, "ed25519")
+        with self.assertRaises(ValueError):
+            generate_and_split_keys(
+                "key",
+                self.folder_path,
+                3,
+                2,
+                key_pool=self.key_pool,
+                key_algorithm="ecdsa-p256",
+            )
+        # no pooled key is taken and nothing is written
+        self.assertEqual(self.key_pool.available(), 1)
+        self.assertEqual(os.listdir(self.folder_path), ["pool"])
+
+    def test_key_pool(self):
+        self.key_pool.refill()
+        private_key_path, _ = generate_keys("key", self.folder_path, self.key_pool)
+        self.assertEqual(self.key_pool.available(), 0)
+        with open(private_key_path, "rb") as file:
+            private_key = serialization.load_pem_private_key(file.read(), None)
+        self.assertEqual(private_key.key_size, 2048)
+
+
+if __name__ == "__main__":
+    unittest.main()
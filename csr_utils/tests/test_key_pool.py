@@ -0,0 +1,209 @@
+import multiprocessing
+import os
+import tempfile
+import threading
+import unittest
+from unittest import mock
+from csr_utils.utils.key_pool import (
+    KeyPool,
+    CLAIMED_SUFFIX,
+    POOL_KEY_SUFFIX,
+    RESERVED_SUFFIX,
+    UNREADABLE_SUFFIX,
+)
+
+PROCESSES = 8
+HITS_PER_PROCESS = 5
+# small keys keep the pool tests quick
+BITS = 1024
+
+
+def record_hits(path):
+    key_pool = KeyPool(path, bits=2048, size=1, low_watermark=0)
+    key_pool._record(hits=HITS_PER_PROCESS, misses=1)
+    key_pool.close()
+
+
+def take_keys(path, count, moduli):
+    with KeyPool(path, bits=BITS, size=1, low_watermark=0) as key_pool:
+        for _ in range(count):
+            moduli.put(key_pool.take().private_numbers().public_numbers.n)
+
+
+def refill_pool(path):
+    with KeyPool(path, bits=BITS, size=4, workers=2) as key_pool:
+        key_pool.refill()
+
+
+def pool_files(key_pool, suffix=POOL_KEY_SUFFIX):
+    return sorted(name for name in os.listdir(key_pool.path) if name.endswith(suffix))
+
+
+def dead_pid():
+    process = multiprocessing.Process(target=int)
+    process.start()
+    process.join()
+    return process.pid
+
+
+class KeyPoolTest(unittest.TestCase):
+    def setUp(self):
+        self.folder = tempfile.TemporaryDirectory()
+        self.key_pool = KeyPool(self.folder.name, bits=BITS, size=4, workers=2)
+
+    def tearDown(self):
+        self.key_pool.close()
+        self.folder.cleanup()
+
+    def test_refill_reaches_size(self):
+        self.assertEqual(self.key_pool.refill(), 4)
+        self.assertEqual(self.key_pool.available(), 4)
+        self.assertEqual(self.key_pool.refill(), 0)
+        self.key_pool.take()
+        self.assertEqual(self.key_pool.refill(), 1)
+        self.assertEqual(self.key_pool.available(), 4)
+        self.assertEqual(pool_files(self.key_pool, RESERVED_SUFFIX), [])
+
+    def test_empty_pool_generates_a_key(self):
+        private_key = self.key_pool.take()
+        self.assertEqual(private_key.key_size, BITS)
+        metrics = self.key_pool.get_metrics()
+        self.assertEqual((metrics["hits"], metrics["misses"]), (0, 1))
+        self.assertEqual(metrics["available"], 0)
+
+    def test_hit_removes_one_file(self):
+        self.key_pool.refill()
+        files = pool_files(self.key_pool)
+        self.key_pool.take()
+        remaining = pool_files(self.key_pool)
+        self.assertEqual(len(remaining), len(files) - 1)
+        self.assertTrue(set(remaining) < set(files))
+        self.assertEqual(self.key_pool.get_metrics()["hits"], 1)
+
+    def test_unreadable_key_is_moved_aside(self):
+        self.key_pool.refill()
+        name = pool_files(self.key_pool)[0]
+        path = os.path.join(self.key_pool.path, name)
+        with open(path, "r+b") as file:
+            file.truncate(100)
+        with self.assertLogs(level="WARNING"):
+            private_key = self.key_pool.take()
+        self.assertEqual(private_key.key_size, BITS)
+        self.assertTrue(os.path.exists(path + UNREADABLE_SUFFIX))
+        self.assertEqual(self.key_pool.available(), 2)
+        self.assertEqual(self.key_pool.get_metrics()["hits"], 1)
+
+    def test_wrong_passphrase_keeps_the_keys(self):
+        encrypted_pool = KeyPool(
+            self.folder.name, bits=BITS, size=1, workers=1, passphrase="secret"
+        )
+        encrypted_pool.refill()
+        encrypted_pool.close()
+        other_pool = KeyPool(self.folder.name, bits=BITS, size=1, passphrase="other")
+        with self.assertLogs(level="WARNING"):
+            other_pool.take()
+        other_pool.close()
+        # the key is not deleted and no hit is recorded
+        self.assertEqual(other_pool.get_metrics()["hits"], 0)
+        self.assertEqual(len(pool_files(other_pool, UNREADABLE_SUFFIX)), 1)
+
+    def test_processes_take_different_keys(self):
+        self.key_pool.size = 8
+        self.key_pool.refill()
+        moduli = multiprocessing.Queue()
+        processes = [
+            multiprocessing.Process(target=take_keys, args=(self.folder.name, 4, moduli))
+            for _ in range(2)
+        ]
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join()
+        taken = [moduli.get() for _ in range(8)]
+        self.assertEqual(len(set(taken)), 8)
+        self.assertEqual(self.key_pool.available(), 0)
+        metrics = self.key_pool.load_metrics()
+        self.assertEqual((metrics["hits"], metrics["misses"]), (8, 0))
+
+    def test_concurrent_refills_do_not_overshoot(self):
+        processes = [
+            multiprocessing.Process(target=refill_pool, args=(self.folder.name,))
+            for _ in range(3)
+        ]
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join()
+        self.assertEqual(self.key_pool.available(), 4)
+        self.assertEqual(pool_files(self.key_pool, RESERVED_SUFFIX), [])
+        self.assertEqual(self.key_pool.load_metrics()["keys_generated"], 4)
+
+    def test_refill_does_not_hold_the_lock(self):
+        self.key_pool.refill()
+        self.key_pool.take()
+        # the lock is free once refill returns, also for another thread
+        thread = threading.Thread(target=self.key_pool.refill)
+        thread.start()
+        thread.join(60)
+        self.assertFalse(thread.is_alive())
+        self.key_pool.save_metrics()
+        metrics = self.key_pool.load_metrics()
+        self.assertEqual((metrics["hits"], metrics["keys_generated"]), (1, 5))
+
+    def test_claims_of_dead_processes_are_removed(self):
+        pid = dead_pid()
+        names = {
+            "dead_claim": f"a{POOL_KEY_SUFFIX}.{pid}{CLAIMED_SUFFIX}",
+            "dead_reservation": f"b.{pid}{RESERVED_SUFFIX}",
+            "live_claim": f"c{POOL_KEY_SUFFIX}.{os.getpid()}{CLAIMED_SUFFIX}",
+            "live_reservation": f"d.{os.getpid()}{RESERVED_SUFFIX}",
+        }
+        for name in names.values():
+            open(os.path.join(self.key_pool.path, name), "w").close()
+        with self.assertLogs(level="WARNING"):
+            # the live reservation stands for a key on its way
+            self.assertEqual(self.key_pool.refill(), 3)
+        self.assertEqual(
+            pool_files(self.key_pool, CLAIMED_SUFFIX), [names["live_claim"]]
+        )
+        self.assertEqual(
+            pool_files(self.key_pool, RESERVED_SUFFIX), [names["live_reservation"]]
+        )
+
+    def test_take_skips_a_claim_removed_while_reading(self):
+        self.key_pool.refill()
+        real_open = open
+        opened = []
+
+        def open_after_removal(file, *args, **kwargs):
+            if str(file).endswith(CLAIMED_SUFFIX) and not opened:
+                opened.append(file)
+                os.remove(file)
+            return real_open(file, *args, **kwargs)
+
+        with mock.patch("builtins.open", open_after_removal):
+            private_key = self.key_pool.take()
+        self.assertEqual(private_key.key_size, BITS)
+        self.assertTrue(opened[0].endswith(f".{os.getpid()}{CLAIMED_SUFFIX}"))
+        self.assertEqual(self.key_pool.available(), 2)
+        self.assertEqual(self.key_pool.get_metrics()["hits"], 1)
+
+
+class KeyPoolMetricsTest(unittest.TestCase):
+    def test_concurrent_save_metrics(self):
+        with tempfile.TemporaryDirectory() as path:
+            processes = [
+                multiprocessing.Process(target=record_hits, args=(path,))
+                for _ in range(PROCESSES)
+            ]
+            for process in processes:
+                process.start()
+            for process in processes:
+                process.join()
+            metrics = KeyPool(path, bits=2048, size=1, low_watermark=0).load_metrics()
+        self.assertEqual(metrics["hits"], PROCESSES * HITS_PER_PROCESS)
+        self.assertEqual(metrics["misses"], PROCESSES)
+
+
+if __name__ == "__main__":
+    unittest.main()
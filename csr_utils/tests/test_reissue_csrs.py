@@ -0,0 +1,203 @@
+import csv
+import json
+import os
+import tempfile
+import unittest
+from cryptography import x509
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import ed25519
+from cryptography.x509.oid import NameOID
+from csr_utils.ReissueCSRs import read_reissue_manifest, reissue_csrs
+from csr_utils.SplitKey import split_string_into_shares
+from tests.test_batch import interrupt_manifest, read_manifest
+
+SUBJECT = "C=IT,O=Colossus,CN={file_name}.colossus.digital"
+SAN = "DNS:{file_name}.colossus.digital,DNS:{region}.colossus.digital"
+
+
+def private_key_bytes(private_key):
+    return private_key.private_bytes(
+        serialization.Encoding.PEM,
+        serialization.PrivateFormat.PKCS8,
+        serialization.NoEncryption(),
+    )
+
+
+def public_key_bytes(public_key):
+    return public_key.public_bytes(
+        serialization.Encoding.Raw, serialization.PublicFormat.Raw
+    )
+
+
+class ReissueCSRsTest(unittest.TestCase):
+    def setUp(self):
+        self.folder = tempfile.TemporaryDirectory()
+        self.root = self.folder.name
+        self.checkpoint_path = os.path.join(self.root, "checkpoint.jsonl")
+        self.keys = {}
+
+    def tearDown(self):
+        self.folder.cleanup()
+
+    def write_key(self, file_name, split=False):
+        """Writes an Ed25519 key file, or only its 2 of 3 shares if split."""
+        folder_path = os.path.join(self.root, file_name)
+        os.makedirs(folder_path)
+        private_key = ed25519.Ed25519PrivateKey.generate()
+        self.keys[file_name] = private_key
+        key_name = f"{file_name}_private.key"
+        with open(os.path.join(folder_path, key_name), "wb") as file:
+            file.write(private_key_bytes(private_key))
+        if split:
+            split_string_into_shares(folder_path, key_name, 3, 2, engine="bytes")
+            os.remove(os.path.join(folder_path, key_name))
+        return {"file_name": file_name, "folder_path": folder_path, "region": "eu"}
+
+    def write_manifest(self, entries, name="manifest.csv"):
+        manifest_path = os.path.join(self.root, name)
+        with open(manifest_path, "w", newline="") as file:
+            if name.endswith(".jsonl"):
+                for entry in entries:
+                    file.write(json.dumps(entry) + "\n")
+            else:
+                fieldnames = list(dict.fromkeys(field for entry in entries for field in entry))
+                writer = csv.DictWriter(file, fieldnames=fieldnames)
+                writer.writeheader()
+                writer.writerows(entries)
+        return manifest_path
+
+    def reissue(self, manifest_path, **kwargs):
+        return reissue_csrs(
+            manifest_path, self.checkpoint_path, SUBJECT, SAN, workers=2, **kwargs
+        )
+
+    def read_csr(self, entry):
+        csr_path = os.path.join(
+            entry["folder_path"], f"{entry['file_name']}_public.csr"
+        )
+        with open(csr_path, "rb") as file:
+            return x509.load_pem_x509_csr(file.read())
+
+    def assert_csr_of_key(self, entry):
+        csr = self.read_csr(entry)
+        self.assertTrue(csr.is_signature_valid)
+        self.assertEqual(
+            public_key_bytes(csr.public_key()),
+            public_key_bytes(self.keys[entry["file_name"]].public_key()),
+        )
+
+    def test_templates_are_rendered_per_entry(self):
+        entry = self.write_key("alpha")
+        entry["san"] = "DNS:{file_name}.{region}.colossus.digital,IP:10.0.0.1"
+        self.assertEqual(self.reissue(self.write_manifest([entry])), 0)
+
+        csr = self.read_csr(entry)
+        self.assertEqual(
+            [(attribute.oid, attribute.value) for attribute in csr.subject],
+            [
+                (NameOID.COUNTRY_NAME, "IT"),
+                (NameOID.ORGANIZATION_NAME, "Colossus"),
+                (NameOID.COMMON_NAME, "alpha.colossus.digital"),
+            ],
+        )
+        san = csr.extensions.get_extension_for_class(x509.SubjectAlternativeName).value
+        self.assertEqual(
+            san.get_values_for_type(x509.DNSName), ["alpha.eu.colossus.digital"]
+        )
+        self.assertEqual(
+            [str(ip) for ip in san.get_values_for_type(x509.IPAddress)], ["10.0.0.1"]
+        )
+
+    def test_keys_are_recombined_from_shares(self):
+        entries = [self.write_key("plain"), self.write_key("split", split=True)]
+        manifest_path = self.write_manifest(entries, "manifest.jsonl")
+        self.assertIsNone(read_reissue_manifest(manifest_path)[1]["key_path"])
+
+        self.assertEqual(self.reissue(manifest_path), 0)
+        for entry in entries:
+            self.assert_csr_of_key(entry)
+        sources = {
+            record["item"]: record["result"]["key_source"]
+            for record in read_manifest(self.checkpoint_path)[1:]
+        }
+        self.assertEqual(
+            sorted(sources.values()),
+            sorted(
+                [os.path.join(entries[0]["folder_path"], "plain_private.key"), "shares"]
+            ),
+        )
+        # the recombined key is never written to disk
+        self.assertEqual(
+            sorted(os.listdir(entries[1]["folder_path"])),
+            [
+                "split_private_share_1.key",
+                "split_private_share_2.key",
+                "split_private_share_3.key",
+                "split_public.csr",
+            ],
+        )
+
+    def test_resumes_from_the_checkpoint(self):
+        entries = [self.write_key(f"key{index}") for index in range(4)]
+        manifest_path = self.write_manifest(entries)
+        self.assertEqual(self.reissue(manifest_path), 0)
+        done = interrupt_manifest(self.checkpoint_path, 2)
+        csr_paths = [
+            os.path.join(entry["folder_path"], f"{entry['file_name']}_public.csr")
+            for entry in entries
+        ]
+        remaining = sorted(set(csr_paths) - set(done))
+        for csr_path in remaining:
+            os.remove(csr_path)
+        done_mtimes = {csr_path: os.stat(csr_path).st_mtime_ns for csr_path in done}
+
+        with self.assertLogs(level="INFO") as logs:
+            self.assertEqual(self.reissue(manifest_path), 0)
+        self.assertTrue(any("Skipped 2 items" in line for line in logs.output))
+        records = read_manifest(self.checkpoint_path)[3:]
+        self.assertEqual(sorted(record["item"] for record in records), remaining)
+        for csr_path, mtime in done_mtimes.items():
+            self.assertEqual(os.stat(csr_path).st_mtime_ns, mtime)
+        for entry in entries:
+            self.assert_csr_of_key(entry)
+
+        # existing CSRs are kept on a new run unless overwrite is set
+        os.remove(self.checkpoint_path)
+        self.assertEqual(self.reissue(manifest_path), 0)
+        self.assertEqual(read_manifest(self.checkpoint_path)[0]["items"], [])
+
+    def test_bad_rows_stop_the_run_before_signing(self):
+        entry = self.write_key("alpha")
+        for bad_entry in (
+            {**entry, "file_name": ""},
+            {**entry, "subject": "XX=Colossus"},
+            {**entry, "san": "FTP:alpha.colossus.digital"},
+        ):
+            with self.subTest(bad_entry=bad_entry):
+                manifest_path = self.write_manifest([entry, bad_entry])
+                with self.assertRaisesRegex(ValueError, "Manifest entry 2"):
+                    self.reissue(manifest_path)
+                self.assertFalse(
+                    os.path.exists(os.path.join(entry["folder_path"], "alpha_public.csr"))
+                )
+        manifest_path = self.write_manifest([entry, dict(entry)])
+        with self.assertRaisesRegex(ValueError, "alpha_public.csr as well"):
+            self.reissue(manifest_path)
+
+    def test_a_missing_key_fails_only_its_row(self):
+        entries = [self.write_key("alpha"), self.write_key("beta")]
+        os.remove(os.path.join(entries[1]["folder_path"], "beta_private.key"))
+        entries[1]["key_path"] = ""
+        with self.assertLogs(level="ERROR"):
+            self.assertEqual(self.reissue(self.write_manifest(entries)), 1)
+        self.assert_csr_of_key(entries[0])
+        records = {
+            record["item"]: record for record in read_manifest(self.checkpoint_path)[1:]
+        }
+        beta_csr_path = os.path.join(entries[1]["folder_path"], "beta_public.csr")
+        self.assertEqual(records[beta_csr_path]["status"], "failed")
+        self.assertFalse(os.path.exists(beta_csr_path))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,151 @@
+import builtins
+import itertools
+import os
+import tempfile
+import unittest
+from unittest import mock
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+from csr_utils.CombineShares import recover_private_key
+from csr_utils.ReshareKey import _ChunkReader, reshare_shares, reshare_tree
+from csr_utils.SplitKey import split_string_into_shares
+from csr_utils.utils.share_files import read_share_file
+from tests.test_share_files import corrupt_chunk
+
+
+def write_split(folder_path, private_key, engine="bytes", share_format="binary"):
+    """Splits a key 2 of 3 and removes the key file, as a split key is kept."""
+    os.makedirs(folder_path, exist_ok=True)
+    key_path = os.path.join(folder_path, "key_private.key")
+    with open(key_path, "wb") as file:
+        file.write(private_key)
+    share_paths = split_string_into_shares(
+        folder_path,
+        "key_private.key",
+        3,
+        2,
+        engine=engine,
+        chunk_size=256,
+        share_format=share_format,
+    )
+    os.remove(key_path)
+    return share_paths
+
+
+class ReshareKeyTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+        cls.private_key = key.private_bytes(
+            serialization.Encoding.PEM,
+            serialization.PrivateFormat.PKCS8,
+            serialization.NoEncryption(),
+        )
+
+    def setUp(self):
+        self.folder = tempfile.TemporaryDirectory()
+        self.folder_path = os.path.join(self.folder.name, "old")
+        self.output_path = os.path.join(self.folder.name, "new")
+
+    def tearDown(self):
+        self.folder.cleanup()
+
+    def test_reshare_to_a_higher_threshold(self):
+        for engine in ("prime", "bytes", "gf256"):
+            for share_format in ("json", "binary"):
+                with self.subTest(engine=engine, share_format=share_format):
+                    share_paths = write_split(
+                        self.folder_path, self.private_key, engine, share_format
+                    )
+                    new_paths = reshare_shares(
+                        "key", self.folder_path, self.output_path, 5, 3
+                    )
+                    self.assertEqual(len(new_paths), 5)
+                    for indexes in itertools.combinations(range(1, 6), 3):
+                        combined_key = recover_private_key(
+                            "key", self.output_path, indexes=list(indexes)
+                        )
+                        self.assertEqual(bytes(combined_key), self.private_key)
+
+                    old_metadata, _ = read_share_file(share_paths[0])
+                    new_metadata, _ = read_share_file(new_paths[0])
+                    self.assertEqual(new_metadata["threshold"], 3)
+                    self.assertEqual(new_metadata["engine"], engine)
+                    self.assertNotEqual(new_metadata["salt"], old_metadata["salt"])
+                    self.assertNotEqual(
+                        new_metadata["integrity"]["secret_digest"],
+                        old_metadata["integrity"]["secret_digest"],
+                    )
+
+    def test_two_new_shares_do_not_recover(self):
+        write_split(self.folder_path, self.private_key)
+        reshare_shares("key", self.folder_path, self.output_path, 5, 3)
+        with self.assertRaises(ValueError):
+            recover_private_key("key", self.output_path, indexes=[1, 2])
+
+    def test_no_plaintext_written(self):
+        write_split(self.folder_path, self.private_key)
+        written = []
+        real_open = builtins.open
+
+        def recording_open(file, mode="r", *args, **kwargs):
+            if any(flag in mode for flag in "wax+"):
+                written.append(os.path.realpath(file))
+            return real_open(file, mode, *args, **kwargs)
+
+        with mock.patch("builtins.open", recording_open):
+            new_paths = reshare_shares("key", self.folder_path, self.output_path, 5, 3)
+        self.assertEqual(sorted(written), sorted(map(os.path.realpath, new_paths)))
+        for folder_path in (self.folder_path, self.output_path):
+            for name in os.listdir(folder_path):
+                with open(os.path.join(folder_path, name), "rb") as file:
+                    self.assertNotIn(b"PRIVATE KEY", file.read())
+
+    def test_corrupt_source_share(self):
+        for engine, share_format in (("prime", "json"), ("gf256", "binary")):
+            with self.subTest(engine=engine, share_format=share_format):
+                share_paths = write_split(
+                    self.folder_path, self.private_key, engine, share_format
+                )
+                corrupt_chunk(share_paths[0], 1)
+                with self.assertRaises(ValueError):
+                    reshare_shares("key", self.folder_path, self.output_path, 5, 3)
+                self.assertEqual(os.listdir(self.output_path), [])
+
+    def test_same_folder(self):
+        write_split(self.folder_path, self.private_key)
+        with self.assertRaises(ValueError):
+            reshare_shares("key", self.folder_path, self.folder_path, 5, 3)
+
+    def test_chunk_reader_rechunks_and_zeroizes(self):
+        chunks = [bytearray(b"abcde"), bytearray(b"fg"), bytearray(b"hijkl")]
+        buffer = bytearray(4)
+        read = []
+        with _ChunkReader(iter(chunks)) as reader:
+            while size := reader.readinto(buffer):
+                read.append(bytes(buffer[:size]))
+            self.assertEqual(reader.readinto(buffer), 0)
+        self.assertEqual(read, [b"abcd", b"efgh", b"ijkl"])
+        for chunk in chunks:
+            self.assertEqual(chunk, bytes(len(chunk)))
+
+    def test_reshare_tree(self):
+        root = os.path.join(self.folder.name, "keys")
+        for name in ("a", os.path.join("b", "c")):
+            write_split(os.path.join(root, name), self.private_key)
+        share_paths = write_split(os.path.join(root, "bad"), self.private_key)
+        corrupt_chunk(share_paths[0], 1)
+
+        with self.assertLogs(level="ERROR"):
+            failures = reshare_tree(root, self.output_path, 5, 3, workers=2)
+        self.assertEqual(failures, 1)
+        for name in ("a", os.path.join("b", "c")):
+            combined_key = recover_private_key(
+                "key", os.path.join(self.output_path, name), indexes=[1, 3, 5]
+            )
+            self.assertEqual(bytes(combined_key), self.private_key)
+        self.assertEqual(os.listdir(os.path.join(self.output_path, "bad")), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
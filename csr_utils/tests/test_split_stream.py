@@ -0,0 +1,90 @@
+import base64
+import io
+import os
+import tempfile
+import unittest
+from csr_utils.CombineShares import combine_shares
+from csr_utils.SplitKey import split_string_into_shares
+from csr_utils.utils.encoding_functions import iter_combine_stream, iter_split_stream
+from csr_utils.utils.integrity import get_secret_digest, SecretDigest
+
+ENGINES = ("prime", "bytes", "gf256")
+CHUNK_SIZE = 64
+# empty, shorter than a chunk, around a chunk and several chunks with a tail
+SIZES = (0, 1, CHUNK_SIZE - 1, CHUNK_SIZE, CHUNK_SIZE + 1, 3 * CHUNK_SIZE + 7)
+
+
+def key_text(size):
+    """Returns size bytes of PEM-like text, which every engine can share."""
+    return base64.encodebytes(os.urandom(size))[:size]
+
+
+class ReadOnlyStream:
+    """A stream without readinto, read through read() only."""
+
+    def __init__(self, data):
+        self.stream = io.BytesIO(data)
+
+    def read(self, size):
+        return self.stream.read(size)
+
+
+class SplitStreamTest(unittest.TestCase):
+    def check_round_trip(self, engine, data, stream):
+        secret_digest = SecretDigest()
+        share_chunks = list(
+            iter_split_stream(
+                stream, 2, 3, CHUNK_SIZE, engine, secret_digest=secret_digest
+            )
+        )
+        self.assertEqual(len(share_chunks), -(-len(data) // CHUNK_SIZE))
+        self.assertEqual(
+            secret_digest.hexdigest(), get_secret_digest(data, secret_digest.salt)
+        )
+        share_files = [
+            iter([shares[index] for shares in share_chunks]) for index in (0, 2)
+        ]
+        self.assertEqual(b"".join(iter_combine_stream(share_files)), data)
+
+    def test_partial_chunks(self):
+        data = key_text(max(SIZES))
+        for engine in ENGINES:
+            for size in SIZES:
+                with self.subTest(engine=engine, size=size):
+                    chunk = data[:size]
+                    self.check_round_trip(engine, chunk, io.BytesIO(chunk))
+                    self.check_round_trip(engine, chunk, ReadOnlyStream(chunk))
+
+    def test_leading_newline(self):
+        # the hex conversion of the prime engine drops a leading zero digit
+        data = b"\n" * CHUNK_SIZE + b"\n-"
+        for engine in ENGINES:
+            with self.subTest(engine=engine):
+                self.check_round_trip(engine, data, io.BytesIO(data))
+
+    def test_split_key_files(self):
+        for size in (0, 1000):
+            for engine in ENGINES:
+                with self.subTest(engine=engine, size=size):
+                    with tempfile.TemporaryDirectory() as folder_path:
+                        data = key_text(size)
+                        key_path = os.path.join(folder_path, "key_private.key")
+                        with open(key_path, "wb") as file:
+                            file.write(data)
+                        split_string_into_shares(
+                            folder_path,
+                            "key_private.key",
+                            3,
+                            2,
+                            engine=engine,
+                            chunk_size=CHUNK_SIZE,
+                            stream=True,
+                            share_format="binary",
+                        )
+                        combined_key_path = combine_shares("key", folder_path, stream=True)
+                        with open(combined_key_path, "rb") as file:
+                            self.assertEqual(file.read(), data)
+
+
+if __name__ == "__main__":
+    unittest.main()